@@ -0,0 +1,181 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+# Methods that count against the write concurrency limit
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets: each client may send ``burst`` requests at
+    once, refilled at ``rate`` requests per second.
+
+    At most ``max_clients`` buckets are kept; the least recently seen client
+    is forgotten first (and starts again with a full bucket).
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.allowed = 0
+        self.limited = 0
+        # client key -> (tokens, time of last update)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def acquire(self, key: str) -> Optional[float]:
+        """Take a token for ``key``: None if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = None
+            self.allowed += 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+            self.limited += 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def stats(self) -> Dict[str, int]:
+        return {"clients": len(self._buckets), "allowed_total": self.allowed, "limited_total": self.limited}
+
+class ConcurrencyLimiter:
+    """
+    Lets ``limit`` callers in at a time. Up to ``max_waiting`` more queue in
+    arrival order for at most ``timeout`` seconds; anything beyond that is
+    turned away at once instead of piling up behind the database.
+    """
+
+    def __init__(self, limit: int, max_waiting: int, timeout: float):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False if the queue is full or the wait timed out."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected_full += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # asyncio.wait leaves the future alone on timeout, so a slot
+            # handed over at the last moment is not lost.
+            await asyncio.wait((waiter,), timeout=self.timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        if waiter.done():
+            self.admitted += 1
+            return True
+        self._waiters.remove(waiter)
+        self.rejected_timeout += 1
+        return False
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the longest waiting caller if any."""
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted_total": self.admitted,
+            "rejected_queue_full_total": self.rejected_full,
+            "rejected_timeout_total": self.rejected_timeout,
+        }
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that sheds load before it reaches the database.
+
+    Requests over their client's rate get 429; writes that find the write
+    limiter's queue full, or wait in it too long, get 503. Both carry a
+    ``Retry-After`` header. Clients are keyed by the ``key_header`` value
+    when sent, else by their IP address.
+
+    ``unlimited_writes`` lists (method, path) pairs the write limiter skips,
+    for routes that queue writes themselves.
+    """
+
+    def __init__(
+        self,
+        app,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+        write_limiter: Optional[ConcurrencyLimiter] = None,
+        key_header: str = "X-API-Key",
+        exclude_paths: Iterable[str] = ("/metrics",),
+        unlimited_writes: Iterable[Tuple[str, str]] = (),
+    ):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.write_limiter = write_limiter
+        self.key_header = key_header.lower().encode("latin-1")
+        self.exclude_paths = set(exclude_paths)
+        self.unlimited_writes = set(unlimited_writes)
+
+    def _client_key(self, scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == self.key_header and value:
+                return "key:" + value.decode("latin-1")
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limiter is not None:
+            retry_after = self.rate_limiter.acquire(self._client_key(scope))
+            if retry_after is not None:
+                response = _shed(429, "Rate limit exceeded", retry_after)
+                await response(scope, receive, send)
+                return
+
+        method = scope["method"]
+        if (
+            self.write_limiter is None
+            or method not in WRITE_METHODS
+            or (method, scope["path"]) in self.unlimited_writes
+        ):
+            await self.app(scope, receive, send)
+            return
+        if not await self.write_limiter.acquire():
+            response = _shed(503, "Too many concurrent writes, retry later", self.write_limiter.timeout)
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.write_limiter.release()
+
+def _shed(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
@@ -0,0 +1,467 @@
+from sqlalchemy import Row, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from typing import Any, AsyncIterator, Iterable, List, Optional
+from app import crud
+from app.models import LIVE_USER, PrunedChanges, User, UserChange
+from app.schemas import BulkOperationResult, UserBulkUpdate, UserCreate, UserFilter, UserUpdate
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+async def _user_exists(user_id: int, db: AsyncSession) -> bool:
+    return await db.scalar(select(User.id).where(User.id == user_id, LIVE_USER)) is not None
+
+async def record_changes(db: AsyncSession, op: str, users: Iterable[Any]) -> None:
+    """Async counterpart of crud.record_changes."""
+    if not crud.RECORD_CHANGES:
+        return
+    rows = crud.change_rows(op, users)
+    if rows:
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(crud.CHANGES_LOCK)
+        await db.execute(insert(UserChange), rows)
+        db.info[crud.CHANGES_PENDING] = True
+
+async def create_user(user: UserCreate, db: AsyncSession) -> User | None:
+    """
+    Create a new user in the database without blocking the event loop.
+
+    Args:
+        user: UserCreate schema with user details (email, name, age).
+        db: Async database session.
+
+    Returns:
+        User object if created successfully.
+
+    Raises:
+        HTTPException: If database operation fails or email exists.
+    """
+    try:
+        # Single INSERT ... RETURNING; the unique index on email rejects duplicates.
+        new_user = await db.scalar(
+            insert(User).values(email=user.email, name=user.name, age=user.age).returning(User)
+        )
+        await record_changes(db, "create", [new_user])
+        await db.commit()
+        logger.info("Created user with ID: %s", new_user.id)
+        return new_user
+    except IntegrityError as e:
+        await db.rollback()
+        if crud.is_email_conflict(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already exists"
+            )
+        logger.error("Failed to create user: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to create user: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def get_user(user_id: int, db: AsyncSession) -> User | None:
+    """
+    Retrieve a user by ID.
+
+    Args:
+        user_id: ID of the user to retrieve.
+        db: Async database session.
+
+    Returns:
+        User object if found, None otherwise.
+    """
+    try:
+        if user_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        result = await db.execute(select(User).where(User.id == user_id, LIVE_USER))
+        user = result.scalars().first()
+        if user:
+            logger.info("Retrieved user with ID: %s", user_id)
+        return user
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to retrieve user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def update_user(
+    user_id: int, user: UserUpdate, db: AsyncSession, expected_version: Optional[int] = None
+) -> User | None:
+    """
+    Update an existing user's details.
+
+    Args:
+        user_id: ID of the user to update.
+        user: UserUpdate schema with updated fields.
+        db: Async database session.
+        expected_version: If set, only update while the user is at this version.
+
+    Returns:
+        Updated User object if found, None otherwise.
+
+    Raises:
+        HTTPException: If database operation fails, input is invalid or the
+            user is not at ``expected_version`` (412).
+    """
+    try:
+        if user_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        update_data = user.dict(exclude_unset=True)
+        if not update_data:
+            result = await db.execute(select(User).where(User.id == user_id, LIVE_USER))
+            db_user = result.scalars().first()
+            if db_user and expected_version is not None and db_user.version != expected_version:
+                raise crud.precondition_failed()
+            return db_user
+        # Single UPDATE ... RETURNING; no row means the user does not exist
+        # (or, with expected_version, was modified in the meantime).
+        stmt = update(User).where(User.id == user_id, LIVE_USER)
+        if expected_version is not None:
+            stmt = stmt.where(User.version == expected_version)
+        db_user = await db.scalar(
+            stmt.values(**update_data, version=User.version + 1).returning(User)
+        )
+        if not db_user:
+            await db.rollback()
+            if expected_version is not None and await _user_exists(user_id, db):
+                raise crud.precondition_failed()
+            return None
+        await record_changes(db, "update", [db_user])
+        await db.commit()
+        logger.info("Updated user with ID: %s", user_id)
+        return db_user
+    except IntegrityError as e:
+        await db.rollback()
+        if crud.is_email_conflict(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already exists"
+            )
+        logger.error("Failed to update user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to update user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def delete_user(user_id: int, db: AsyncSession, expected_version: Optional[int] = None) -> bool:
+    """
+    Delete a user by ID (a soft delete, see crud.delete_user).
+
+    Args:
+        user_id: ID of the user to delete.
+        db: Async database session.
+        expected_version: If set, only delete while the user is at this version.
+
+    Returns:
+        True if user was deleted, False if user not found.
+
+    Raises:
+        HTTPException: If database operation fails, input is invalid or the
+            user is not at ``expected_version`` (412).
+    """
+    try:
+        if user_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        stmt = update(User).where(User.id == user_id, LIVE_USER)
+        if expected_version is not None:
+            stmt = stmt.where(User.version == expected_version)
+        deleted_id = await db.scalar(stmt.values(deleted_at=time.time()).returning(User.id))
+        if deleted_id is None:
+            await db.rollback()
+            if expected_version is not None and await _user_exists(user_id, db):
+                raise crud.precondition_failed()
+            return False
+        await record_changes(db, "delete", [deleted_id])
+        await db.commit()
+        logger.info("Deleted user with ID: %s", user_id)
+        return True
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to delete user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def restore_user(user_id: int, db: AsyncSession) -> User | None:
+    """
+    Undo the delete of a user that has not been purged yet.
+
+    Args:
+        user_id: ID of the deleted user.
+        db: Async database session.
+
+    Returns:
+        The restored User object, or None if there is no deleted user with that ID.
+
+    Raises:
+        HTTPException: If database operation fails, input is invalid or
+            another user has taken the email since (400).
+    """
+    try:
+        if user_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        db_user = await db.scalar(
+            update(User)
+            .where(User.id == user_id, User.deleted_at.is_not(None))
+            .values(deleted_at=None, version=User.version + 1)
+            .returning(User)
+        )
+        if not db_user:
+            await db.rollback()
+            return None
+        await record_changes(db, "create", [db_user])
+        await db.commit()
+        logger.info("Restored user with ID: %s", user_id)
+        return db_user
+    except IntegrityError as e:
+        await db.rollback()
+        if crud.is_email_conflict(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already exists"
+            )
+        logger.error("Failed to restore user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to restore user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def get_all_users(db: AsyncSession) -> List[User]:
+    """
+    Retrieve all users from the database.
+
+    Args:
+        db: Async database session.
+
+    Returns:
+        List of User objects.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        result = await db.execute(select(User).where(LIVE_USER))
+        users = list(result.scalars().all())
+        logger.info("Retrieved %s users", len(users))
+        return users
+    except Exception as e:
+        logger.error("Failed to retrieve users: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def get_users_page(
+    db: AsyncSession,
+    limit: int,
+    after_id: int = 0,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> List[User]:
+    """
+    Retrieve one page of users (keyset pagination), optionally filtered.
+
+    Args:
+        db: Async database session.
+        limit: Maximum number of users to return.
+        after_id: ID of the last user of the previous page, 0 for the first page.
+        filters: Search and sort options; None lists all users by ID.
+        after_value: Sort value of the last user of the previous page.
+
+    Returns:
+        List of User objects.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        stmt = crud.users_query(filters, after_id, after_value, db.bind.dialect.name)
+        result = await db.execute(stmt.limit(limit))
+        users = list(result.scalars().all())
+        logger.info("Retrieved %s users after ID %s", len(users), after_id)
+        return users
+    except Exception as e:
+        logger.error("Failed to retrieve users: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def get_user_rows_page(
+    db: AsyncSession,
+    limit: int,
+    after_id: int = 0,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> List[Row]:
+    """
+    Same page as get_users_page, as plain ``crud.USER_COLUMNS`` rows.
+
+    Returns:
+        List of (id, email, name, age, version) rows.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        stmt = crud.users_query(filters, after_id, after_value, db.bind.dialect.name)
+        result = await db.execute(stmt.with_only_columns(*crud.USER_COLUMNS).limit(limit))
+        rows = list(result.all())
+        logger.info("Retrieved %s users after ID %s", len(rows), after_id)
+        return rows
+    except Exception as e:
+        logger.error("Failed to retrieve users: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def iter_users(
+    db: AsyncSession,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> AsyncIterator[User]:
+    """
+    Stream users from a server-side cursor, optionally filtered.
+
+    Args:
+        db: Async database session.
+        after_id: Only yield users after this cursor.
+        limit: Maximum number of users to yield, or None for no limit.
+        batch_size: Number of rows fetched per round trip.
+        filters: Search and sort options; None streams all users by ID.
+        after_value: Sort value belonging to the ``after_id`` cursor.
+
+    Yields:
+        User objects.
+    """
+    stmt = crud.users_query(filters, after_id, after_value, db.bind.dialect.name)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.stream_scalars(stmt.execution_options(yield_per=batch_size))
+    async for user in result:
+        yield user
+
+async def get_changes(db: AsyncSession, since: int, limit: int) -> List[UserChange]:
+    """
+    Retrieve change feed entries after a sequence number, oldest first.
+
+    Args:
+        db: Async database session.
+        since: Sequence number of the last change already seen, 0 for all.
+        limit: Maximum number of changes to return.
+
+    Returns:
+        List of UserChange objects.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        result = await db.execute(
+            select(UserChange).where(UserChange.seq > since).order_by(UserChange.seq).limit(limit)
+        )
+        changes = list(result.scalars().all())
+        if changes:
+            logger.info("Retrieved %s changes after %s", len(changes), since)
+        return changes
+    except Exception as e:
+        logger.error("Failed to retrieve changes: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def change_bounds(db: AsyncSession) -> Row:
+    """Async counterpart of crud.change_bounds."""
+    try:
+        result = await db.execute(select(func.min(UserChange.seq), func.max(UserChange.seq)))
+        return result.one()
+    except Exception as e:
+        logger.error("Failed to retrieve change bounds: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+async def pruned_change_seq(db: AsyncSession) -> int:
+    """Async counterpart of crud.pruned_change_seq."""
+    try:
+        return await db.scalar(select(PrunedChanges.max_seq).where(PrunedChanges.id == 1)) or 0
+    except Exception as e:
+        logger.error("Failed to retrieve pruned change sequence: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+# The batch operations reuse the sync implementations through run_sync: the
+# statements still go through aiosqlite, so the event loop is never blocked.
+
+async def bulk_create_users(
+    users: List[UserCreate], db: AsyncSession, chunk_size: int = 500
+) -> BulkOperationResult:
+    """Async counterpart of crud.bulk_create_users."""
+    return await db.run_sync(lambda session: crud.bulk_create_users(users, session, chunk_size))
+
+async def bulk_update_users(
+    users: List[UserBulkUpdate], db: AsyncSession, chunk_size: int = 500
+) -> BulkOperationResult:
+    """Async counterpart of crud.bulk_update_users."""
+    return await db.run_sync(lambda session: crud.bulk_update_users(users, session, chunk_size))
+
+async def bulk_delete_users(
+    user_ids: List[int], db: AsyncSession, chunk_size: int = 500
+) -> BulkOperationResult:
+    """Async counterpart of crud.bulk_delete_users."""
+    return await db.run_sync(lambda session: crud.bulk_delete_users(user_ids, session, chunk_size))
@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class CacheBackend:
+    """
+    Interface for the user read-through cache.
+
+    Backends store JSON-serializable values under string keys. A Redis-like
+    backend implements get/set/delete/clear on top of its client and keeps the
+    hit/miss/eviction counters it can observe.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self),
+        }
+
+class NullCache(CacheBackend):
+    """Cache that stores nothing; used when caching is disabled."""
+
+    def get(self, key: str) -> Optional[Any]:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+class LRUCache(CacheBackend):
+    """
+    In-process LRU cache with a per-entry TTL and a bound on entry count.
+
+    Args:
+        max_size: Maximum number of entries before the least recently used
+            one is evicted.
+        ttl: Seconds an entry stays valid after it is set.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class FakeRedisCache(CacheBackend):
+    """
+    Local stand-in for a Redis backend, for tests and development.
+
+    Values are stored as JSON strings with an absolute expiry, the way they
+    would be with ``SET key value EX ttl``, so serialization issues surface
+    without a running Redis server.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        super().__init__()
+        self.ttl = ttl
+        self._store: Dict[str, tuple] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._store.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._store[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(entry[1])
+
+    def set(self, key: str, value: Any) -> None:
+        self._store[key] = (time.monotonic() + self.ttl, json.dumps(value))
+
+    def delete(self, key: str) -> None:
+        self._store.pop(key, None)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+def create_cache(backend: str, max_size: int, ttl: float) -> CacheBackend:
+    """
+    Build the cache backend named in settings.
+
+    Args:
+        backend: One of "lru", "fake-redis" or "none".
+        max_size: Entry bound for the LRU backend.
+        ttl: Entry lifetime in seconds.
+
+    Returns:
+        A CacheBackend instance.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend == "lru":
+        return LRUCache(max_size=max_size, ttl=ttl)
+    if backend == "fake-redis":
+        return FakeRedisCache(ttl=ttl)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+def user_cache_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def user_to_dict(user) -> Dict[str, Any]:
+    return {"id": user.id, "email": user.email, "name": user.name, "age": user.age, "version": user.version}
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, database
+from app.config import CHANGES_POLL_INTERVAL_MS, CHANGES_RETENTION_HOURS, USE_ASYNC_DB
+from app.models import PrunedChanges, UserChange
+from app.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Seconds between outbox pruning runs
+PRUNE_INTERVAL = 3600
+
+def change_to_dict(change: UserChange) -> Dict[str, Any]:
+    return {
+        "seq": change.seq,
+        "op": change.op,
+        "user_id": change.user_id,
+        "user": loads(change.data) if change.data is not None else None,
+        "changed_at": change.changed_at,
+    }
+
+def sse_event(change: UserChange) -> bytes:
+    """One Server-Sent Event; its id is the sequence number a client resumes from."""
+    return f"id: {change.seq}\nevent: {change.op}\ndata: ".encode() + dumps(change_to_dict(change)) + b"\n\n"
+
+# Reads open a short session on the primary each time, so a waiting reader
+# holds no pooled connection between polls.
+
+async def read_changes(since: int, limit: int) -> List[UserChange]:
+    if USE_ASYNC_DB:
+        from app import async_crud
+
+        async with database.AsyncSessionLocal() as db:
+            return await async_crud.get_changes(db, since, limit)
+
+    def read():
+        db = database.SessionLocal()
+        try:
+            return crud.get_changes(db, since, limit)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(read)
+
+async def read_pruned_seq() -> int:
+    if USE_ASYNC_DB:
+        from app import async_crud
+
+        async with database.AsyncSessionLocal() as db:
+            return await async_crud.pruned_change_seq(db)
+
+    def read():
+        db = database.SessionLocal()
+        try:
+            return crud.pruned_change_seq(db)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(read)
+
+class ChangeFeed:
+    """
+    Serves GET /users/changes from the ``user_changes`` outbox.
+
+    A commit in this process that recorded changes wakes every waiting
+    reader at once. Commits by other worker processes are not signalled,
+    so waiters also re-read every ``poll_interval`` seconds.
+
+    Rows older than ``retention`` seconds are pruned in the background,
+    except the newest one. The highest pruned sequence number is recorded
+    (sequences may skip values, so the oldest retained row cannot tell);
+    a reader whose cursor is below it has missed changes and gets 410.
+    """
+
+    def __init__(self, poll_interval: float = 1.0, retention: float = 0):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.notifications = 0
+        self.waiting = 0
+        self.streams = 0
+        self.pruned = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        if self.retention > 0 and self._task is None:
+            self._task = asyncio.create_task(self._prune_periodically())
+
+    async def stop(self) -> None:
+        self._loop = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self) -> None:
+        """Wake all waiting readers; safe to call from any thread."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:  # loop already closed at shutdown
+            pass
+
+    def _wake(self) -> None:
+        self.notifications += 1
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def _wait(self, watched: Optional[asyncio.Event], timeout: float) -> None:
+        # ``watched`` is taken before the read, so a commit made while
+        # reading still ends the wait.
+        self.waiting += 1
+        try:
+            if watched is None:
+                await asyncio.sleep(timeout)
+            else:
+                await asyncio.wait_for(watched.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.waiting -= 1
+
+    async def check_since(self, since: int) -> None:
+        """
+        Raises:
+            HTTPException: 410 if changes after ``since`` have been pruned.
+        """
+        if since == 0:
+            return
+        if since < await read_pruned_seq():
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail=f"Changes after {since} are no longer retained; reload from GET /users/export"
+            )
+
+    async def poll(self, since: int, limit: int, wait: float) -> List[UserChange]:
+        """Changes after ``since``; when there are none yet, wait up to ``wait`` seconds for some."""
+        deadline = time.monotonic() + wait
+        while True:
+            watched = self._event
+            changes = await read_changes(since, limit)
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return changes
+            await self._wait(watched, min(remaining, self.poll_interval))
+
+    async def stream(self, since: int, limit: int, keepalive: float) -> AsyncIterator[bytes]:
+        """Server-Sent Events for every change after ``since``, plus a comment every ``keepalive`` idle seconds."""
+        self.streams += 1
+        try:
+            idle_since = time.monotonic()
+            while True:
+                watched = self._event
+                changes = await read_changes(since, limit)
+                if changes:
+                    since = changes[-1].seq
+                    yield b"".join(sse_event(change) for change in changes)
+                    idle_since = time.monotonic()
+                    continue
+                idle = time.monotonic() - idle_since
+                if idle >= keepalive:
+                    yield b": keep-alive\n\n"
+                    idle_since, idle = time.monotonic(), 0
+                await self._wait(watched, min(self.poll_interval, keepalive - idle))
+        finally:
+            self.streams -= 1
+
+    def prune(self) -> int:
+        """
+        Delete outbox rows older than the retention period, keeping the
+        newest, and raise the recorded highest pruned sequence number.
+        """
+        cutoff = time.time() - self.retention
+        with database.engine.begin() as connection:
+            newest = connection.scalar(select(func.max(UserChange.seq)))
+            if newest is None:
+                return 0
+            expired = (UserChange.changed_at < cutoff, UserChange.seq < newest)
+            pruned_seq = connection.scalar(select(func.max(UserChange.seq)).where(*expired))
+            if pruned_seq is None:
+                return 0
+            deleted = connection.execute(delete(UserChange).where(*expired)).rowcount
+            raised = connection.execute(
+                update(PrunedChanges)
+                .where(PrunedChanges.id == 1, PrunedChanges.max_seq < pruned_seq)
+                .values(max_seq=pruned_seq)
+            ).rowcount
+            if not raised and connection.scalar(select(PrunedChanges.id)) is None:
+                connection.execute(insert(PrunedChanges).values(id=1, max_seq=pruned_seq))
+        self.pruned += deleted
+        if deleted:
+            logger.info("Pruned %s changes older than %.0f", deleted, cutoff)
+        return deleted
+
+    async def _prune_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(PRUNE_INTERVAL)
+            try:
+                await run_in_threadpool(self.prune)
+            except Exception as e:
+                logger.error("Change pruning failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "waiting": self.waiting,
+            "streams": self.streams,
+            "notifications_total": self.notifications,
+            "pruned_total": self.pruned,
+        }
+
+change_feed = ChangeFeed(
+    CHANGES_POLL_INTERVAL_MS / 1000, CHANGES_RETENTION_HOURS * 3600
+) if crud.RECORD_CHANGES else None
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session):
+    if session.info.pop(crud.CHANGES_PENDING, False) and change_feed is not None:
+        change_feed.notify()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(crud.CHANGES_PENDING, None)
@@ -0,0 +1,213 @@
+"""
+Purge (or archive) soft-deleted users and give their space back.
+
+The service runs this in the background every COMPACTION_INTERVAL_SECONDS.
+Users deleted more than SOFT_DELETE_RETENTION_HOURS ago are removed in
+short transactions of COMPACTION_BATCH_SIZE rows, with a pause between
+them so request writes are never blocked for long. SQLite databases in
+incremental auto-vacuum mode then return the freed pages to the file
+system a chunk at a time; PostgreSQL tables get a plain VACUUM.
+
+SQLite databases created before auto-vacuum was enabled only switch modes
+after a full VACUUM, which rewrites the file and blocks writers while it
+runs; do it once, offline, with --vacuum.
+
+Usage:
+    python -m app.compaction
+    python -m app.compaction --vacuum
+"""
+import asyncio
+import logging
+import sys
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, select
+from starlette.concurrency import run_in_threadpool
+
+from app import database
+from app.config import (
+    COMPACTION_BATCH_SIZE, COMPACTION_PAUSE_MS, SOFT_DELETE_ARCHIVE, SOFT_DELETE_RETENTION_HOURS
+)
+from app.models import ArchivedUser, User
+from app.sharding import shard_set
+
+logger = logging.getLogger(__name__)
+
+# Pages freed per incremental_vacuum step
+VACUUM_PAGES = 1000
+
+# PRAGMA auto_vacuum value for INCREMENTAL
+SQLITE_INCREMENTAL = 2
+
+class Compactor:
+    """
+    Removes users deleted more than ``retention`` seconds ago from every
+    engine in ``engines`` (default: the primary database, or every shard
+    when sharded), ``batch_size`` rows per transaction with
+    ``pause`` seconds between transactions. With ``archive`` the rows are
+    copied to ``users_archive`` in the same transaction.
+    """
+
+    def __init__(
+        self,
+        engines: Optional[List],
+        retention: float,
+        batch_size: int = 500,
+        archive: bool = False,
+        pause: float = 0.05,
+    ):
+        self.engines = engines
+        self.retention = retention
+        self.batch_size = batch_size
+        self.archive = archive
+        self.pause = pause
+        self.runs = 0
+        self.purged = 0
+        self.archived = 0
+        self.vacuumed_pages = 0
+        self.last_run_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def purge(self, engine) -> int:
+        """Delete (or archive) expired tombstones on one engine, a batch at a time."""
+        cutoff = time.time() - self.retention
+        purged = 0
+        while True:
+            with engine.begin() as connection:
+                # Served by the partial index on deleted_at
+                ids = list(connection.scalars(
+                    select(User.id).where(User.deleted_at < cutoff).limit(self.batch_size)
+                ))
+                if not ids:
+                    return purged
+                # Re-checked here: a user restored since the select is kept.
+                stmt = delete(User).where(User.id.in_(ids), User.deleted_at < cutoff)
+                if self.archive:
+                    rows = [
+                        {**row, "archived_at": time.time()}
+                        for row in connection.execute(stmt.returning(
+                            User.id, User.email, User.name, User.age, User.version, User.deleted_at
+                        )).mappings()
+                    ]
+                    if rows:
+                        connection.execute(insert(ArchivedUser), rows)
+                    self.archived += len(rows)
+                    count = len(rows)
+                else:
+                    count = connection.execute(stmt).rowcount
+            purged += count
+            self.purged += count
+            if len(ids) < self.batch_size:
+                return purged
+            time.sleep(self.pause)
+
+    def vacuum(self, engine) -> int:
+        """Return free pages to the file system; the number of pages freed."""
+        if engine.dialect.name == "postgresql":
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.exec_driver_sql(f"VACUUM {User.__tablename__}")
+            return 0
+        if engine.dialect.name != "sqlite":
+            return 0
+        freed = 0
+        with engine.connect() as connection:
+            if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != SQLITE_INCREMENTAL:
+                return 0
+            free = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+            while free:
+                connection.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+                connection.commit()
+                left = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+                if left >= free:
+                    break
+                freed += free - left
+                free = left
+                if free:
+                    time.sleep(self.pause)
+        self.vacuumed_pages += freed
+        return freed
+
+    def databases(self) -> List:
+        if self.engines is not None:
+            return self.engines
+        return [shard.engine for shard in shard_set.shards] if shard_set is not None else [database.engine]
+
+    def run_once(self) -> Dict[str, int]:
+        """Purge and vacuum every engine once."""
+        started = time.perf_counter()
+        purged = freed = 0
+        for engine in self.databases():
+            count = self.purge(engine)
+            purged += count
+            if count:
+                freed += self.vacuum(engine)
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+        if purged:
+            verb = "Archived" if self.archive else "Purged"
+            logger.info("%s %s deleted users, freed %s pages in %.2fs", verb, purged, freed, self.last_run_seconds)
+        return {"purged": purged, "vacuumed_pages": freed}
+
+    def start(self, interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                logger.error("Compaction failed: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "runs_total": self.runs,
+            "purged_total": self.purged,
+            "archived_total": self.archived,
+            "vacuumed_pages_total": self.vacuumed_pages,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+compactor = Compactor(
+    None,
+    SOFT_DELETE_RETENTION_HOURS * 3600,
+    COMPACTION_BATCH_SIZE,
+    SOFT_DELETE_ARCHIVE,
+    COMPACTION_PAUSE_MS / 1000,
+)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vacuum", action="store_true",
+                        help="run a full VACUUM afterwards (switches old SQLite files to incremental mode)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    database.initialize_database()
+    if shard_set is not None:
+        shard_set.initialize()
+    result = compactor.run_once()
+    print(f"purged {result['purged']} deleted users, freed {result['vacuumed_pages']} pages")
+    if args.vacuum:
+        for engine in compactor.databases():
+            if engine.dialect.name == "sqlite":
+                with engine.connect() as connection:
+                    connection.exec_driver_sql("VACUUM")
+                print(f"vacuumed {engine.url.database}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
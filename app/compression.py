@@ -0,0 +1,286 @@
+import hashlib
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from app.http_cache import encoded_etag, etag_matches, parse_etags
+
+try:
+    import brotli
+except ImportError:  # optional; "br" is simply not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional; "zstd" is simply not offered
+    zstandard = None
+
+# Content types worth compressing; everything else (images, archives) is sent as is.
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/plain", "text/css", "text/csv", "text/javascript",
+    "application/json", "application/x-ndjson", "application/javascript",
+)
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._zlib.flush()
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        self._brotli = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data)
+
+    def flush(self) -> bytes:
+        return self._brotli.flush()
+
+    def finish(self) -> bytes:
+        return self._brotli.finish()
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._zstd.compress(data)
+
+    def flush(self) -> bytes:
+        return self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._zstd.flush()
+
+COMPRESSORS = {"gzip": _GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = _BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = _ZstdCompressor
+
+def available_encodings(preferred: Iterable[str]) -> List[str]:
+    """The encodings from ``preferred`` this process can produce, in order."""
+    return [encoding for encoding in preferred if encoding in COMPRESSORS]
+
+def compress(encoding: str, level: int, body: bytes) -> bytes:
+    compressor = COMPRESSORS[encoding](level)
+    return compressor.compress(body) + compressor.finish()
+
+def negotiate(accept_encoding: Optional[str], encodings: List[str]) -> Optional[str]:
+    """
+    Pick a content coding for an Accept-Encoding header.
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header, if any.
+        encodings: Codings the server offers, most preferred first.
+
+    Returns:
+        The offered coding with the highest q-value (ties go to the server's
+        preference), or None to send the body uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with gzip, br or zstd, as negotiated
+    from Accept-Encoding.
+
+    Complete bodies smaller than ``minimum_size`` are sent uncompressed.
+    Streamed bodies (e.g. NDJSON) are compressed chunk by chunk and flushed
+    after every chunk, so clients still receive rows as they are produced.
+    Responses that already carry a Content-Encoding are passed through.
+
+    A compressed response's ETag gets the encoding as a suffix
+    (``"1.2-gzip"``), like PrecompressedPage's variants, so caches never
+    mistake it for the uncompressed bytes. app.http_cache accepts the
+    suffixed tags in If-None-Match and If-Match, and a 304 answering a
+    suffixed tag repeats it.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        encodings: Iterable[str] = ("zstd", "br", "gzip"),
+        levels: Optional[Dict[str, int]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings(encodings)
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        level = self.levels[encoding] if encoding is not None else 0
+        await _CompressedResponder(self.app, encoding, level, self.minimum_size)(scope, receive, send)
+
+class _CompressedResponder:
+    def __init__(self, app, encoding: Optional[str], level: int, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.if_none_match: List[str] = []
+        self.send = None
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        if self.encoding is not None:
+            self.if_none_match = parse_etags(Headers(scope=scope).get("if-none-match"))
+        await self.app(scope, receive, self.send_wrapper)
+
+    def _compressible(self, headers: Headers) -> bool:
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        return (
+            "content-encoding" not in headers
+            and "content-range" not in headers
+            and (content_type in COMPRESSIBLE_TYPES or content_type.endswith("+json"))
+        )
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            if message["status"] == 304:
+                self._match_variant_etag(message)
+            # Hold the start message until the first body chunk shows whether
+            # the response is worth compressing.
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            compressible = self._compressible(headers)
+            if compressible:
+                # Uncompressed responses vary by Accept-Encoding too.
+                headers.add_vary_header("Accept-Encoding")
+            if (
+                self.encoding is None
+                or not compressible
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = COMPRESSORS[self.encoding](self.level)
+            headers["Content-Encoding"] = self.encoding
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], self.encoding)
+            if more_body:
+                del headers["Content-Length"]
+                message = {**message, "body": self.compressor.compress(body) + self.compressor.flush()}
+            else:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+            await self.send(start)
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+        await self.send({**message, "body": chunk})
+
+    def _match_variant_etag(self, start) -> None:
+        # The client revalidated the compressed variant it holds; answer with
+        # that variant's tag rather than the uncompressed one.
+        headers = MutableHeaders(raw=start["headers"])
+        etag = headers.get("etag")
+        if etag is not None and self.encoding is not None:
+            variant = encoded_etag(etag, self.encoding)
+            if variant in self.if_none_match or f"W/{variant}" in self.if_none_match:
+                headers["ETag"] = variant
+
+class PrecompressedPage:
+    """
+    A fixed page body compressed once per offered encoding by
+    ``compress_variants()``, which the app runs at startup in a worker
+    thread. Until it has run, the page is served uncompressed, so a request
+    never compresses on the event loop.
+
+    Each variant gets its own strong ETag (a digest of the page, suffixed
+    with the encoding), so ``response()`` only has to pick a variant or
+    answer If-None-Match with 304. The compression middleware passes the
+    compressed variants through because Content-Encoding is already set.
+    """
+
+    def __init__(
+        self,
+        body: str,
+        media_type: str = "text/html",
+        encodings: Iterable[str] = ("zstd", "br", "gzip"),
+        levels: Optional[Dict[str, int]] = None,
+        cache_control: Optional[str] = None,
+    ):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.encodings = available_encodings(encodings)
+        self.levels = {"gzip": 9, "br": 11, "zstd": 19, **(levels or {})}
+        self.body = body.encode()
+        self.variants: Dict[Optional[str], bytes] = {None: self.body}
+        digest = hashlib.sha1(self.body).hexdigest()
+        self.etags = {None: f'"{digest}"'}
+        self.etags.update((encoding, encoded_etag(f'"{digest}"', encoding)) for encoding in self.encodings)
+
+    def compress_variants(self) -> None:
+        """Compress the body with every offered encoding (slow at these levels)."""
+        for encoding in self.encodings:
+            if encoding not in self.variants:
+                self.variants[encoding] = compress(encoding, self.levels[encoding], self.body)
+
+    def response(self, request_headers: Headers) -> Response:
+        ready = [encoding for encoding in self.encodings if encoding in self.variants]
+        encoding = negotiate(request_headers.get("accept-encoding"), ready)
+        headers = {"Vary": "Accept-Encoding", "ETag": self.etags[encoding]}
+        if self.cache_control:
+            headers["Cache-Control"] = self.cache_control
+        if etag_matches(request_headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
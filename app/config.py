@@ -0,0 +1,171 @@
+import os
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+# Database connection. ASYNC_DATABASE_URL defaults to DATABASE_URL with the
+# matching async driver (aiosqlite for SQLite, asyncpg for PostgreSQL).
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./user_service.db")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+# Connection pool sizing; ignored for in-memory SQLite databases.
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# Server-side statement timeout in milliseconds (PostgreSQL only); 0 disables it.
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+
+# Read replicas (comma-separated sync URLs; async URLs are derived like
+# ASYNC_DATABASE_URL). Single-user reads and list pages go round-robin to
+# replicas whose lag is within REPLICA_MAX_LAG_MS, measured every
+# REPLICA_CHECK_INTERVAL_MS; a client that wrote in the last
+# READ_YOUR_WRITES_MS reads from the primary.
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+REPLICA_MAX_LAG_MS = _env_int("REPLICA_MAX_LAG_MS", 5000)
+REPLICA_CHECK_INTERVAL_MS = _env_int("REPLICA_CHECK_INTERVAL_MS", 1000)
+READ_YOUR_WRITES_MS = _env_int("READ_YOUR_WRITES_MS", 5000)
+
+# Horizontal sharding (comma-separated sync URLs, named shard0, shard1, ...
+# in order; append new shards at the end). Users are placed by a consistent
+# hash of their ID with SHARD_VIRTUAL_NODES points per shard. DATABASE_URL
+# then only holds the ID allocator, which hands out SHARD_ID_BLOCK_SIZE IDs
+# per round trip.
+DATABASE_SHARD_URLS = [
+    url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()
+]
+SHARD_VIRTUAL_NODES = _env_int("SHARD_VIRTUAL_NODES", 64)
+SHARD_ID_BLOCK_SIZE = _env_int("SHARD_ID_BLOCK_SIZE", 1000)
+
+# Use the async engine (aiosqlite) for request handling. Set USE_ASYNC_DB=false
+# to fall back to the synchronous SQLAlchemy session.
+USE_ASYNC_DB = _env_bool("USE_ASYNC_DB", True)
+
+# Keyset pagination for GET /users/
+DEFAULT_PAGE_SIZE = _env_int("DEFAULT_PAGE_SIZE", 100)
+MAX_PAGE_SIZE = _env_int("MAX_PAGE_SIZE", 1000)
+# Rows fetched per round trip when streaming users from a server-side cursor
+STREAM_BATCH_SIZE = _env_int("STREAM_BATCH_SIZE", 1000)
+
+# Bulk endpoints: items committed per transaction, and the request size cap
+BULK_CHUNK_SIZE = _env_int("BULK_CHUNK_SIZE", 500)
+MAX_BULK_ITEMS = _env_int("MAX_BULK_ITEMS", 10000)
+
+# POST /users/import: longest accepted line (or multi-line CSV record), in
+# characters, and how many failed lines are itemized in the response
+IMPORT_MAX_LINE_LENGTH = _env_int("IMPORT_MAX_LINE_LENGTH", 65536)
+IMPORT_MAX_ERRORS = _env_int("IMPORT_MAX_ERRORS", 100)
+
+# Soft delete. Deleted users can be restored for SOFT_DELETE_RETENTION_HOURS;
+# then the compaction job, every COMPACTION_INTERVAL_SECONDS (0 disables it),
+# purges them, or moves them to users_archive with SOFT_DELETE_ARCHIVE, in
+# transactions of COMPACTION_BATCH_SIZE rows with COMPACTION_PAUSE_MS between
+# them, and hands freed SQLite pages back with an incremental vacuum.
+SOFT_DELETE_RETENTION_HOURS = _env_int("SOFT_DELETE_RETENTION_HOURS", 24)
+SOFT_DELETE_ARCHIVE = _env_bool("SOFT_DELETE_ARCHIVE", False)
+COMPACTION_INTERVAL_SECONDS = _env_int("COMPACTION_INTERVAL_SECONDS", 300)
+COMPACTION_BATCH_SIZE = _env_int("COMPACTION_BATCH_SIZE", 500)
+COMPACTION_PAUSE_MS = _env_int("COMPACTION_PAUSE_MS", 50)
+
+# Read-through cache in front of GET /users/{user_id}: "lru", "fake-redis" or "none".
+# Both caches live in one process, so with several workers (WEB_CONCURRENCY,
+# which gunicorn and app.serve both read) the default is "none".
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", 0)
+USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "none" if WEB_CONCURRENCY > 1 else "lru")
+USER_CACHE_SIZE = _env_int("USER_CACHE_SIZE", 10000)
+USER_CACHE_TTL = _env_int("USER_CACHE_TTL", 60)
+
+# Concurrent identical reads (GET /users/{user_id} on a cache miss, and
+# identical GET /users/ pages) share one in-flight query per process.
+COALESCE_READS = _env_bool("COALESCE_READS", True)
+
+# Change feed (GET /users/changes). Writes add an outbox row in their own
+# transaction; waiting readers are woken by commits in this process and
+# re-check every CHANGES_POLL_INTERVAL_MS for commits by other workers.
+# Outbox rows older than CHANGES_RETENTION_HOURS are pruned (0 keeps them).
+# Not available with sharding.
+CHANGE_FEED_ENABLED = _env_bool("CHANGE_FEED_ENABLED", True)
+CHANGES_POLL_INTERVAL_MS = _env_int("CHANGES_POLL_INTERVAL_MS", 1000)
+CHANGES_MAX_WAIT_SECONDS = _env_int("CHANGES_MAX_WAIT_SECONDS", 60)
+CHANGES_KEEPALIVE_SECONDS = _env_int("CHANGES_KEEPALIVE_SECONDS", 15)
+CHANGES_RETENTION_HOURS = _env_int("CHANGES_RETENTION_HOURS", 168)
+
+# SQLite connection tuning: "durable", "balanced" or "fast" (see app/database.py).
+# SQLITE_PRAGMAS overrides individual pragmas, e.g. "cache_size=-32000,busy_timeout=10000".
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "balanced")
+SQLITE_PRAGMAS = os.getenv("SQLITE_PRAGMAS", "")
+
+# Opt-in group commit for POST /users/: creates are queued and written in
+# batches of up to CREATE_BATCH_MAX_ROWS, or every CREATE_BATCH_MAX_DELAY_MS.
+CREATE_BATCHING = _env_bool("CREATE_BATCHING", False)
+CREATE_BATCH_MAX_ROWS = _env_int("CREATE_BATCH_MAX_ROWS", 100)
+CREATE_BATCH_MAX_DELAY_MS = _env_int("CREATE_BATCH_MAX_DELAY_MS", 5)
+CREATE_QUEUE_MAX_SIZE = _env_int("CREATE_QUEUE_MAX_SIZE", 1000)
+CREATE_QUEUE_TIMEOUT_MS = _env_int("CREATE_QUEUE_TIMEOUT_MS", 100)
+
+# Admission control. Each client (its RATE_LIMIT_KEY_HEADER value, else its
+# IP) may send RATE_LIMIT_BURST requests at once, refilled at
+# RATE_LIMIT_PER_SECOND (0 disables); excess requests get 429. At most
+# WRITE_CONCURRENCY writes (POST/PUT/PATCH/DELETE) run at once (0 disables);
+# WRITE_QUEUE_SIZE more may wait up to WRITE_QUEUE_TIMEOUT_MS, the rest get 503.
+RATE_LIMIT_PER_SECOND = _env_int("RATE_LIMIT_PER_SECOND", 0)
+RATE_LIMIT_BURST = _env_int("RATE_LIMIT_BURST", 50)
+RATE_LIMIT_KEY_HEADER = os.getenv("RATE_LIMIT_KEY_HEADER", "X-API-Key")
+WRITE_CONCURRENCY = _env_int("WRITE_CONCURRENCY", 8)
+WRITE_QUEUE_SIZE = _env_int("WRITE_QUEUE_SIZE", 128)
+WRITE_QUEUE_TIMEOUT_MS = _env_int("WRITE_QUEUE_TIMEOUT_MS", 1000)
+
+# Request metrics exported on /metrics; METRICS_SERVER_TIMING adds a
+# Server-Timing header with app and database time to every response.
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+METRICS_SERVER_TIMING = _env_bool("METRICS_SERVER_TIMING", False)
+
+# Logging. Records go through a queue of LOG_QUEUE_SIZE to a background
+# thread that formats and writes them; when the queue is full they are
+# dropped (and counted) instead of blocking the request. LOG_FORMAT is "text"
+# or "json" (one object per line, with the request ID). LOG_LEVELS overrides
+# LOG_LEVEL per logger, e.g. "app.crud=WARNING,uvicorn.access=WARNING".
+# LOG_SAMPLE_PERCENT of requests keep their INFO and DEBUG records; warnings
+# and errors are always written. Each request gets an ID from its
+# REQUEST_ID_HEADER (or a new one), echoed in the response.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_LEVELS = {
+    name.strip(): level.strip().upper()
+    for name, _, level in (item.partition("=") for item in os.getenv("LOG_LEVELS", "").split(","))
+    if name.strip() and level.strip()
+}
+LOG_QUEUE_SIZE = _env_int("LOG_QUEUE_SIZE", 10000)
+LOG_SAMPLE_PERCENT = _env_int("LOG_SAMPLE_PERCENT", 100)
+REQUEST_ID_HEADER = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+
+# Response compression, negotiated from Accept-Encoding in COMPRESSION_ENCODINGS
+# order ("br" and "zstd" need the brotli / zstandard packages). Complete bodies
+# under COMPRESSION_MIN_SIZE bytes are sent uncompressed.
+COMPRESSION_ENABLED = _env_bool("COMPRESSION_ENABLED", True)
+COMPRESSION_MIN_SIZE = _env_int("COMPRESSION_MIN_SIZE", 1024)
+COMPRESSION_ENCODINGS = [
+    e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()
+]
+COMPRESSION_GZIP_LEVEL = _env_int("COMPRESSION_GZIP_LEVEL", 6)
+COMPRESSION_BROTLI_LEVEL = _env_int("COMPRESSION_BROTLI_LEVEL", 4)
+COMPRESSION_ZSTD_LEVEL = _env_int("COMPRESSION_ZSTD_LEVEL", 3)
+
+# Cache-Control max-age for the HTML pages; 0 makes browsers revalidate
+# (with the page's ETag) on every load.
+HTML_CACHE_MAX_AGE = _env_int("HTML_CACHE_MAX_AGE", 300)
+
+# Lock file serializing database initialization across worker processes.
+# Defaults to "<database file>.init.lock" for SQLite, else a file in the temp dir.
+INIT_LOCK_FILE = os.getenv("INIT_LOCK_FILE", "")
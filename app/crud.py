@@ -1,14 +1,84 @@
+from sqlalchemy import Row, and_, column, func, insert, or_, select, table, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List  # Added import for List
-from app.models import User
-from app.schemas import UserCreate, UserUpdate
+from typing import Any, Iterable, Iterator, List, Optional  # Added import for List
+from app.config import CHANGE_FEED_ENABLED, DATABASE_SHARD_URLS
+from app.models import (
+    LIVE_USER, NAME_SEARCH_MIN_LENGTH, NAME_SEARCH_TABLE, PrunedChanges, User, UserChange,
+    name_search_supported,
+)
+from app.schemas import (
+    BulkItemError, BulkOperationResult, UserBulkUpdate, UserCreate, UserFilter, UserUpdate
+)
+from app.serialization import USER_FIELDS, dumps
 import logging
+import sys
+import time
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def is_email_conflict(error: IntegrityError) -> bool:
+    """Return True if an IntegrityError comes from the unique index on User.email."""
+    message = str(error.orig).lower()
+    return "email" in message and ("unique" in message or "duplicate" in message)
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Precondition failed: user has been modified"
+    )
+
+def _user_exists(user_id: int, db: Session) -> bool:
+    return db.scalar(select(User.id).where(User.id == user_id, LIVE_USER)) is not None
+
+# Writes add change feed rows to their transaction. Shards would each keep
+# their own sequence with no common order, so there is no feed with shards.
+RECORD_CHANGES = CHANGE_FEED_ENABLED and not DATABASE_SHARD_URLS
+# Session.info key set once a transaction holds changes (see app.changes)
+CHANGES_PENDING = "changes_pending"
+# PostgreSQL hands out sequence values before commit, so concurrent writers
+# could commit them out of order and a reader would skip the late one. An
+# advisory lock held from the outbox insert to commit keeps the order.
+CHANGES_LOCK_KEY = 72616
+CHANGES_LOCK = text("SELECT pg_advisory_xact_lock(:key)").bindparams(key=CHANGES_LOCK_KEY)
+
+def change_rows(op: str, users: Iterable[Any]) -> List[dict]:
+    """
+    Outbox rows for a change to ``users``.
+
+    Args:
+        op: "create", "update" or "delete".
+        users: ORM users or ``USER_COLUMNS`` rows as they are after the
+            change; user IDs for "delete".
+
+    Returns:
+        ``UserChange`` column values, one dict per user.
+    """
+    now = time.time()
+    if op == "delete":
+        return [{"user_id": user_id, "op": op, "data": None, "changed_at": now} for user_id in users]
+    return [
+        {
+            "user_id": user.id,
+            "op": op,
+            "data": dumps({field: getattr(user, field) for field in USER_FIELDS}).decode(),
+            "changed_at": now,
+        }
+        for user in users
+    ]
+
+def record_changes(db: Session, op: str, users: Iterable[Any]) -> None:
+    """Add outbox rows (see change_rows) to the transaction open on ``db``."""
+    if not RECORD_CHANGES:
+        return
+    rows = change_rows(op, users)
+    if rows:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(CHANGES_LOCK)
+        db.execute(insert(UserChange), rows)
+        db.info[CHANGES_PENDING] = True
+
 def create_user(user: UserCreate, db: Session) -> User | None:
     """
     Create a new user in the database.
@@ -18,31 +88,37 @@ def create_user(user: UserCreate, db: Session) -> User | None:
         db: Database session.
 
     Returns:
-        User object if created successfully, None if email already exists.
+        User object if created successfully.
 
     Raises:
         HTTPException: If database operation fails or email exists.
     """
     try:
-        # Check for existing user with the same email
-        db_user = db.query(User).filter(User.email == user.email).first()
-        if db_user:
+        # Single INSERT ... RETURNING; the unique index on email rejects duplicates.
+        new_user = db.scalar(
+            insert(User).values(email=user.email, name=user.name, age=user.age).returning(User)
+        )
+        record_changes(db, "create", [new_user])
+        db.commit()
+        logger.info("Created user with ID: %s", new_user.id)
+        return new_user
+    except IntegrityError as e:
+        db.rollback()
+        if is_email_conflict(e):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already exists"
             )
-        # Create new user
-        new_user = User(email=user.email, name=user.name, age=user.age)
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-        logger.info(f"Created user with ID: {new_user.id}")
-        return new_user
+        logger.error("Failed to create user: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        logger.error(f"Failed to create user: {str(e)}")
+        logger.error("Failed to create user: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
@@ -65,20 +141,22 @@ def get_user(user_id: int, db: Session) -> User | None:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid user ID"
             )
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.query(User).filter(User.id == user_id, LIVE_USER).first()
         if user:
-            logger.info(f"Retrieved user with ID: {user_id}")
+            logger.info("Retrieved user with ID: %s", user_id)
         return user
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to retrieve user {user_id}: {str(e)}")
+        logger.error("Failed to retrieve user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
         )
 
-def update_user(user_id: int, user: UserUpdate, db: Session) -> User | None:
+def update_user(
+    user_id: int, user: UserUpdate, db: Session, expected_version: Optional[int] = None
+) -> User | None:
     """
     Update an existing user's details.
 
@@ -86,12 +164,14 @@ def update_user(user_id: int, user: UserUpdate, db: Session) -> User | None:
         user_id: ID of the user to update.
         user: UserUpdate schema with updated fields.
         db: Database session.
+        expected_version: If set, only update while the user is at this version.
 
     Returns:
         Updated User object if found, None otherwise.
 
     Raises:
-        HTTPException: If database operation fails or input is invalid.
+        HTTPException: If database operation fails, input is invalid or the
+            user is not at ``expected_version`` (412).
     """
     try:
         if user_id <= 0:
@@ -99,48 +179,69 @@ def update_user(user_id: int, user: UserUpdate, db: Session) -> User | None:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid user ID"
             )
-        db_user = db.query(User).filter(User.id == user_id).first()
+        update_data = user.dict(exclude_unset=True)
+        if not update_data:
+            db_user = db.execute(select(User).where(User.id == user_id, LIVE_USER)).scalars().first()
+            if db_user and expected_version is not None and db_user.version != expected_version:
+                raise precondition_failed()
+            return db_user
+        # Single UPDATE ... RETURNING; no row means the user does not exist
+        # (or, with expected_version, was modified in the meantime).
+        stmt = update(User).where(User.id == user_id, LIVE_USER)
+        if expected_version is not None:
+            stmt = stmt.where(User.version == expected_version)
+        db_user = db.scalar(
+            stmt.values(**update_data, version=User.version + 1).returning(User)
+        )
         if not db_user:
+            db.rollback()
+            if expected_version is not None and _user_exists(user_id, db):
+                raise precondition_failed()
             return None
-        # Check for email uniqueness if email is being updated
-        if user.email and user.email != db_user.email:
-            existing_user = db.query(User).filter(User.email == user.email).first()
-            if existing_user:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already exists"
-                )
-        # Update fields
-        update_data = user.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_user, key, value)
+        record_changes(db, "update", [db_user])
         db.commit()
-        db.refresh(db_user)
-        logger.info(f"Updated user with ID: {user_id}")
+        logger.info("Updated user with ID: %s", user_id)
         return db_user
+    except IntegrityError as e:
+        db.rollback()
+        if is_email_conflict(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already exists"
+            )
+        logger.error("Failed to update user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        logger.error(f"Failed to update user {user_id}: {str(e)}")
+        logger.error("Failed to update user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
         )
 
-def delete_user(user_id: int, db: Session) -> bool:
+def delete_user(user_id: int, db: Session, expected_version: Optional[int] = None) -> bool:
     """
     Delete a user by ID.
 
+    The row is only marked deleted (see ``User.deleted_at``); it can be
+    restored until the compaction job purges it.
+
     Args:
         user_id: ID of the user to delete.
         db: Database session.
+        expected_version: If set, only delete while the user is at this version.
 
     Returns:
         True if user was deleted, False if user not found.
 
     Raises:
-        HTTPException: If database operation fails or input is invalid.
+        HTTPException: If database operation fails, input is invalid or the
+            user is not at ``expected_version`` (412).
     """
     try:
         if user_id <= 0:
@@ -148,18 +249,80 @@ def delete_user(user_id: int, db: Session) -> bool:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid user ID"
             )
-        db_user = db.query(User).filter(User.id == user_id).first()
-        if not db_user:
+        stmt = update(User).where(User.id == user_id, LIVE_USER)
+        if expected_version is not None:
+            stmt = stmt.where(User.version == expected_version)
+        deleted_id = db.scalar(stmt.values(deleted_at=time.time()).returning(User.id))
+        if deleted_id is None:
+            db.rollback()
+            if expected_version is not None and _user_exists(user_id, db):
+                raise precondition_failed()
             return False
-        db.delete(db_user)
+        record_changes(db, "delete", [deleted_id])
         db.commit()
-        logger.info(f"Deleted user with ID: {user_id}")
+        logger.info("Deleted user with ID: %s", user_id)
         return True
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        logger.error(f"Failed to delete user {user_id}: {str(e)}")
+        logger.error("Failed to delete user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+def restore_user(user_id: int, db: Session) -> User | None:
+    """
+    Undo the delete of a user that has not been purged yet.
+
+    Args:
+        user_id: ID of the deleted user.
+        db: Database session.
+
+    Returns:
+        The restored User object, or None if there is no deleted user with that ID.
+
+    Raises:
+        HTTPException: If database operation fails, input is invalid or
+            another user has taken the email since (400).
+    """
+    try:
+        if user_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        db_user = db.scalar(
+            update(User)
+            .where(User.id == user_id, User.deleted_at.is_not(None))
+            .values(deleted_at=None, version=User.version + 1)
+            .returning(User)
+        )
+        if not db_user:
+            db.rollback()
+            return None
+        record_changes(db, "create", [db_user])
+        db.commit()
+        logger.info("Restored user with ID: %s", user_id)
+        return db_user
+    except IntegrityError as e:
+        db.rollback()
+        if is_email_conflict(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already exists"
+            )
+        logger.error("Failed to restore user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error("Failed to restore user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
@@ -179,12 +342,432 @@ def get_all_users(db: Session) -> List[User]:
         HTTPException: If database operation fails.
     """
     try:
-        users = db.query(User).all()
-        logger.info(f"Retrieved {len(users)} users")
+        users = db.query(User).filter(LIVE_USER).all()
+        logger.info("Retrieved %s users", len(users))
+        return users
+    except Exception as e:
+        logger.error("Failed to retrieve users: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+# Columns GET /users/ can be sorted by; prefix with "-" for descending
+SORT_COLUMNS = {"id": User.id, "age": User.age, "email": User.email}
+
+# Columns of a user as serialized by the API, in app.serialization.USER_FIELDS order
+USER_COLUMNS = (User.id, User.email, User.name, User.age, User.version)
+
+name_search = table(NAME_SEARCH_TABLE, column("rowid"), column(NAME_SEARCH_TABLE))
+
+# SQLite's lower() only folds A-Z, so the indexed expression keeps any other
+# character as is; prefixes must be lowered the same way to match it.
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def _sql_lower(text: str, dialect_name: str) -> str:
+    return text.translate(_ASCII_LOWER) if dialect_name == "sqlite" else text.lower()
+
+def _prefix_range(expression, prefix: str):
+    # A half-open range instead of LIKE, so the lower() expression index is used.
+    last = ord(prefix[-1]) + 1
+    if last > sys.maxunicode:
+        # Nothing sorts after the last code point; fall back to LIKE.
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return expression.like(f"{pattern}%", escape="\\")
+    if 0xD800 <= last <= 0xDFFF:
+        # Surrogates cannot be encoded; the next storable character follows them.
+        last = 0xE000
+    return and_(expression >= prefix, expression < prefix[:-1] + chr(last))
+
+def _after_cursor(sort_column, after_value: Any, after_id: int, descending: bool):
+    # Keyset condition on (sort_column, id). NULLs sort first ascending and
+    # last descending, the same on SQLite and PostgreSQL.
+    if not descending:
+        if after_value is None:
+            return or_(and_(sort_column.is_(None), User.id > after_id), sort_column.is_not(None))
+        return or_(sort_column > after_value, and_(sort_column == after_value, User.id > after_id))
+    if after_value is None:
+        return and_(sort_column.is_(None), User.id < after_id)
+    return or_(
+        sort_column < after_value,
+        and_(sort_column == after_value, User.id < after_id),
+        sort_column.is_(None),
+    )
+
+def users_query(
+    filters: Optional[UserFilter] = None,
+    after_id: int = 0,
+    after_value: Any = None,
+    dialect_name: str = "sqlite",
+):
+    """
+    Build the filtered, keyset-paginated SELECT behind GET /users/.
+
+    Args:
+        filters: Search and sort options; None lists all users by ID.
+        after_id: ID of the last row of the previous page, 0 for the first page.
+        after_value: Sort column value of the last row of the previous page
+            (ignored when sorting by ID).
+        dialect_name: Database dialect; SQLite uses the FTS5 name index
+            when its library supports one.
+
+    Returns:
+        A SELECT of User rows.
+    """
+    filters = filters or UserFilter()
+    stmt = select(User).where(LIVE_USER)
+    if filters.email_prefix:
+        stmt = stmt.where(_prefix_range(func.lower(User.email), _sql_lower(filters.email_prefix, dialect_name)))
+    if filters.name_prefix:
+        stmt = stmt.where(_prefix_range(func.lower(User.name), _sql_lower(filters.name_prefix, dialect_name)))
+    if filters.name:
+        if (
+            dialect_name == "sqlite"
+            and len(filters.name) >= NAME_SEARCH_MIN_LENGTH
+            and name_search_supported()
+        ):
+            phrase = '"' + filters.name.replace('"', '""') + '"'
+            stmt = stmt.where(User.id.in_(
+                select(name_search.c.rowid).where(name_search.c[NAME_SEARCH_TABLE].op("MATCH")(phrase))
+            ))
+        else:
+            pattern = filters.name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            stmt = stmt.where(User.name.ilike(f"%{pattern}%", escape="\\"))
+    if filters.min_age is not None:
+        stmt = stmt.where(User.age >= filters.min_age)
+    if filters.max_age is not None:
+        stmt = stmt.where(User.age <= filters.max_age)
+
+    descending = filters.sort.startswith("-")
+    sort_column = SORT_COLUMNS[filters.sort.lstrip("-")]
+    if sort_column is User.id:
+        if after_id:
+            stmt = stmt.where(User.id < after_id if descending else User.id > after_id)
+        return stmt.order_by(User.id.desc() if descending else User.id)
+    if after_id:
+        stmt = stmt.where(_after_cursor(sort_column, after_value, after_id, descending))
+    if descending:
+        return stmt.order_by(sort_column.desc().nulls_last(), User.id.desc())
+    return stmt.order_by(sort_column.asc().nulls_first(), User.id)
+
+def get_users_page(
+    db: Session,
+    limit: int,
+    after_id: int = 0,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> List[User]:
+    """
+    Retrieve one page of users (keyset pagination), optionally filtered.
+
+    Args:
+        db: Database session.
+        limit: Maximum number of users to return.
+        after_id: ID of the last user of the previous page, 0 for the first page.
+        filters: Search and sort options; None lists all users by ID.
+        after_value: Sort value of the last user of the previous page.
+
+    Returns:
+        List of User objects.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        stmt = users_query(filters, after_id, after_value, db.get_bind().dialect.name)
+        users = db.execute(stmt.limit(limit)).scalars().all()
+        logger.info("Retrieved %s users after ID %s", len(users), after_id)
         return users
     except Exception as e:
-        logger.error(f"Failed to retrieve users: {str(e)}")
+        logger.error("Failed to retrieve users: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+def get_user_rows_page(
+    db: Session,
+    limit: int,
+    after_id: int = 0,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> List[Row]:
+    """
+    Same page as get_users_page, as plain ``USER_COLUMNS`` rows.
+
+    Skips building ORM objects, for responses that are encoded straight to
+    JSON (see ``app.serialization``).
+
+    Returns:
+        List of (id, email, name, age, version) rows.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        stmt = users_query(filters, after_id, after_value, db.get_bind().dialect.name)
+        rows = db.execute(stmt.with_only_columns(*USER_COLUMNS).limit(limit)).all()
+        logger.info("Retrieved %s users after ID %s", len(rows), after_id)
+        return rows
+    except Exception as e:
+        logger.error("Failed to retrieve users: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+def iter_users(
+    db: Session,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> Iterator[User]:
+    """
+    Stream users from a server-side cursor, optionally filtered.
+
+    Rows are fetched ``batch_size`` at a time, so the full result set is
+    never held in memory.
+
+    Args:
+        db: Database session.
+        after_id: Only yield users after this cursor.
+        limit: Maximum number of users to yield, or None for no limit.
+        batch_size: Number of rows fetched per round trip.
+        filters: Search and sort options; None streams all users by ID.
+        after_value: Sort value belonging to the ``after_id`` cursor.
+
+    Yields:
+        User objects.
+    """
+    stmt = users_query(filters, after_id, after_value, db.get_bind().dialect.name)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    yield from result.scalars()
+
+def get_changes(db: Session, since: int, limit: int) -> List[UserChange]:
+    """
+    Retrieve change feed entries after a sequence number, oldest first.
+
+    Args:
+        db: Database session.
+        since: Sequence number of the last change already seen, 0 for all.
+        limit: Maximum number of changes to return.
+
+    Returns:
+        List of UserChange objects.
+
+    Raises:
+        HTTPException: If database operation fails.
+    """
+    try:
+        changes = db.execute(
+            select(UserChange).where(UserChange.seq > since).order_by(UserChange.seq).limit(limit)
+        ).scalars().all()
+        if changes:
+            logger.info("Retrieved %s changes after %s", len(changes), since)
+        return changes
+    except Exception as e:
+        logger.error("Failed to retrieve changes: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+def change_bounds(db: Session) -> Row:
+    """Oldest and newest retained change sequence numbers, (None, None) if there are none."""
+    try:
+        return db.execute(select(func.min(UserChange.seq), func.max(UserChange.seq))).one()
+    except Exception as e:
+        logger.error("Failed to retrieve change bounds: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+def pruned_change_seq(db: Session) -> int:
+    """Highest change sequence number pruned so far (0 if none)."""
+    try:
+        return db.scalar(select(PrunedChanges.max_seq).where(PrunedChanges.id == 1)) or 0
+    except Exception as e:
+        logger.error("Failed to retrieve pruned change sequence: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+def bulk_create_users(
+    users: List[UserCreate], db: Session, chunk_size: int = 500
+) -> BulkOperationResult:
+    """
+    Create many users, committing once per chunk.
+
+    Email uniqueness is checked with one ``IN`` query per chunk and rows are
+    inserted with a single executemany ``INSERT ... RETURNING``. Items that
+    fail validation are reported individually; a database error fails only
+    the chunk it happened in.
+
+    Args:
+        users: UserCreate schemas to insert.
+        db: Database session.
+        chunk_size: Number of users per transaction.
+
+    Returns:
+        BulkOperationResult with created IDs and per-item failures.
+    """
+    result = BulkOperationResult(succeeded=[], failed=[])
+    seen_emails = set()
+    for start, chunk in _chunks(users, chunk_size):
+        existing = set(db.execute(
+            select(User.email).where(User.email.in_({u.email for u in chunk}), LIVE_USER)
+        ).scalars())
+        rows, indexes = [], []
+        for offset, user in enumerate(chunk):
+            index = start + offset
+            if user.email in existing or user.email in seen_emails:
+                result.failed.append(BulkItemError(index=index, detail="Email already exists"))
+                continue
+            seen_emails.add(user.email)
+            rows.append({"email": user.email, "name": user.name, "age": user.age})
+            indexes.append(index)
+        if not rows:
+            continue
+        try:
+            created = db.execute(insert(User).returning(*USER_COLUMNS), rows).all()
+            ids_by_email = {user.email: user.id for user in created}
+            record_changes(db, "create", created)
+            db.commit()
+            result.succeeded.extend(ids_by_email[row["email"]] for row in rows)
+        except Exception as e:
+            db.rollback()
+            logger.error("Failed to create users %s-%s: %s", indexes[0], indexes[-1], e)
+            result.failed.extend(
+                BulkItemError(index=index, detail=f"Database error: {str(e)}") for index in indexes
+            )
+    logger.info("Bulk created %s users, %s failed", len(result.succeeded), len(result.failed))
+    return result
+
+def bulk_update_users(
+    users: List[UserBulkUpdate], db: Session, chunk_size: int = 500
+) -> BulkOperationResult:
+    """
+    Update many users by ID, committing once per chunk.
+
+    Args:
+        users: UserBulkUpdate schemas, each carrying the target user ID.
+        db: Database session.
+        chunk_size: Number of users per transaction.
+
+    Returns:
+        BulkOperationResult with updated IDs and per-item failures.
+    """
+    result = BulkOperationResult(succeeded=[], failed=[])
+    for start, chunk in _chunks(users, chunk_size):
+        ids = {u.id for u in chunk}
+        emails = {u.email for u in chunk if u.email}
+        found = set(db.execute(select(User.id).where(User.id.in_(ids), LIVE_USER)).scalars())
+        email_owners = dict(db.execute(
+            select(User.email, User.id).where(User.email.in_(emails), LIVE_USER)
+        ).all()) if emails else {}
+        rows, indexes, chunk_ids = [], [], set()
+        for offset, user in enumerate(chunk):
+            index = start + offset
+            if user.id <= 0:
+                detail = "Invalid user ID"
+            elif user.id not in found:
+                detail = "User not found"
+            elif user.id in chunk_ids:
+                detail = "Duplicate user ID in request"
+            elif user.email and email_owners.get(user.email, user.id) != user.id:
+                detail = "Email already exists"
+            else:
+                detail = None
+            if detail:
+                result.failed.append(BulkItemError(index=index, id=user.id, detail=detail))
+                continue
+            chunk_ids.add(user.id)
+            if user.email:
+                email_owners[user.email] = user.id
+            values = user.dict(exclude_unset=True)
+            if len(values) > 1:
+                rows.append(values)
+            indexes.append((index, user.id))
+        if not indexes:
+            continue
+        try:
+            if rows:
+                # No ORM objects to refresh here; the extra WHERE needs that said.
+                db.execute(
+                    update(User).where(LIVE_USER).execution_options(synchronize_session=None), rows
+                )
+                updated = db.execute(
+                    update(User)
+                    .where(User.id.in_([row["id"] for row in rows]), LIVE_USER)
+                    .values(version=User.version + 1)
+                    .returning(*USER_COLUMNS)
+                ).all()
+                record_changes(db, "update", updated)
+            db.commit()
+            result.succeeded.extend(user_id for _, user_id in indexes)
+        except Exception as e:
+            db.rollback()
+            logger.error("Failed to update users in chunk at %s: %s", start, e)
+            result.failed.extend(
+                BulkItemError(index=index, id=user_id, detail=f"Database error: {str(e)}")
+                for index, user_id in indexes
+            )
+    logger.info("Bulk updated %s users, %s failed", len(result.succeeded), len(result.failed))
+    return result
+
+def bulk_delete_users(
+    user_ids: List[int], db: Session, chunk_size: int = 500
+) -> BulkOperationResult:
+    """
+    Delete many users by ID with one ``UPDATE ... RETURNING`` per chunk
+    (deletes are soft, see delete_user).
+
+    Args:
+        user_ids: IDs of the users to delete.
+        db: Database session.
+        chunk_size: Number of users per transaction.
+
+    Returns:
+        BulkOperationResult with deleted IDs and per-item failures.
+    """
+    result = BulkOperationResult(succeeded=[], failed=[])
+    seen_ids = set()
+    for start, chunk in _chunks(user_ids, chunk_size):
+        try:
+            deleted = set(db.execute(
+                update(User)
+                .where(User.id.in_(set(chunk)), LIVE_USER)
+                .values(deleted_at=time.time())
+                .returning(User.id)
+            ).scalars())
+            record_changes(db, "delete", sorted(deleted))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Failed to delete users in chunk at %s: %s", start, e)
+            result.failed.extend(
+                BulkItemError(index=start + offset, id=user_id, detail=f"Database error: {str(e)}")
+                for offset, user_id in enumerate(chunk)
+            )
+            continue
+        for offset, user_id in enumerate(chunk):
+            if user_id in deleted:
+                deleted.discard(user_id)
+                seen_ids.add(user_id)
+                result.succeeded.append(user_id)
+            else:
+                # A repeat of an ID deleted earlier in this request
+                detail = "Duplicate user ID in request" if user_id in seen_ids else "User not found"
+                result.failed.append(BulkItemError(index=start + offset, id=user_id, detail=detail))
+    logger.info("Bulk deleted %s users, %s failed", len(result.succeeded), len(result.failed))
+    return result
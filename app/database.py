@@ -1,22 +1,391 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, event, insert, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DatabaseError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from app.config import (
+    USE_ASYNC_DB, SQLITE_PROFILE, SQLITE_PRAGMAS, DATABASE_URL, ASYNC_DATABASE_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS, INIT_LOCK_FILE,
+)
+import hashlib
+import os
+import tempfile
+import threading
+import time
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./user_service.db"
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, initialization is not serialized
+    fcntl = None
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def to_async_url(url: str) -> str:
+    """
+    Swap the driver of a sync database URL for its async counterpart.
+
+    Raises:
+        ValueError: If no async driver is known for the backend.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+ASYNC_SQLALCHEMY_DATABASE_URL = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+
+class PoolCheckoutStats:
+    """Tracks how long sessions wait to obtain a pooled connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.count,
+                "wait_seconds_total": self.total_seconds,
+                "wait_seconds_max": self.max_seconds,
+            }
+
+pool_checkout_stats = PoolCheckoutStats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_stats.observe(time.perf_counter() - started)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait time."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_stats.observe(time.perf_counter() - started)
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    Build create_engine keyword arguments (pooling, timeouts) for a URL.
+
+    Args:
+        url: Database URL the engine will connect to.
+
+    Returns:
+        Keyword arguments for create_engine / create_async_engine.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    options: Dict[str, Any] = {"pool_pre_ping": DB_POOL_PRE_PING}
+    connect_args: Dict[str, Any] = {}
+    in_memory = backend == "sqlite" and parsed.database in (None, "", ":memory:")
+    if in_memory:
+        # One shared connection, otherwise every thread sees its own empty database.
+        options["poolclass"] = StaticPool
+    else:
+        is_async = parsed.get_dialect().is_async
+        options["poolclass"] = TimedAsyncQueuePool if is_async else TimedQueuePool
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if backend == "sqlite":
+        if parsed.get_driver_name() == "pysqlite":
+            connect_args["check_same_thread"] = False
+    elif backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        if parsed.get_driver_name() == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+# Pragmas applied to every new SQLite connection, in order. WAL lets readers
+# proceed while a writer holds the lock; the profiles trade durability for
+# speed. auto_vacuum only takes effect on a new database (it must precede
+# journal_mode) or after a VACUUM; it lets compaction return freed pages.
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "durable": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,  # negative values are KiB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 5000,
+        "cache_size": -256000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+    },
+}
+
+def get_sqlite_pragmas(profile: str = SQLITE_PROFILE, overrides: str = SQLITE_PRAGMAS) -> Dict[str, object]:
+    """
+    Resolve the pragmas for a named profile plus "key=value" overrides.
+
+    Raises:
+        ValueError: If the profile name or an override is malformed.
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for item in filter(None, (part.strip() for part in overrides.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep or not key.strip().isidentifier():
+            raise ValueError(f"Invalid SQLite pragma override: {item}")
+        pragmas[key.strip()] = value.strip()
+    return pragmas
+
+def install_sqlite_pragmas(sync_engine, pragmas: Dict[str, object]) -> None:
+    """Register a connect hook that applies ``pragmas`` to each new connection."""
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+sqlite_pragmas = get_sqlite_pragmas()
+
+# The engines and session factories below (engine, SessionLocal, async_engine,
+# AsyncSessionLocal) are created on first access through the module
+# __getattr__, so importing the app does not load drivers or build pools.
+_engines_lock = threading.Lock()
+
+def _create_engine() -> None:
+    global engine, SessionLocal
+    with _engines_lock:
+        if "engine" in globals():
+            return
+        sync_engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+        install_sqlite_pragmas(sync_engine, sqlite_pragmas)
+        # expire_on_commit=False: returned rows stay loaded, so serializing
+        # them after commit does not issue another SELECT.
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=sync_engine)
+        engine = sync_engine
+
+def _create_async_engine() -> None:
+    global async_engine, AsyncSessionLocal
+    with _engines_lock:
+        if "async_engine" in globals():
+            return
+        if not USE_ASYNC_DB:
+            AsyncSessionLocal = None
+            async_engine = None
+            return
+        # Only pull in the asyncio extension (greenlet + aiosqlite) when it is used.
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+        new_engine = create_async_engine(
+            ASYNC_SQLALCHEMY_DATABASE_URL, **engine_options(ASYNC_SQLALCHEMY_DATABASE_URL)
+        )
+        install_sqlite_pragmas(new_engine.sync_engine, sqlite_pragmas)
+        AsyncSessionLocal = async_sessionmaker(
+            bind=new_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        async_engine = new_engine
+
+def get_engine():
+    """The primary database's sync engine, created on first use."""
+    if "engine" not in globals():
+        _create_engine()
+    return engine
+
+def get_async_engine():
+    """The primary database's async engine (None without USE_ASYNC_DB), created on first use."""
+    if "async_engine" not in globals():
+        _create_async_engine()
+    return async_engine
+
+def __getattr__(name: str) -> Any:
+    if name in ("engine", "SessionLocal"):
+        get_engine()
+    elif name in ("async_engine", "AsyncSessionLocal"):
+        get_async_engine()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return globals()[name]
+
+def _dispose_engines_after_fork() -> None:
+    # A forked worker (e.g. gunicorn --preload) must not share the parent's
+    # pooled connections; dropping the pool makes it open its own.
+    if "engine" in globals():
+        engine.dispose(close=False)
+    if globals().get("async_engine") is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
 
 Base = declarative_base()
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+def _add_missing_columns(connection) -> None:
+    # Columns added to a model after its table was created. Only columns
+    # with a server default or that are nullable can be added in place.
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+            column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"
+            connection.execute(text(ddl))
+
+def schema_fingerprint(dialect) -> str:
+    """Digest of the DDL init_db produces for ``dialect``; changes with any model."""
+    from app import models
+
+    ddl = [f"revision {models.SCHEMA_REVISION}", *models.REPLACED_INDEXES]
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+def stored_fingerprint(connection) -> Optional[str]:
+    """The fingerprint init_db last recorded, or None (no marker yet)."""
+    from app.models import SchemaVersion
+
+    try:
+        return connection.scalar(select(SchemaVersion.__table__.c.fingerprint))
+    except DatabaseError:  # no schema_version table
+        connection.rollback()
+        return None
+
+def init_db(bind=None) -> bool:
+    """
+    Create or migrate the schema on ``bind`` (default: the primary engine).
+
+    The schema is only inspected when the fingerprint recorded by the last
+    run differs from the models' (see schema_fingerprint); otherwise this
+    costs one query.
+
+    Returns:
+        True if the schema was checked and updated, False if it was current.
+    """
+    from app import models
+
+    bind = bind if bind is not None else get_engine()
+    fingerprint = schema_fingerprint(bind.dialect)
+    with bind.connect() as connection:
+        if stored_fingerprint(connection) == fingerprint:
+            return False
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as connection:
+        _add_missing_columns(connection)
+        # create_all skips indexes of tables that already exist
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        for name in models.REPLACED_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        models.create_name_search(connection)
+        connection.execute(delete(models.SchemaVersion))
+        connection.execute(insert(models.SchemaVersion).values(fingerprint=fingerprint, updated_at=time.time()))
+    return True
+
+def init_lock_path() -> str:
+    """Path of the lock file guarding init_db (see INIT_LOCK_FILE)."""
+    if INIT_LOCK_FILE:
+        return INIT_LOCK_FILE
+    parsed = make_url(SQLALCHEMY_DATABASE_URL)
+    if parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:"):
+        return f"{parsed.database}.init.lock"
+    return os.path.join(tempfile.gettempdir(), "user-service-init.lock")
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock on ``path`` (created if missing) for the block."""
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def initialize_database() -> None:
+    """
+    Run init_db under the init file lock.
+
+    Every worker calls this on startup; the lock makes them take turns, and
+    all but the first find the schema already in place.
+    """
+    with file_lock(init_lock_path()):
+        init_db()
+
+def pool_status() -> Dict[str, Any]:
+    """Report pool occupancy for the engine serving requests, plus checkout wait stats."""
+    serving = get_async_engine()
+    pool = (serving.sync_engine if serving is not None else get_engine()).pool
+    status = {"pool": pool.status()}
+    for name in ("size", "checkedout", "overflow", "checkedin"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    status.update(pool_checkout_stats.snapshot())
+    return status
 
 def get_db():
+    get_engine()  # creates SessionLocal on first use
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    get_async_engine()  # creates AsyncSessionLocal on first use
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,80 @@
+import hashlib
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, status
+
+def user_etag(user_id: int, version: int) -> str:
+    """Strong ETag for one user; it changes whenever the user's version does."""
+    return f'"{user_id}.{version}"'
+
+def collection_etag(users: Iterable, query: str) -> str:
+    """Strong ETag for a page of users: a digest of the query and each row's id and version."""
+    digest = hashlib.sha1(query.encode())
+    for user in users:
+        user_id, version = (user["id"], user["version"]) if isinstance(user, dict) else (user.id, user.version)
+        digest.update(f"|{user_id}.{version}".encode())
+    return f'"{digest.hexdigest()}"'
+
+# Content codings whose variants carry a suffixed ETag (see encoded_etag)
+ENCODINGS = ("gzip", "br", "zstd")
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of the ``encoding``-compressed variant: ``"1.2"`` becomes ``"1.2-gzip"``."""
+    return f'{etag[:-1]}-{encoding}"'
+
+def strip_encoding(tag: str) -> str:
+    """The ETag a compressed variant's tag was derived from (``tag`` itself if none)."""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+def parse_etags(header: Optional[str]) -> List[str]:
+    """Split an If-Match / If-None-Match header into its entity tags."""
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison used for If-None-Match: "*" or any listed tag, ignoring
+    a W/ prefix, matches. So does a compressed variant's tag of ``etag``:
+    decoded, it is the same representation.
+    """
+    tags = parse_etags(header)
+    if "*" in tags:
+        return True
+    for tag in tags:
+        tag = tag[2:] if tag.startswith("W/") else tag
+        if tag == etag or strip_encoding(tag) == etag:
+            return True
+    return False
+
+def if_match_version(header: Optional[str], user_id: int) -> Optional[int]:
+    """
+    Resolve an If-Match header to the user version the client expects.
+
+    Returns:
+        None if the header is absent or "*" (any version), else the version.
+
+    Raises:
+        HTTPException: 412 if no listed tag is a strong ETag for this user
+            (or for a compressed variant of it).
+    """
+    tags = parse_etags(header)
+    if not tags or "*" in tags:
+        return None
+    for tag in tags:
+        value = strip_encoding(tag).strip('"')
+        prefix, _, version = value.partition(".")
+        if not tag.startswith("W/") and prefix == str(user_id) and version.isdigit():
+            return int(version)
+    raise precondition_failed()
+
+def precondition_failed() -> HTTPException:
+    """The 412 for an If-Match that matches no current representation."""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Precondition failed: ETag does not match"
+    )
@@ -0,0 +1,211 @@
+"""
+Logging that stays off the request path.
+
+configure_logging() puts a queue handler on the root logger. A request
+only builds the log record and hands it to the queue; a background thread
+formats it (as text or one JSON object per line) and writes it. When the
+queue is full the record is dropped and counted rather than blocking.
+
+RequestContextMiddleware gives every request an ID, taken from the
+request header when the client sent a usable one, and echoes it in the
+response. Records logged while the request runs (in threadpool workers
+too) carry it as ``request_id``. It also draws the request's sampling
+number, so a request keeps all or none of its INFO and DEBUG records.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Set per request by RequestContextMiddleware
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+# The request's draw in [0, 100); records outside a request are never sampled out.
+_sample_draw: ContextVar[float] = ContextVar("log_sample_draw", default=0.0)
+
+# Client-supplied IDs are echoed and logged, so only short plain tokens are accepted.
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+# Uvicorn gives these loggers their own stream handlers; routing them to the
+# root logger moves the access log, written once per request, onto the queue.
+SERVER_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Attributes every LogRecord has; anything else was passed with ``extra``
+# (except uvicorn's ANSI-colored copy of the message).
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {
+    "message", "asctime", "request_id", "taskName", "color_message"
+}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with ``extra`` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for a background writer without ever waiting.
+
+    Runs on the caller's thread, so it also stamps the current request ID
+    and drops INFO and DEBUG records of requests outside the
+    ``sample_percent`` sample.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_percent: float = 100):
+        super().__init__(log_queue)
+        self.sample_percent = sample_percent
+        self.queued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord):
+        if record.levelno < logging.WARNING and _sample_draw.get() >= self.sample_percent:
+            self.sampled_out += 1
+            return False
+        record.request_id = request_id.get()
+        return super().filter(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in this process, so the record needs no pickling;
+        # formatting (the default's work) is left to the writer thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued_total": self.queued,
+            "dropped_total": self.dropped,
+            "sampled_out_total": self.sampled_out,
+            "queue_depth": self.queue.qsize(),
+        }
+
+log_handler: Optional[QueueLogHandler] = None
+listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(
+    log_format: str = "text",
+    level: str = "INFO",
+    levels: Optional[Dict[str, str]] = None,
+    queue_size: int = 10000,
+    sample_percent: float = 100,
+) -> QueueLogHandler:
+    """
+    Route all logging through a bounded queue to a background writer.
+
+    Handlers already on the root logger (e.g. from a process manager) are
+    moved behind the queue; without any, records go to stderr. With
+    ``log_format="json"`` every writer uses JsonFormatter. ``levels`` maps
+    logger names to levels overriding ``level``. Calling it again only
+    returns the handler installed the first time.
+    """
+    global log_handler, listener
+    if log_handler is not None:
+        return log_handler
+
+    root = logging.getLogger()
+    writers = list(root.handlers) or [logging.StreamHandler(sys.stderr)]
+    for writer in writers:
+        root.removeHandler(writer)
+        if log_format == "json":
+            writer.setFormatter(JsonFormatter())
+        elif writer.formatter is None:
+            writer.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    log_handler = QueueLogHandler(queue.Queue(max(queue_size, 1)), sample_percent)
+    root.addHandler(log_handler)
+    root.setLevel(level)
+    for name in SERVER_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.handlers.clear()
+        server_logger.propagate = True
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listener = logging.handlers.QueueListener(log_handler.queue, *writers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener)
+    return log_handler
+
+def _stop_listener() -> None:
+    # Writes out whatever is still queued.
+    if listener is not None:
+        listener.stop()
+
+def _restart_listener_after_fork() -> None:
+    # The writer thread does not survive a fork (e.g. gunicorn --preload), and
+    # the parent's queue may have been locked mid-put; start over in the child.
+    global listener
+    if listener is None:
+        return
+    log_handler.queue = queue.Queue(log_handler.queue.maxsize)
+    listener = logging.handlers.QueueListener(log_handler.queue, *listener.handlers, respect_handler_level=True)
+    listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that sets the request ID and sampling draw for log
+    records, and returns the ID in the ``header`` response header.
+    """
+
+    def __init__(self, app, header: str = "X-Request-ID"):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+
+    def _incoming_id(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                candidate = value.decode("latin-1")
+                return candidate if _VALID_REQUEST_ID.fullmatch(candidate) else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current_id = self._incoming_id(scope) or uuid.uuid4().hex
+        id_token = request_id.set(current_id)
+        draw_token = _sample_draw.set(random.random() * 100)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (self.header, current_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _sample_draw.reset(draw_token)
+            request_id.reset(id_token)
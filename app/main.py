@@ -1,464 +1,692 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
-from app.schemas import UserCreate, UserUpdate, UserResponse
-from app.crud import create_user, get_user, update_user, delete_user, get_all_users
-from app.database import init_db, get_db
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from app.schemas import (
+    BulkOperationResult, ChangesPage, ImportResult, UserBulkDelete, UserBulkUpdate, UserCreate,
+    UserFilter, UserResponse, UserUpdate
+)
+from app import crud, database
+from app.cache import create_cache, user_cache_key, user_to_dict
+from app.config import (
+    USE_ASYNC_DB, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, BULK_CHUNK_SIZE, MAX_BULK_ITEMS,
+    IMPORT_MAX_LINE_LENGTH, IMPORT_MAX_ERRORS,
+    USER_CACHE_BACKEND, USER_CACHE_SIZE, USER_CACHE_TTL, CREATE_BATCHING, CREATE_BATCH_MAX_ROWS,
+    CREATE_BATCH_MAX_DELAY_MS, CREATE_QUEUE_MAX_SIZE, CREATE_QUEUE_TIMEOUT_MS, METRICS_ENABLED,
+    METRICS_SERVER_TIMING, COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_LEVEL, COMPRESSION_ZSTD_LEVEL, HTML_CACHE_MAX_AGE,
+    REPLICA_CHECK_INTERVAL_MS, READ_YOUR_WRITES_MS, COALESCE_READS, CHANGES_MAX_WAIT_SECONDS,
+    CHANGES_KEEPALIVE_SECONDS, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_KEY_HEADER,
+    WRITE_CONCURRENCY, WRITE_QUEUE_SIZE, WRITE_QUEUE_TIMEOUT_MS, COMPACTION_INTERVAL_SECONDS, LOG_FORMAT,
+    LOG_LEVEL, LOG_LEVELS, LOG_QUEUE_SIZE, LOG_SAMPLE_PERCENT, REQUEST_ID_HEADER
+)
+from app.admission import AdmissionMiddleware, ConcurrencyLimiter, TokenBucketLimiter
+from app.changes import change_feed, change_to_dict
+from app.compaction import compactor
+from app.compression import CompressionMiddleware, PrecompressedPage
+from app.database import initialize_database, get_db, get_async_db
+from app.http_cache import (
+    collection_etag, etag_matches, if_match_version, parse_etags, precondition_failed, user_etag
+)
+from app.logs import RequestContextMiddleware, configure_logging
+from app.metrics import MetricsMiddleware, instrument_engine, registry
+from app.pages import render_template
+from app.replicas import ReadYourWritesMiddleware, get_async_read_db, get_read_db, replica_router
+from app.serialization import dumps, user_rows_to_json, users_to_csv
+from app.sharding import get_sharded_db, shard_set
+from app.single_flight import SingleFlight
+from app.user_import import detect_format, import_stats, import_users
+from app.write_queue import CreateUserBatcher
+import base64
+import inspect
+import json
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging: records are written by a background thread, off the request path.
+log_handler = configure_logging(LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_QUEUE_SIZE, LOG_SAMPLE_PERCENT)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="User Service API")
+# Group-commit writer for POST /users/, enabled with CREATE_BATCHING
+# (writes to DATABASE_URL, so it is not used with shards)
+create_batcher = CreateUserBatcher(
+    max_rows=CREATE_BATCH_MAX_ROWS,
+    max_delay_ms=CREATE_BATCH_MAX_DELAY_MS,
+    max_queue_size=CREATE_QUEUE_MAX_SIZE,
+    enqueue_timeout_ms=CREATE_QUEUE_TIMEOUT_MS,
+) if CREATE_BATCHING and shard_set is None else None
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Adjust for production to specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engines are created here, on first use, rather than when app.main is imported.
+    if METRICS_ENABLED:
+        instrument_engine(database.engine)
+        if database.async_engine is not None:
+            instrument_engine(database.async_engine.sync_engine)
+        if shard_set is not None:
+            for shard in shard_set.shards:
+                instrument_engine(shard.engine)
+        if replica_router is not None:
+            for replica in replica_router.replicas:
+                instrument_engine(replica.engine)
+                if replica.async_engine is not None:
+                    instrument_engine(replica.async_engine.sync_engine)
+    # Compressing the pages at maximum level takes a while; keep it off the loop.
+    for page in (root_page, manage_users_page):
+        await run_in_threadpool(page.compress_variants)
+    # Runs once per worker process; concurrent workers take turns on the init lock.
+    initialize_database()
+    if shard_set is not None:
+        shard_set.initialize()
+    if create_batcher is not None:
+        create_batcher.start()
+    if replica_router is not None:
+        replica_router.start(REPLICA_CHECK_INTERVAL_MS / 1000)
+    if change_feed is not None:
+        change_feed.start()
+    if COMPACTION_INTERVAL_SECONDS > 0:
+        compactor.start(COMPACTION_INTERVAL_SECONDS)
+    yield
+    await compactor.stop()
+    if change_feed is not None:
+        await change_feed.stop()
+    if replica_router is not None:
+        await replica_router.stop()
+    if create_batcher is not None:
+        await create_batcher.stop()
+
+router = APIRouter()
+
+# Pick the data path: native async sessions, or the sync CRUD layer run in a
+# worker thread so a slow query never stalls the event loop.
+# Reads that may be served by a replica use get_read_session. With shards,
+# every call goes through the sharded CRUD layer, run in a worker thread.
+if shard_set is not None:
+    from app import shard_crud as crud_backend
+    get_session = get_sharded_db
+    get_read_session = get_sharded_db
+elif USE_ASYNC_DB:
+    from app import async_crud as crud_backend
+    get_session = get_async_db
+    get_read_session = get_async_read_db
+else:
+    crud_backend = crud
+    get_session = get_db
+    get_read_session = get_read_db
+
+async def run_crud(func, *args):
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    return await run_in_threadpool(func, *args)
+
+# Read-through cache for single-user reads; writes keep it coherent.
+user_cache = create_cache(USER_CACHE_BACKEND, USER_CACHE_SIZE, USER_CACHE_TTL)
+registry.register_collector("user_cache", user_cache.stats)
+
+# Single-flight for reads: concurrent misses on one user, or identical page
+# requests, share one query. Keys separate replica from primary reads, so a
+# read-your-writes request never gets a replica's result.
+user_reads = SingleFlight(enabled=COALESCE_READS)
+page_reads = SingleFlight(enabled=COALESCE_READS)
+registry.register_collector("coalesced_user_reads", user_reads.stats)
+registry.register_collector("coalesced_page_reads", page_reads.stats)
+
+# Writes per user, striped by id so the table never grows. A read that loaded
+# a user while a write to it committed skips caching the possibly stale row.
+_user_writes = [0] * 4096
+
+def _user_write_count(user_id: int) -> int:
+    return _user_writes[user_id % len(_user_writes)]
+
+def _invalidate_pages() -> None:
+    # List requests starting after a write (any create, update or delete) must
+    # not join one that began before it and may miss the write.
+    page_reads.forget_all()
+
+def _invalidate_user(user_id: int) -> None:
+    _user_writes[user_id % len(_user_writes)] += 1
+    user_cache.delete(user_cache_key(user_id))
+    # Reads starting after a write must not join a flight that began before it.
+    user_reads.forget((user_id, False))
+    user_reads.forget((user_id, True))
+    _invalidate_pages()
+
+registry.register_collector("db_pool", database.pool_status)
+if create_batcher is not None:
+    registry.register_collector("create_queue", create_batcher.stats)
+if replica_router is not None:
+    registry.register_collector("db_replicas", replica_router.stats)
+registry.register_collector("user_import", import_stats.stats)
+if change_feed is not None:
+    registry.register_collector("change_feed", change_feed.stats)
+registry.register_collector("compaction", compactor.stats)
+registry.register_collector("logging", log_handler.stats)
 
-# Initialize the database
-init_db()
-
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
-    logger.info("Serving root endpoint")
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>User Service API</title>
-        <script src="https://cdn.tailwindcss.com"></script>
-        <style>
-            @keyframes fadeInDown {
-                0% { opacity: 0; transform: translateY(-20px); }
-                100% { opacity: 1; transform: translateY(0); }
-            }
-            @keyframes slideInUp {
-                0% { opacity: 0; transform: translateY(20px); }
-                100% { opacity: 1; transform: translateY(0); }
-            }
-            @keyframes slideInLeft {
-                0% { opacity: 0; transform: translateX(-20px); }
-                100% { opacity: 1; transform: translateX(0); }
-            }
-            .animate-fadeInDown {
-                animation: fadeInDown 0.8s ease-out;
-            }
-            .animate-slideInUp {
-                animation: slideInUp 0.8s ease-out;
-            }
-            .animate-slideInLeft {
-                animation: slideInLeft 0.8s ease-out both;
-            }
-            .card-hover:hover {
-                transform: translateY(-5px);
-                box-shadow: 0 10px 20px rgba(0, 0, 0, 0.15);
-            }
-            html {
-                scroll-behavior: smooth;
-            }
-        </style>
-    </head>
-    <body class="bg-gray-50 font-sans antialiased">
-        <div class="min-h-screen flex flex-col">
-            <header class="bg-gradient-to-r from-blue-700 to-indigo-600 text-white py-12">
-                <div class="container mx-auto px-4 text-center animate-fadeInDown">
-                    <h1 class="text-5xl font-extrabold mb-4">User Service API</h1>
-                    <p class="text-xl max-w-2xl mx-auto">
-                        A powerful, scalable, and secure API for managing user data with ease.
-                    </p>
-                    <a href="/manage-users" class="mt-6 inline-block bg-white text-blue-700 px-8 py-4 rounded-full font-semibold text-lg hover:bg-blue-100 transition duration-300">
-                        Manage Users
-                    </a>
-                    <a href="/docs" class="mt-4 ml-4 inline-block bg-transparent border-2 border-white text-white px-8 py-4 rounded-full font-semibold text-lg hover:bg-white hover:text-blue-700 transition duration-300">
-                        API Documentation
-                    </a>
-                </div>
-            </header>
-            <main class="container mx-auto px-4 py-16 flex-grow">
-                <section class="text-center mb-16 animate-slideInUp">
-                    <h2 class="text-3xl font-bold text-gray-800 mb-4">Why User Service API?</h2>
-                    <p class="text-lg text-gray-600 max-w-3xl mx-auto">
-                        Built with FastAPI and SQLAlchemy, our API offers robust endpoints for creating, reading, updating, and deleting user information, all backed by a reliable SQLite database.
-                    </p>
-                </section>
-                <section class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-8 mb-16">
-                    <div class="bg-white shadow-lg rounded-xl p-6 animate-slideInLeft card-hover transition duration-300" style="animation-delay: 0.1s;">
-                        <h3 class="text-xl font-semibold text-gray-800 mb-3">Create User</h3>
-                        <p class="text-gray-600 mb-4">Easily add new users with email, name, and optional age fields.</p>
-                        <code class="block bg-gray-100 p-3 rounded-lg text-sm font-mono">POST /users/</code>
-                    </div>
-                    <div class="bg-white shadow-lg rounded-xl p-6 animate-slideInLeft card-hover transition duration-300" style="animation-delay: 0.2s;">
-                        <h3 class="text-xl font-semibold text-gray-800 mb-3">Read User</h3>
-                        <p class="text-gray-600 mb-4">Retrieve detailed user information by their unique ID.</p>
-                        <code class="block bg-gray-100 p-3 rounded-lg text-sm font-mono">GET /users/{user_id}</code>
-                    </div>
-                    <div class="bg-white shadow-lg rounded-xl p-6 animate-slideInLeft card-hover transition duration-300" style="animation-delay: 0.3s;">
-                        <h3 class="text-xl font-semibold text-gray-800 mb-3">Update User</h3>
-                        <p class="text-gray-600 mb-4">Modify existing user details with flexible updates.</p>
-                        <code class="block bg-gray-100 p-3 rounded-lg text-sm font-mono">PUT /users/{user_id}</code>
-                    </div>
-                    <div class="bg-white shadow-lg rounded-xl p-6 animate-slideInLeft card-hover transition duration-300" style="animation-delay: 0.4s;">
-                        <h3 class="text-xl font-semibold text-gray-800 mb-3">Delete User</h3>
-                        <p class="text-gray-600 mb-4">Securely remove users from the database by ID.</p>
-                        <code class="block bg-gray-100 p-3 rounded-lg text-sm font-mono">DELETE /users/{user_id}</code>
-                    </div>
-                </section>
-                <section class="text-center animate-slideInUp">
-                    <h2 class="text-3xl font-bold text-gray-800 mb-4">Get Started Today</h2>
-                    <p class="text-lg text-gray-600 max-w-2xl mx-auto mb-6">
-                        Dive into our interactive API documentation or manage users directly with our intuitive interface.
-                    </p>
-                    <a href="/manage-users" class="inline-block bg-blue-600 text-white px-8 py-4 rounded-full font-semibold text-lg hover:bg-blue-700 transition duration-300">
-                        Manage Users
-                    </a>
-                </section>
-            </main>
-            <footer class="bg-gray-900 text-white py-8">
-                <div class="container mx-auto px-4 text-center">
-                    <p class="text-sm">© 2025 User Service API. All rights reserved.</p>
-                    <p class="mt-2 text-sm">
-                        Powered by <a href="https://fastapi.tiangolo.com/" class="underline hover:text-blue-300">FastAPI</a> & <a href="https://www.sqlalchemy.org/" class="underline hover:text-blue-300">SQLAlchemy</a>.
-                    </p>
-                </div>
-            </footer>
-        </div>
-    </body>
-    </html>
+# Admission control: shed excess load with 429/503 instead of queueing it
+# on the database write lock until requests time out.
+rate_limiter = TokenBucketLimiter(
+    RATE_LIMIT_PER_SECOND, max(RATE_LIMIT_BURST, 1)
+) if RATE_LIMIT_PER_SECOND > 0 else None
+write_limiter = ConcurrencyLimiter(
+    WRITE_CONCURRENCY, WRITE_QUEUE_SIZE, WRITE_QUEUE_TIMEOUT_MS / 1000
+) if WRITE_CONCURRENCY > 0 else None
+if rate_limiter is not None:
+    registry.register_collector("rate_limit", rate_limiter.stats)
+if write_limiter is not None:
+    registry.register_collector("write_admission", write_limiter.stats)
+
+def _ndjson_chunk(users) -> bytes:
+    return b"".join(
+        dumps(user_to_dict(u)) + b"\n"
+        for u in users
+    )
+
+def _encode_cursor(value, user_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, user_id]).encode()).decode()
+
+def _decode_cursor(cursor: str, sort_key: str):
     """
-    return HTMLResponse(content=html_content)
-
-@app.get("/manage-users", response_class=HTMLResponse)
-async def manage_users():
-    logger.info("Serving manage-users endpoint")
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Manage Users - User Service API</title>
-        <script src="https://cdn.tailwindcss.com"></script>
-        <style>
-            @keyframes fadeIn {
-                0% { opacity: 0; }
-                100% { opacity: 1; }
-            }
-            @keyframes slideInUp {
-                0% { opacity: 0; transform: translateY(20px); }
-                100% { opacity: 1; transform: translateY(0); }
-            }
-            .animate-fadeIn {
-                animation: fadeIn 0.6s ease-out;
-            }
-            .animate-slideInUp {
-                animation: slideInUp 0.8s ease-out;
-            }
-            .btn-hover:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-            }
-            .message {
-                transition: opacity 0.3s ease-in-out;
-            }
-            html {
-                scroll-behavior: smooth;
-            }
-        </style>
-    </head>
-    <body class="bg-gray-50 font-sans antialiased">
-        <div class="min-h-screen flex flex-col">
-            <header class="bg-gradient-to-r from-blue-700 to-indigo-600 text-white py-12">
-                <div class="container mx-auto px-4 text-center animate-fadeIn">
-                    <h1 class="text-4xl font-extrabold mb-4">Manage Users</h1>
-                    <p class="text-lg max-w-2xl mx-auto">
-                        Easily add, delete, or view all users in the system with our intuitive interface.
-                    </p>
-                    <a href="/" class="mt-4 inline-block bg-transparent border-2 border-white text-white px-6 py-3 rounded-full font-semibold hover:bg-white hover:text-blue-700 transition duration-300">
-                        Back to Home
-                    </a>
-                </div>
-            </header>
-            <main class="container mx-auto px-4 py-12 flex-grow">
-                <div class="grid grid-cols-1 md:grid-cols-2 gap-8 mb-12">
-                    <section class="bg-white shadow-lg rounded-xl p-8 animate-slideInUp">
-                        <h2 class="text-2xl font-semibold text-gray-800 mb-6">Add New User</h2>
-                        <div id="add-user-message" class="hidden mb-4 p-4 rounded-lg"></div>
-                        <div class="space-y-4">
-                            <div>
-                                <label for="email" class="block text-sm font-medium text-gray-700">Email</label>
-                                <input type="email" id="email" name="email" required class="mt-1 w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-blue-500" placeholder="Enter email">
-                            </div>
-                            <div>
-                                <label for="name" class="block text-sm font-medium text-gray-700">Name</label>
-                                <input type="text" id="name" name="name" required class="mt-1 w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-blue-500" placeholder="Enter name">
-                            </div>
-                            <div>
-                                <label for="age" class="block text-sm font-medium text-gray-700">Age (Optional)</label>
-                                <input type="number" id="age" name="age" class="mt-1 w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-blue-500" placeholder="Enter age">
-                            </div>
-                            <button onclick="addUser()" class="w-full bg-blue-600 text-white px-6 py-3 rounded-lg font-semibold btn-hover transition duration-300">Add User</button>
-                        </div>
-                    </section>
-                    <section class="bg-white shadow-lg rounded-xl p-8 animate-slideInUp" style="animation-delay: 0.2s;">
-                        <h2 class="text-2xl font-semibold text-gray-800 mb-6">Delete User</h2>
-                        <div id="delete-user-message" class="hidden mb-4 p-4 rounded-lg"></div>
-                        <div class="space-y-4">
-                            <div>
-                                <label for="user_id" class="block text-sm font-medium text-gray-700">User ID</label>
-                                <input type="number" id="user_id" name="user_id" required class="mt-1 w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-blue-500" placeholder="Enter user ID">
-                            </div>
-                            <button onclick="deleteUser()" class="w-full bg-red-600 text-white px-6 py-3 rounded-lg font-semibold btn-hover transition duration-300">Delete User</button>
-                        </div>
-                    </section>
-                </div>
-                <section class="bg-white shadow-lg rounded-xl p-8 animate-slideInUp" style="animation-delay: 0.4s;">
-                    <h2 class="text-2xl font-semibold text-gray-800 mb-6">All Users</h2>
-                    <div id="users-message" class="hidden mb-4 p-4 rounded-lg"></div>
-                    <button onclick="fetchUsers()" class="mb-6 bg-indigo-600 text-white px-6 py-3 rounded-lg font-semibold btn-hover transition duration-300">Refresh User List</button>
-                    <div class="overflow-x-auto">
-                        <table id="users-table" class="min-w-full divide-y divide-gray-200">
-                            <thead class="bg-gray-50">
-                                <tr>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">ID</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Email</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Name</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Age</th>
-                                </tr>
-                            </thead>
-                            <tbody id="users-table-body" class="bg-white divide-y divide-gray-200">
-                                <!-- Users will be populated here -->
-                            </tbody>
-                        </table>
-                    </div>
-                </section>
-            </main>
-            <footer class="bg-gray-900 text-white py-8">
-                <div class="container mx-auto px-4 text-center">
-                    <p class="text-sm">© 2025 User Service API. All rights reserved.</p>
-                    <p class="mt-2 text-sm">
-                        Powered by <a href="https://fastapi.tiangolo.com/" class="underline hover:text-blue-300">FastAPI</a> & <a href="https://www.sqlalchemy.org/" class="underline hover:text-blue-300">SQLAlchemy</a>.
-                    </p>
-                </div>
-            </footer>
-        </div>
-        <script>
-            async function addUser() {
-                const messageDiv = document.getElementById('add-user-message');
-                messageDiv.classList.add('hidden');
-                messageDiv.classList.remove('bg-green-100', 'text-green-700', 'bg-red-100', 'text-red-700');
-
-                const email = document.getElementById('email').value;
-                const name = document.getElementById('name').value;
-                const age = document.getElementById('age').value || null;
-
-                try {
-                    const response = await fetch('/users/', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ email, name, age: age ? parseInt(age) : null })
-                    });
-                    if (!response.ok) {
-                        const text = await response.text();
-                        console.error('Add User Error Response:', text);
-                        let errorDetail;
-                        try {
-                            errorDetail = JSON.parse(text).detail;
-                        } catch {
-                            errorDetail = text || 'Failed to create user';
-                        }
-                        throw new Error(errorDetail);
-                    }
-                    const data = await response.json();
-                    messageDiv.classList.remove('hidden');
-                    messageDiv.classList.add('bg-green-100', 'text-green-700');
-                    messageDiv.textContent = `User created successfully! ID: ${data.id}`;
-                    document.getElementById('email').value = '';
-                    document.getElementById('name').value = '';
-                    document.getElementById('age').value = '';
-                    fetchUsers(); // Refresh user list
-                } catch (error) {
-                    messageDiv.classList.remove('hidden');
-                    messageDiv.classList.add('bg-red-100', 'text-red-700');
-                    messageDiv.textContent = error.message;
-                }
-            }
-
-            async function deleteUser() {
-                const messageDiv = document.getElementById('delete-user-message');
-                messageDiv.classList.add('hidden');
-                messageDiv.classList.remove('bg-green-100', 'text-green-700', 'bg-red-100', 'text-red-700');
-
-                const user_id = document.getElementById('user_id').value;
-
-                try {
-                    const response = await fetch(`/users/${user_id}`, {
-                        method: 'DELETE',
-                        headers: { 'Content-Type': 'application/json' }
-                    });
-                    if (!response.ok) {
-                        const text = await response.text();
-                        console.error('Delete User Error Response:', text);
-                        let errorDetail;
-                        try {
-                            errorDetail = JSON.parse(text).detail;
-                        } catch {
-                            errorDetail = text || 'Failed to delete user';
-                        }
-                        throw new Error(errorDetail);
-                    }
-                    const data = await response.json();
-                    messageDiv.classList.remove('hidden');
-                    messageDiv.classList.add('bg-green-100', 'text-green-700');
-                    messageDiv.textContent = data.message;
-                    document.getElementById('user_id').value = '';
-                    fetchUsers(); // Refresh user list
-                } catch (error) {
-                    messageDiv.classList.remove('hidden');
-                    messageDiv.classList.add('bg-red-100', 'text-red-700');
-                    messageDiv.textContent = error.message;
-                }
-            }
-
-            async function fetchUsers() {
-                const messageDiv = document.getElementById('users-message');
-                const tableBody = document.getElementById('users-table-body');
-                messageDiv.classList.add('hidden');
-                messageDiv.classList.remove('bg-green-100', 'text-green-700', 'bg-red-100', 'text-red-700');
-
-                try {
-                    const response = await fetch('/users/', {
-                        method: 'GET',
-                        headers: { 'Content-Type': 'application/json' }
-                    });
-                    if (!response.ok) {
-                        const text = await response.text();
-                        console.error('Fetch Users Error Response:', text);
-                        let errorDetail;
-                        try {
-                            errorDetail = JSON.parse(text).detail;
-                        } catch {
-                            errorDetail = text || 'Failed to fetch users';
-                        }
-                        throw new Error(errorDetail);
-                    }
-                    const data = await response.json();
-                    tableBody.innerHTML = '';
-                    if (data.length === 0) {
-                        tableBody.innerHTML = '<tr><td colspan="4" class="px-6 py-4 text-center text-gray-500">No users found</td></tr>';
-                    } else {
-                        data.forEach(user => {
-                            const row = document.createElement('tr');
-                            row.innerHTML = `
-                                <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${user.id}</td>
-                                <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${user.email}</td>
-                                <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${user.name}</td>
-                                <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${user.age || '-'}</td>
-                            `;
-                            tableBody.appendChild(row);
-                        });
-                    }
-                } catch (error) {
-                    messageDiv.classList.remove('hidden');
-                    messageDiv.classList.add('bg-red-100', 'text-red-700');
-                    messageDiv.textContent = error.message;
-                }
-            }
-
-            document.addEventListener('DOMContentLoaded', fetchUsers);
-        </script>
-    </body>
-    </html>
+    Turn a ``cursor`` query parameter back into ``(after_value, after_id)``.
+
+    Sorted by id, the cursor is the last user ID itself (as sent in
+    X-Next-Cursor); otherwise it is the encoded sort value and ID.
     """
-    return HTMLResponse(content=html_content)
+    try:
+        if sort_key == "id":
+            value, user_id = None, int(cursor)
+        else:
+            value, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            user_id = int(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if user_id < 0 or isinstance(value, bool) or not isinstance(value, (int, str, type(None))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, user_id
+
+def _csv_chunk(users) -> bytes:
+    return users_to_csv(users)
+
+async def _stream_users_async(
+    session_factory, after_id: int, limit: Optional[int], filters: UserFilter, after_value=None,
+    encode=_ndjson_chunk, prefix: bytes = b"",
+):
+    # Streaming outlives the request dependency, so it owns its own session.
+    if prefix:
+        yield prefix
+    async with session_factory() as db:
+        batch = []
+        async for user in crud_backend.iter_users(
+            db, after_id, limit, STREAM_BATCH_SIZE, filters, after_value
+        ):
+            batch.append(user)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield encode(batch)
+                batch = []
+        if batch:
+            yield encode(batch)
 
-@app.get("/users/", response_model=List[UserResponse])
-async def get_all_users_endpoint(db: Session = Depends(get_db)):
+def _stream_users_sync(
+    session_factory, after_id: int, limit: Optional[int], filters: UserFilter, after_value=None,
+    encode=_ndjson_chunk, prefix: bytes = b"",
+):
+    if prefix:
+        yield prefix
+    db = session_factory()
     try:
-        users = get_all_users(db)
-        logger.info(f"Retrieved {len(users)} users from endpoint")
-        return users
+        batch = []
+        for user in crud_backend.iter_users(db, after_id, limit, STREAM_BATCH_SIZE, filters, after_value):
+            batch.append(user)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield encode(batch)
+                batch = []
+        if batch:
+            yield encode(batch)
+    finally:
+        db.close()
+
+def _stream_users(*args, **kwargs):
+    # The stream matches the backend's iter_users: async generator or plain one.
+    if inspect.isasyncgenfunction(crud_backend.iter_users):
+        return _stream_users_async(*args, **kwargs)
+    return _stream_users_sync(*args, **kwargs)
+
+# The HTML pages are rendered once; the lifespan compresses them with each
+# encoding, at maximum level, before the first request.
+page_encodings = COMPRESSION_ENCODINGS if COMPRESSION_ENABLED else []
+page_cache_control = f"public, max-age={HTML_CACHE_MAX_AGE}" if HTML_CACHE_MAX_AGE > 0 else "no-cache"
+root_page = PrecompressedPage(
+    render_template("index.html"), encodings=page_encodings, cache_control=page_cache_control
+)
+manage_users_page = PrecompressedPage(
+    render_template("manage_users.html", page_size=DEFAULT_PAGE_SIZE),
+    encodings=page_encodings,
+    cache_control=page_cache_control,
+)
+
+@router.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
+    return root_page.response(request.headers)
+
+@router.get("/manage-users", response_class=HTMLResponse)
+async def manage_users(request: Request):
+    return manage_users_page.response(request.headers)
+
+@router.get("/users/", response_model=List[UserResponse])
+async def get_all_users_endpoint(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after_id: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    email_prefix: Optional[str] = Query(None, min_length=1),
+    name: Optional[str] = Query(None, min_length=1, description="Substring of the name"),
+    name_prefix: Optional[str] = Query(None, min_length=1),
+    min_age: Optional[int] = Query(None, ge=0),
+    max_age: Optional[int] = Query(None, ge=0),
+    sort: str = Query("id", pattern="^-?(id|age|email)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db=Depends(get_read_session),
+):
+    try:
+        filters = UserFilter(
+            email_prefix=email_prefix, name=name, name_prefix=name_prefix,
+            min_age=min_age, max_age=max_age, sort=sort,
+        )
+        sort_key = sort.lstrip("-")
+        after_value = None
+        if cursor is not None:
+            if after_id:
+                raise HTTPException(status_code=400, detail="Pass either after_id or cursor, not both")
+            after_value, after_id = _decode_cursor(cursor, sort_key)
+        elif after_id and sort_key != "id":
+            raise HTTPException(status_code=400, detail="after_id only applies when sorting by id; pass cursor")
+        if format == "ndjson":
+            # Without an explicit limit, stream every matching user after the cursor.
+            # Same primary or replica the request's session was opened on.
+            return StreamingResponse(
+                _stream_users(request.state.read_sessionmaker, after_id, limit, filters, after_value),
+                media_type="application/x-ndjson",
+            )
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        # Plain column rows encoded straight to JSON; response_model only documents the shape.
+        page_key = (limit, after_id, after_value, tuple(filters.dict().items()), "replica" in db.info)
+        users = await page_reads.do(
+            page_key,
+            lambda: run_crud(crud_backend.get_user_rows_page, db, limit, after_id, filters, after_value),
+        )
+        etag = collection_etag(users, request.url.query)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        headers = {"ETag": etag}
+        if len(users) == limit:
+            last = users[-1]
+            page_url = request.url.remove_query_params(["after_id", "cursor"])
+            if sort_key == "id":
+                next_cursor = str(last.id)
+                next_url = page_url.include_query_params(after_id=last.id, limit=limit)
+            else:
+                next_cursor = _encode_cursor(getattr(last, sort_key), last.id)
+                next_url = page_url.include_query_params(cursor=next_cursor, limit=limit)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+            headers["X-Next-Cursor"] = next_cursor
+        return Response(user_rows_to_json(users), media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in get_all_users_endpoint: {str(e)}")
+        logger.error("Error in get_all_users_endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve users: {str(e)}"
         )
 
-@app.post("/users/", response_model=UserResponse)
-async def create_user_endpoint(user: UserCreate, db: Session = Depends(get_db)):
+@router.post("/users/", response_model=UserResponse)
+async def create_user_endpoint(user: UserCreate, db=Depends(get_session)):
     try:
-        db_user = create_user(user, db)
+        if create_batcher is not None:
+            db_user = await create_batcher.submit(user)
+            _invalidate_pages()
+            user_cache.set(user_cache_key(db_user["id"]), db_user)
+            return db_user
+        db_user = await run_crud(crud_backend.create_user, user, db)
         if not db_user:
             raise HTTPException(status_code=400, detail="Email already exists")
-        logger.info(f"Created user with ID: {db_user.id}")
+        _invalidate_pages()
+        user_cache.set(user_cache_key(db_user.id), user_to_dict(db_user))
         return db_user
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in create_user_endpoint: {str(e)}")
+        logger.error("Error in create_user_endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to create user: {str(e)}"
         )
 
-@app.get("/users/{user_id}", response_model=UserResponse)
-async def read_user_endpoint(user_id: int, db: Session = Depends(get_db)):
+def _check_bulk_size(count: int):
+    if count > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Bulk requests are limited to {MAX_BULK_ITEMS} items"
+        )
+
+# Bulk routes are registered before /users/{user_id} so "bulk" is not parsed as an ID.
+@router.post("/users/bulk", response_model=BulkOperationResult)
+async def bulk_create_users_endpoint(users: List[UserCreate], db=Depends(get_session)):
     try:
-        user = get_user(user_id, db)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        logger.info(f"Retrieved user with ID: {user_id}")
-        return user
+        _check_bulk_size(len(users))
+        result = await run_crud(crud_backend.bulk_create_users, users, db, BULK_CHUNK_SIZE)
+        _invalidate_pages()
+        return result
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in read_user_endpoint: {str(e)}")
+        logger.error("Error in bulk_create_users_endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create users: {str(e)}"
+        )
+
+@router.patch("/users/bulk", response_model=BulkOperationResult)
+async def bulk_update_users_endpoint(users: List[UserBulkUpdate], db=Depends(get_session)):
+    try:
+        _check_bulk_size(len(users))
+        result = await run_crud(crud_backend.bulk_update_users, users, db, BULK_CHUNK_SIZE)
+        for user_id in result.succeeded:
+            _invalidate_user(user_id)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in bulk_update_users_endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to update users: {str(e)}"
+        )
+
+@router.delete("/users/bulk", response_model=BulkOperationResult)
+async def bulk_delete_users_endpoint(request: UserBulkDelete, db=Depends(get_session)):
+    try:
+        _check_bulk_size(len(request.ids))
+        result = await run_crud(crud_backend.bulk_delete_users, request.ids, db, BULK_CHUNK_SIZE)
+        for user_id in result.succeeded:
+            _invalidate_user(user_id)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in bulk_delete_users_endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to delete users: {str(e)}"
+        )
+
+@router.post("/users/import", response_model=ImportResult)
+async def import_users_endpoint(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the Content-Type"),
+    db=Depends(get_session),
+):
+    try:
+        format = format or detect_format(request.headers.get("content-type"))
+        if format is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Upload text/csv or application/x-ndjson, or pass format"
+            )
+
+        async def create_users(users: List[UserCreate]) -> BulkOperationResult:
+            # Already one chunk; the backend commits it as a single transaction.
+            result = await run_crud(crud_backend.bulk_create_users, users, db, len(users))
+            _invalidate_pages()
+            return result
+
+        result = await import_users(
+            request.stream(), format, create_users,
+            chunk_size=BULK_CHUNK_SIZE, max_errors=IMPORT_MAX_ERRORS, max_length=IMPORT_MAX_LINE_LENGTH,
+        )
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in import_users_endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to import users: {str(e)}"
+        )
+
+@router.get("/users/export")
+async def export_users_endpoint(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    after_id: int = Query(0, ge=0, description="Resume after this user ID"),
+    db=Depends(get_read_session),
+):
+    # Rows come from a server-side cursor STREAM_BATCH_SIZE at a time; nothing
+    # beyond one batch is held in memory, whatever the table size.
+    headers = {"Content-Disposition": f'attachment; filename="users.{format}"'}
+    if change_feed is not None:
+        # Read before the rows, from the same database: following the change
+        # feed from here misses nothing, and may repeat changes already exported.
+        _, newest = await run_crud(crud_backend.change_bounds, db)
+        headers["X-Change-Seq"] = str(newest or 0)
+    if format == "csv":
+        stream = _stream_users(
+            request.state.read_sessionmaker, after_id, None, UserFilter(),
+            encode=_csv_chunk, prefix=users_to_csv([], header=True),
+        )
+        media_type = "text/csv; charset=utf-8"
+    else:
+        stream = _stream_users(request.state.read_sessionmaker, after_id, None, UserFilter())
+        media_type = "application/x-ndjson"
+    return StreamingResponse(stream, media_type=media_type, headers=headers)
+
+@router.get("/users/changes", response_model=ChangesPage)
+async def user_changes_endpoint(
+    request: Request,
+    since: int = Query(0, ge=0, description="Sequence number of the last change seen"),
+    limit: Optional[int] = Query(None, ge=1),
+    wait: int = Query(0, ge=0, le=CHANGES_MAX_WAIT_SECONDS, description="Seconds to wait for a change"),
+):
+    try:
+        if change_feed is None:
+            raise HTTPException(status_code=404, detail="Change feed is not enabled")
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        if "text/event-stream" in request.headers.get("accept", ""):
+            # EventSource reconnects with the id of the last event it received.
+            last_event_id = request.headers.get("last-event-id")
+            if last_event_id:
+                if not last_event_id.isdigit():
+                    raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+                since = int(last_event_id)
+            await change_feed.check_since(since)
+            return StreamingResponse(
+                change_feed.stream(since, limit, CHANGES_KEEPALIVE_SECONDS),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        await change_feed.check_since(since)
+        changes = await change_feed.poll(since, limit, wait)
+        last_seq = changes[-1].seq if changes else since
+        return Response(
+            dumps({"changes": [change_to_dict(change) for change in changes], "last_seq": last_seq}),
+            media_type="application/json",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in user_changes_endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve changes: {str(e)}"
+        )
+
+@router.get("/users/{user_id}", response_model=UserResponse)
+async def read_user_endpoint(user_id: int, request: Request, response: Response, db=Depends(get_read_session)):
+    try:
+        user_data = user_cache.get(user_cache_key(user_id))
+        if user_data is None:
+            from_replica = "replica" in db.info
+
+            async def load():
+                writes = _user_write_count(user_id)
+                user = await run_crud(crud_backend.get_user, user_id, db)
+                if not user:
+                    return None
+                loaded = user_to_dict(user)
+                # A lagging replica could repopulate the cache with a pre-write
+                # copy, so only primary reads are cached, and only when no write
+                # to the user committed while the row was loading.
+                if not from_replica and _user_write_count(user_id) == writes:
+                    user_cache.set(user_cache_key(user_id), loaded)
+                return loaded
+
+            user_data = await user_reads.do((user_id, from_replica), load)
+            if user_data is None:
+                raise HTTPException(status_code=404, detail="User not found")
+        etag = user_etag(user_id, user_data["version"])
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return user_data
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in read_user_endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve user: {str(e)}"
         )
 
-@app.put("/users/{user_id}", response_model=UserResponse)
-async def update_user_endpoint(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
+@router.put("/users/{user_id}", response_model=UserResponse)
+async def update_user_endpoint(
+    user_id: int, user: UserUpdate, request: Request, response: Response, db=Depends(get_session)
+):
     try:
-        updated_user = update_user(user_id, user, db)
+        if_match = request.headers.get("if-match")
+        expected_version = if_match_version(if_match, user_id)
+        updated_user = await run_crud(crud_backend.update_user, user_id, user, db, expected_version)
+        _invalidate_user(user_id)
         if not updated_user:
+            # If-Match (even "*") fails when there is no current representation (RFC 9110).
+            if parse_etags(if_match):
+                raise precondition_failed()
             raise HTTPException(status_code=404, detail="User not found")
-        logger.info(f"Updated user with ID: {user_id}")
+        response.headers["ETag"] = user_etag(user_id, updated_user.version)
         return updated_user
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in update_user_endpoint: {str(e)}")
+        logger.error("Error in update_user_endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to update user: {str(e)}"
         )
 
-@app.delete("/users/{user_id}")
-async def delete_user_endpoint(user_id: int, db: Session = Depends(get_db)):
+@router.delete("/users/{user_id}")
+async def delete_user_endpoint(user_id: int, request: Request, db=Depends(get_session)):
     try:
-        if not delete_user(user_id, db):
+        if_match = request.headers.get("if-match")
+        expected_version = if_match_version(if_match, user_id)
+        deleted = await run_crud(crud_backend.delete_user, user_id, db, expected_version)
+        _invalidate_user(user_id)
+        if not deleted:
+            if parse_etags(if_match):
+                raise precondition_failed()
             raise HTTPException(status_code=404, detail="User not found")
-        logger.info(f"Deleted user with ID: {user_id}")
         return {"message": "User deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in delete_user_endpoint: {str(e)}")
+        logger.error("Error in delete_user_endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to delete user: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/users/{user_id}/restore", response_model=UserResponse)
+async def restore_user_endpoint(user_id: int, response: Response, db=Depends(get_session)):
+    try:
+        restored_user = await run_crud(crud_backend.restore_user, user_id, db)
+        _invalidate_user(user_id)
+        if not restored_user:
+            raise HTTPException(status_code=404, detail="No deleted user to restore")
+        response.headers["ETag"] = user_etag(user_id, restored_user.version)
+        return restored_user
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in restore_user_endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to restore user: {str(e)}"
+        )
+
+@router.get("/cache/stats")
+async def cache_stats_endpoint():
+    return user_cache.stats()
+
+@router.get("/db/pool")
+async def db_pool_endpoint():
+    return database.pool_status()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def create_app() -> FastAPI:
+    """
+    Build the application: middleware, routes and the lifespan that
+    initializes the database and starts background writers.
+
+    Module-level state (cache, batcher, engines) is per process, so each
+    worker started by ``python -m app.serve`` gets its own.
+    """
+    application = FastAPI(title="User Service API", lifespan=lifespan)
+
+    # Add CORS middleware
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Adjust for production to specific origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    if COMPRESSION_ENABLED:
+        application.add_middleware(
+            CompressionMiddleware,
+            minimum_size=COMPRESSION_MIN_SIZE,
+            encodings=COMPRESSION_ENCODINGS,
+            levels={
+                "gzip": COMPRESSION_GZIP_LEVEL,
+                "br": COMPRESSION_BROTLI_LEVEL,
+                "zstd": COMPRESSION_ZSTD_LEVEL,
+            },
+        )
+
+    if replica_router is not None:
+        application.add_middleware(ReadYourWritesMiddleware, window=READ_YOUR_WRITES_MS / 1000)
+
+    # Outside everything but metrics, so shed requests cost as little as possible.
+    if rate_limiter is not None or write_limiter is not None:
+        application.add_middleware(
+            AdmissionMiddleware,
+            rate_limiter=rate_limiter,
+            write_limiter=write_limiter,
+            key_header=RATE_LIMIT_KEY_HEADER,
+            # The create batcher bounds its own queue and group-commits; capping
+            # concurrent creates would only shrink its batches.
+            unlimited_writes=[("POST", "/users/")] if create_batcher is not None else [],
+        )
+
+    # Added after compression so it wraps it and records bytes actually sent.
+    if METRICS_ENABLED:
+        application.add_middleware(MetricsMiddleware, server_timing=METRICS_SERVER_TIMING)
+
+    # Outermost, so every response (shed ones included) carries the request ID.
+    application.add_middleware(RequestContextMiddleware, header=REQUEST_ID_HEADER)
+
+    application.include_router(router)
+    return application
+
+app = create_app()
@@ -0,0 +1,210 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 100)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+class Gauge(Counter):
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    le_label = f'le="{le}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+class Registry:
+    """Holds metrics plus callbacks that report gauges owned by other modules."""
+
+    def __init__(self):
+        self._metrics: List[object] = []
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """Export every numeric value returned by ``collect()`` as a ``prefix_<key>`` gauge."""
+        self._collectors.append((prefix, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect in self._collectors:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size.", ("method", "route"), SIZE_BUCKETS
+))
+DB_STATEMENTS = registry.register(Histogram(
+    "db_statements_per_request", "SQL statements issued per HTTP request.", ("method", "route"), COUNT_BUCKETS
+))
+DB_TIME = registry.register(Histogram(
+    "db_query_duration_seconds_per_request", "Time spent in SQL per HTTP request.", ("method", "route")
+))
+DB_STATEMENTS_TOTAL = registry.register(Counter(
+    "db_statements_total", "SQL statements executed."
+))
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+# Set per request by MetricsMiddleware; SQL hooks add to whatever is current.
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_STATEMENTS_TOTAL.inc()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+def instrument_engine(sync_engine) -> None:
+    """Count statements and time spent in SQL for the request that issued them (idempotent)."""
+    if event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, in-flight requests, response size and
+    per-request SQL work, labelled by route template.
+
+    With ``server_timing`` set, responses carry a ``Server-Timing`` header
+    with the application and database time spent so far.
+    """
+
+    def __init__(self, app, server_timing: bool = False, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.server_timing = server_timing
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    app_ms = (time.perf_counter() - started) * 1000
+                    value = (
+                        f"app;dur={app_ms:.2f}, "
+                        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} queries"'
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", value.encode("latin-1"))
+                    ]
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(amount=1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.inc(amount=-1)
+            current_request_stats.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method, route_path, str(status_code))
+            RESPONSE_SIZE.observe(body_size, method, route_path)
+            DB_STATEMENTS.observe(stats.statements, method, route_path)
+            DB_TIME.observe(stats.db_seconds, method, route_path)
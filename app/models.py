@@ -1,10 +1,194 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Float, Index, Integer, String, func, text
 from app.database import Base
+import functools
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    age = Column(Integer, nullable=True)
+    # Incremented on every update; drives ETags and If-Match checks
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Set by a delete (epoch seconds); the row stays restorable until the
+    # compaction job purges it. Every read filters on LIVE_USER.
+    deleted_at = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # Emails are unique among live users only, so a deleted user's
+        # email can be reused straight away.
+        Index(
+            "ix_users_email_live", "email", unique=True,
+            sqlite_where=deleted_at.is_(None), postgresql_where=deleted_at.is_(None),
+        ),
+        # Tombstones only: lets compaction find them without scanning users
+        Index(
+            "ix_users_deleted_at", "deleted_at",
+            sqlite_where=deleted_at.is_not(None), postgresql_where=deleted_at.is_not(None),
+        ),
+        # Age range filters and age-ordered keyset pages
+        Index("ix_users_age_id", "age", "id"),
+        # Case-insensitive email and name prefix lookups
+        Index("ix_users_email_lower", func.lower(email)),
+        Index("ix_users_name_lower", func.lower(name)),
+    )
+
+# Condition every read of users adds
+LIVE_USER = User.deleted_at.is_(None)
+
+# Indexes replaced by a differently defined one, dropped by init_db
+REPLACED_INDEXES = ("ix_users_email",)
+
+class ArchivedUser(Base):
+    """Deleted users moved out of ``users`` by compaction with SOFT_DELETE_ARCHIVE."""
+    __tablename__ = "users_archive"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
     name = Column(String, nullable=False)
-    age = Column(Integer, nullable=True)
\ No newline at end of file
+    age = Column(Integer, nullable=True)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(Float, nullable=False)
+    archived_at = Column(Float, nullable=False)
+
+class ReplicationHeartbeat(Base):
+    """
+    One row the primary rewrites while replicas are configured. How far a
+    replica's copy trails the primary's last write is its replication lag.
+    """
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    written_at = Column(Float, nullable=False)
+
+class UserEmail(Base):
+    """
+    Email directory for sharded deployments: claims an email for a user ID.
+    Lives on the shard the email hashes to, so its primary key keeps emails
+    unique across shards.
+    """
+    __tablename__ = "user_emails"
+
+    email = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+
+class UserChange(Base):
+    """
+    Transactional outbox behind GET /users/changes: one row per user
+    mutation, written in the same transaction as the mutation. ``seq`` only
+    grows (AUTOINCREMENT on SQLite, so pruned values are never reused).
+    """
+    __tablename__ = "user_changes"
+
+    seq = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    # "create", "update" or "delete"
+    op = Column(String, nullable=False)
+    # The user as the API serializes it after the change (JSON); NULL for deletes
+    data = Column(String, nullable=True)
+    changed_at = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Retention pruning
+        Index("ix_user_changes_changed_at", "changed_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+class PrunedChanges(Base):
+    """
+    One row: the highest ``user_changes.seq`` pruning has deleted. Sequence
+    numbers can skip values, so a gap before the oldest retained row does
+    not by itself mean a reader missed changes; a cursor below this does.
+    """
+    __tablename__ = "pruned_changes"
+
+    id = Column(Integer, primary_key=True)
+    max_seq = Column(Integer, nullable=False)
+
+class SchemaVersion(Base):
+    """
+    Fingerprint of the schema init_db last set up (see
+    ``database.schema_fingerprint``); while it matches, startup skips the
+    schema checks.
+    """
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+class IdBlock(Base):
+    """Next free ID per sequence, handed out in blocks by the shard ID allocator."""
+    __tablename__ = "id_blocks"
+
+    name = Column(String, primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+# Bump when DDL that is not derived from the models above changes (e.g.
+# create_name_search), so init_db runs again on existing databases.
+SCHEMA_REVISION = 1
+
+# SQLite full-text index over User.name. The trigram tokenizer matches any
+# substring of three or more characters; triggers keep it in sync with users.
+NAME_SEARCH_TABLE = "users_name_fts"
+NAME_SEARCH_MIN_LENGTH = 3
+
+@functools.lru_cache(maxsize=None)
+def name_search_supported() -> bool:
+    """Whether the SQLite library has FTS5 with the trigram tokenizer (3.34+)."""
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    probe = sqlite3.connect(":memory:")
+    try:
+        probe.execute("CREATE VIRTUAL TABLE probe USING fts5(name, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        probe.close()
+
+def create_name_search(connection) -> None:
+    """
+    Create the FTS5 name index and its sync triggers on SQLite (idempotent).
+    Skipped when the SQLite library cannot build it; name search then uses
+    the plain LIKE filter.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    if not name_search_supported():
+        logger.warning(
+            "SQLite %s lacks FTS5 trigram search; name search will scan the table", sqlite3.sqlite_version
+        )
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": NAME_SEARCH_TABLE},
+    ).first()
+    if exists:
+        return
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE {NAME_SEARCH_TABLE} USING fts5("
+        f"name, content='users', content_rowid='id', tokenize='trigram')"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER users_name_fts_insert AFTER INSERT ON users BEGIN "
+        f"INSERT INTO {NAME_SEARCH_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER users_name_fts_delete AFTER DELETE ON users BEGIN "
+        f"INSERT INTO {NAME_SEARCH_TABLE}({NAME_SEARCH_TABLE}, rowid, name) "
+        f"VALUES ('delete', old.id, old.name); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER users_name_fts_update AFTER UPDATE OF name ON users BEGIN "
+        f"INSERT INTO {NAME_SEARCH_TABLE}({NAME_SEARCH_TABLE}, rowid, name) "
+        f"VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {NAME_SEARCH_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+    ))
+    # Index rows that existed before the search table did
+    connection.execute(text(f"INSERT INTO {NAME_SEARCH_TABLE}({NAME_SEARCH_TABLE}) VALUES ('rebuild')"))
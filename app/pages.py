@@ -0,0 +1,19 @@
+import re
+from pathlib import Path
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+def render_template(name: str, **context) -> str:
+    """
+    Render ``app/templates/<name>``, replacing ``{{ key }}`` placeholders.
+
+    Pages are rendered once at startup, so there is no template cache or
+    escaping; values must be trusted.
+
+    Raises:
+        KeyError: If a placeholder has no value in ``context``.
+    """
+    source = (TEMPLATES_DIR / name).read_text(encoding="utf-8")
+    return _PLACEHOLDER.sub(lambda match: str(context[match.group(1)]), source)
@@ -0,0 +1,161 @@
+"""
+Move users to the shards they hash to after DATABASE_SHARD_URLS changed.
+
+Run it offline (service stopped) with the new shard list. Every user row
+not on the shard its ID now hashes to is copied there and then deleted from
+its old shard, a batch at a time, so an interrupted run can simply be run
+again. Email claims move the same way, and claims whose user no longer has
+that email are dropped.
+
+Shards being removed, or the database from before sharding, are passed with
+--drain and emptied completely.
+
+Usage:
+    DATABASE_SHARD_URLS=sqlite:///s0.db,sqlite:///s1.db,sqlite:///s2.db python -m app.rebalance
+    python -m app.rebalance --dry-run
+    python -m app.rebalance --drain sqlite:///./user_service.db
+"""
+import argparse
+import logging
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, insert, select
+
+from app import database
+from app.models import LIVE_USER, User, UserEmail
+from app.sharding import Shard, ShardSet, shard_set
+
+logger = logging.getLogger(__name__)
+
+def _batches(shard: Shard, table, key, batch_size: int) -> Iterator[List[Dict]]:
+    # Keyset scan; rows moved away behind the cursor do not disturb it.
+    last = None
+    while True:
+        stmt = select(table).order_by(key).limit(batch_size)
+        if last is not None:
+            stmt = stmt.where(key > last)
+        with shard.engine.connect() as connection:
+            rows = [dict(row) for row in connection.execute(stmt).mappings()]
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][key.name]
+
+def _move(source: Shard, target: Shard, table, key, rows: List[Dict]) -> None:
+    keys = [row[key.name] for row in rows]
+    with target.engine.begin() as connection:
+        # A repeated run may find rows it copied before being interrupted.
+        connection.execute(delete(table).where(key.in_(keys)))
+        connection.execute(insert(table), rows)
+    with source.engine.begin() as connection:
+        connection.execute(delete(table).where(key.in_(keys)))
+
+def _ensure_claims(shards: ShardSet, users: List[Dict]) -> None:
+    # Users from a database that predates sharding have no email claims yet.
+    by_shard = defaultdict(dict)
+    for user in users:
+        by_shard[shards.shard_for_email(user["email"])][user["email"]] = user["id"]
+    for shard, claims in by_shard.items():
+        with shard.engine.begin() as connection:
+            existing = set(connection.scalars(
+                select(UserEmail.email).where(UserEmail.email.in_(list(claims)))
+            ))
+            missing = [{"email": e, "user_id": i} for e, i in claims.items() if e not in existing]
+            if missing:
+                connection.execute(insert(UserEmail), missing)
+
+def rebalance(
+    shards: ShardSet, sources: List[Shard], batch_size: int = 1000, dry_run: bool = False
+) -> Counter:
+    """
+    Move misplaced users and email claims found on ``sources`` to their shards.
+
+    Returns:
+        Rows moved (or, with ``dry_run``, to move) per (table, source, target),
+        plus ("stale claims", shard, "") for dropped claims (not checked
+        with ``dry_run``).
+    """
+    moved: Counter = Counter()
+    for source in sources:
+        for rows in _batches(source, User.__table__, User.id, batch_size):
+            by_target = defaultdict(list)
+            for row in rows:
+                target = shards.shard_for_id(row["id"])
+                if target.name != source.name:
+                    by_target[target].append(row)
+            for target, movers in by_target.items():
+                moved[("users", source.name, target.name)] += len(movers)
+                if not dry_run:
+                    _move(source, target, User.__table__, User.id, movers)
+                    _ensure_claims(shards, [row for row in movers if row["deleted_at"] is None])
+        for rows in _batches(source, UserEmail.__table__, UserEmail.email, batch_size):
+            by_target = defaultdict(list)
+            for row in rows:
+                target = shards.shard_for_email(row["email"])
+                if target.name != source.name:
+                    by_target[target].append(row)
+            for target, movers in by_target.items():
+                moved[("user_emails", source.name, target.name)] += len(movers)
+                if not dry_run:
+                    _move(source, target, UserEmail.__table__, UserEmail.email, movers)
+
+    if dry_run:
+        return moved
+    # Claims left behind by a failed create, update or delete.
+    for shard in shards.shards:
+        for claims in _batches(shard, UserEmail.__table__, UserEmail.email, batch_size):
+            by_user_shard = defaultdict(list)
+            for claim in claims:
+                by_user_shard[shards.shard_for_id(claim["user_id"])].append(claim["user_id"])
+            owners = set()
+            for user_shard, user_ids in by_user_shard.items():
+                with user_shard.engine.connect() as connection:
+                    owners.update(
+                        (email, user_id) for email, user_id in connection.execute(
+                            select(User.email, User.id).where(User.id.in_(user_ids), LIVE_USER)
+                        )
+                    )
+            stale = [c["email"] for c in claims if (c["email"], c["user_id"]) not in owners]
+            if stale:
+                moved[("stale claims", shard.name, "")] += len(stale)
+                with shard.engine.begin() as connection:
+                    connection.execute(delete(UserEmail).where(UserEmail.email.in_(stale)))
+    return moved
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drain", action="append", default=[], metavar="URL",
+                        help="database to empty into the shards (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would move")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if shard_set is None:
+        logger.error("DATABASE_SHARD_URLS is not set")
+        return 1
+    shard_urls = {shard.url for shard in shard_set.shards}
+    if any(url in shard_urls for url in args.drain):
+        logger.error("A drained database cannot also be a shard")
+        return 1
+    drains = [Shard(f"drain{i}", url) for i, url in enumerate(args.drain)]
+
+    database.initialize_database()
+    shard_set.initialize()
+    for drain in drains:
+        database.init_db(drain.engine)
+    moved = rebalance(shard_set, shard_set.shards + drains, args.batch_size, args.dry_run)
+    if not args.dry_run:
+        # Move the ID allocator past IDs that came in from drained databases.
+        shard_set.initialize()
+
+    for (table, source, target), count in sorted(moved.items()):
+        print(f"{table:12} {source} -> {target}: {count}" if target else f"{table:12} {source}: {count}")
+    verb = "would move" if args.dry_run else "moved"
+    print(f"{verb} {sum(c for (t, _, _), c in moved.items() if t == 'users')} users")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
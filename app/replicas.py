@@ -0,0 +1,250 @@
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from app import database
+from app.config import USE_ASYNC_DB, DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_MS
+from app.models import ReplicationHeartbeat
+
+logger = logging.getLogger(__name__)
+
+# Set on successful writes; while present, the client reads from the primary.
+READ_PRIMARY_COOKIE = "read_primary_until"
+# The same expiry as a response header, for clients that do not keep
+# cookies: sending it back on reads has the same effect as the cookie.
+READ_PRIMARY_HEADER = "X-Read-Primary-Until"
+
+class Replica:
+    """
+    Engines and session factories for one read replica, created on first
+    access (like app.database's), so importing the app opens no pools.
+    """
+
+    ENGINE_ATTRIBUTES = ("engine", "SessionLocal", "async_engine", "AsyncSessionLocal")
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        # Seconds behind the primary at the last check; None if unknown or unreachable.
+        self.lag: Optional[float] = None
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Only called while the engines are not set yet.
+        if attribute not in self.ENGINE_ATTRIBUTES:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {attribute!r}")
+        with self._lock:
+            if "engine" not in self.__dict__:
+                self._create_engines()
+        return self.__dict__[attribute]
+
+    def _create_engines(self) -> None:
+        # Replicas are never written through this service.
+        pragmas = {**database.sqlite_pragmas, "query_only": 1}
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        if USE_ASYNC_DB:
+            from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+            async_url = database.to_async_url(self.url)
+            self.async_engine = create_async_engine(async_url, **database.engine_options(async_url))
+            database.install_sqlite_pragmas(self.async_engine.sync_engine, pragmas)
+            self.AsyncSessionLocal = async_sessionmaker(
+                bind=self.async_engine, class_=AsyncSession, autoflush=False,
+                expire_on_commit=False, info={"replica": self.name},
+            )
+        engine = create_engine(self.url, **database.engine_options(self.url))
+        database.install_sqlite_pragmas(engine, pragmas)
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=engine,
+            info={"replica": self.name},
+        )
+        # Set last: it marks the engines as created.
+        self.engine = engine
+
+    def dispose(self, close: bool = True) -> None:
+        if "engine" not in self.__dict__:
+            return
+        self.engine.dispose(close=close)
+        if self.async_engine is not None:
+            self.async_engine.sync_engine.dispose(close=close)
+
+class ReplicaRouter:
+    """
+    Routes reads to replicas round-robin, skipping any whose lag is unknown
+    or above ``max_lag`` and falling back to the primary when none qualify.
+
+    Lag comes from a heartbeat row the primary rewrites every check: a
+    replica whose copy holds the previous heartbeat is caught up, otherwise
+    its lag is the age of the heartbeat it has.
+    """
+
+    def __init__(self, replicas: List[Replica], max_lag: float):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.primary_reads = 0
+        self._order = itertools.cycle(range(len(replicas)))
+        self._lock = threading.Lock()
+        self._last_heartbeat: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self, request: Request) -> Optional[Replica]:
+        """The replica to serve this read from, or None for the primary."""
+        if self._wrote_recently(request):
+            with self._lock:
+                self.primary_reads += 1
+            return None
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[next(self._order)]
+                if replica.lag is not None and replica.lag <= self.max_lag:
+                    replica.reads += 1
+                    return replica
+            self.primary_reads += 1
+        return None
+
+    def _wrote_recently(self, request: Request) -> bool:
+        now = time.time()
+        for value in (request.headers.get(READ_PRIMARY_HEADER), request.cookies.get(READ_PRIMARY_COOKIE)):
+            try:
+                if value is not None and float(value) > now:
+                    return True
+            except ValueError:
+                pass
+        return False
+
+    def check_lag(self) -> None:
+        """Measure every replica against the last heartbeat, then write a new one."""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    seen = connection.scalar(
+                        select(ReplicationHeartbeat.written_at).where(ReplicationHeartbeat.id == 1)
+                    )
+            except Exception as e:
+                if replica.lag is not None:
+                    logger.error("Replica %s unreachable: %s", replica.name, e)
+                replica.lag = None
+                continue
+            if seen is None or self._last_heartbeat is None:
+                replica.lag = None
+            elif seen >= self._last_heartbeat:
+                replica.lag = 0.0
+            else:
+                replica.lag = time.time() - seen
+        now = time.time()
+        with database.engine.begin() as connection:
+            updated = connection.execute(
+                update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(written_at=now)
+            ).rowcount
+            if not updated:
+                connection.execute(insert(ReplicationHeartbeat).values(id=1, written_at=now))
+        self._last_heartbeat = now
+
+    def start(self, interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.check_lag)
+            except Exception as e:
+                logger.error("Replica lag check failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, float]:
+        stats: Dict[str, float] = {"primary_reads": self.primary_reads}
+        for replica in self.replicas:
+            stats[f"{replica.name}_reads"] = replica.reads
+            stats[f"{replica.name}_lag_seconds"] = replica.lag if replica.lag is not None else -1
+        return stats
+
+class ReadYourWritesMiddleware:
+    """
+    Sets the read-primary cookie and header on successful writes, so the
+    same client reads its own changes for ``window`` seconds even with
+    lagging replicas. Both carry their own expiry, so this works across
+    worker processes; clients without a cookie jar echo the header instead.
+    """
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + self.window:.3f}"
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={until}; "
+                    f"Max-Age={max(int(self.window), 1)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode("latin-1")),
+                    (READ_PRIMARY_HEADER.lower().encode("latin-1"), until.encode("latin-1")),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def build_router() -> Optional[ReplicaRouter]:
+    if not DATABASE_REPLICA_URLS:
+        return None
+    replicas = [Replica(f"replica{i}", url) for i, url in enumerate(DATABASE_REPLICA_URLS)]
+    return ReplicaRouter(replicas, REPLICA_MAX_LAG_MS / 1000)
+
+replica_router = build_router()
+
+def _dispose_replicas_after_fork() -> None:
+    # Same as the primary engines: a forked worker opens its own connections.
+    for replica in replica_router.replicas:
+        replica.dispose(close=False)
+
+if replica_router is not None and hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_replicas_after_fork)
+
+def read_sessionmaker(request: Request, is_async: bool = USE_ASYNC_DB):
+    """Session factory for a read: a replica's when one is fresh enough, else the primary's."""
+    replica = replica_router.pick(request) if replica_router is not None else None
+    if replica is None:
+        return database.AsyncSessionLocal if is_async else database.SessionLocal
+    return replica.AsyncSessionLocal if is_async else replica.SessionLocal
+
+def get_read_db(request: Request):
+    factory = read_sessionmaker(request, is_async=False)
+    request.state.read_sessionmaker = factory
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    factory = read_sessionmaker(request, is_async=True)
+    request.state.read_sessionmaker = factory
+    async with factory() as db:
+        yield db
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     email: str
@@ -16,6 +16,53 @@ class UserResponse(BaseModel):
     email: str
     name: str
     age: Optional[int] = None
+    version: int = 1
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class UserFilter(BaseModel):
+    email_prefix: Optional[str] = None
+    name: Optional[str] = None
+    name_prefix: Optional[str] = None
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    sort: str = "id"
+
+class UserBulkUpdate(UserUpdate):
+    id: int
+
+class UserBulkDelete(BaseModel):
+    ids: List[int]
+
+class BulkItemError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: str
+
+class BulkOperationResult(BaseModel):
+    succeeded: List[int]
+    failed: List[BulkItemError]
+
+class ImportLineError(BaseModel):
+    line: int
+    detail: str
+
+class ImportResult(BaseModel):
+    processed: int
+    created: int
+    failed: int
+    errors: List[ImportLineError]
+
+class UserChangeEvent(BaseModel):
+    seq: int
+    op: str
+    user_id: int
+    # The user after the change; None for deletes
+    user: Optional[UserResponse] = None
+    changed_at: float
+
+class ChangesPage(BaseModel):
+    changes: List[UserChangeEvent]
+    # Pass as since= to continue after this page
+    last_seq: int
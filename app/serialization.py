@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+from typing import Any, Iterable, Sequence
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+# Field order of crud.USER_COLUMNS rows
+USER_FIELDS = ("id", "email", "name", "age", "version")
+
+def dumps(value: Any) -> bytes:
+    """Encode ``value`` as compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+def loads(data: str | bytes) -> Any:
+    """Decode JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def user_rows_to_json(rows: Iterable[Sequence]) -> bytes:
+    """
+    Encode user rows as the JSON array GET /users/ returns.
+
+    Rows are (id, email, name, age, version) tuples as selected by
+    ``crud.USER_COLUMNS``; they are encoded directly, without building ORM
+    objects or validating them through ``UserResponse``.
+    """
+    return dumps([dict(zip(USER_FIELDS, row)) for row in rows])
+
+def users_to_csv(users: Iterable[Any], header: bool = False) -> bytes:
+    """
+    Encode users (ORM objects or column rows) as CSV lines in ``USER_FIELDS``
+    order, optionally preceded by the header line. A missing age is an empty field.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(USER_FIELDS)
+    writer.writerows([getattr(user, field) for field in USER_FIELDS] for user in users)
+    return buffer.getvalue().encode()
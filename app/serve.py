@@ -0,0 +1,79 @@
+"""
+Run the service with one uvicorn worker process per CPU core.
+
+The database is initialized once in this process before the workers start,
+so they only find the schema in place. Each worker then builds its own app,
+engines and caches.
+
+Usage:
+    python -m app.serve
+    python -m app.serve --workers 16 --host 0.0.0.0 --port 8000
+    WEB_CONCURRENCY=8 python -m app.serve
+
+Behind gunicorn, the same app runs with (set the worker count through
+WEB_CONCURRENCY, not -w, so the app sees it and picks its cache default):
+    WEB_CONCURRENCY=32 gunicorn app.main:app -k uvicorn.workers.UvicornWorker
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Caches that live inside one process; with several workers an update on one
+# worker cannot invalidate the others' copies.
+PROCESS_LOCAL_CACHES = ("lru", "fake-redis")
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects affinity / container limits)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or available_cores()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="worker processes (default: WEB_CONCURRENCY, else one per core)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.workers > 1:
+        backend = os.environ.setdefault("USER_CACHE_BACKEND", "none")
+        if backend in PROCESS_LOCAL_CACHES:
+            logger.warning(
+                "USER_CACHE_BACKEND=%s is per worker; with %s workers "
+                "reads may be stale for up to USER_CACHE_TTL seconds after a write",
+                backend, args.workers,
+            )
+
+    import uvicorn
+
+    from app import database
+
+    url = database.engine.url
+    if args.workers > 1 and url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        logger.error("In-memory SQLite cannot be shared between workers; use a database file")
+        return 1
+    database.initialize_database()
+    database.engine.dispose()
+
+    logger.info("Starting %s worker(s) on %s:%s", args.workers, args.host, args.port)
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
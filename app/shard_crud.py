@@ -0,0 +1,345 @@
+"""
+CRUD over a sharded users table (see ``app.sharding``).
+
+Same functions and signatures as ``app.crud``, with ``db`` a
+``ShardedSession``. Single-user operations go to the shard the ID hashes
+to; list pages and streams are scatter-gathered from every shard and
+merged in the requested order. Email uniqueness is enforced by claiming the
+email in ``user_emails`` on the shard the email hashes to before the user
+row is written.
+"""
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Iterator, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import Row, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import crud
+from app.models import LIVE_USER, User, UserEmail
+from app.schemas import (
+    BulkItemError, BulkOperationResult, UserBulkUpdate, UserCreate, UserFilter, UserUpdate
+)
+from app.sharding import ShardedSession
+
+logger = logging.getLogger(__name__)
+
+def _claim_email(db: ShardedSession, email: str, user_id: int) -> None:
+    email_db = db.for_email(email)
+    try:
+        email_db.execute(insert(UserEmail).values(email=email, user_id=user_id))
+        email_db.commit()
+    except IntegrityError:
+        email_db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already exists"
+        )
+
+def _release_email(db: ShardedSession, email: str, user_id: int) -> None:
+    # Best effort: a claim left behind by a failure here is removed by
+    # ``python -m app.rebalance``, which drops claims without a user.
+    email_db = db.for_email(email)
+    try:
+        email_db.execute(
+            delete(UserEmail).where(UserEmail.email == email, UserEmail.user_id == user_id)
+        )
+        email_db.commit()
+    except Exception as e:
+        email_db.rollback()
+        logger.error("Failed to release email claim of user %s: %s", user_id, e)
+
+def _merge_key(filters: UserFilter):
+    sort_key = filters.sort.lstrip("-")
+    if sort_key == "id":
+        return lambda user: user.id
+    # Same order as crud.users_query: NULLs first ascending (last descending),
+    # then by ID. Assumes the shards compare strings bytewise, like SQLite.
+    return lambda user: (getattr(user, sort_key) is not None, getattr(user, sort_key), user.id)
+
+def _merge(pages, filters: UserFilter) -> Iterator[Any]:
+    return heapq.merge(*pages, key=_merge_key(filters), reverse=filters.sort.startswith("-"))
+
+def create_user(user: UserCreate, db: ShardedSession) -> User | None:
+    """
+    Create a new user under a freshly allocated global ID.
+
+    Args:
+        user: UserCreate schema with user details (email, name, age).
+        db: Sharded session.
+
+    Returns:
+        User object if created successfully.
+
+    Raises:
+        HTTPException: If database operation fails or email exists.
+    """
+    try:
+        user_id = db.shard_set.allocator.next_id()
+        _claim_email(db, user.email, user_id)
+        user_db = db.for_id(user_id)
+        try:
+            new_user = user_db.scalar(
+                insert(User)
+                .values(id=user_id, email=user.email, name=user.name, age=user.age)
+                .returning(User)
+            )
+            user_db.commit()
+        except Exception:
+            user_db.rollback()
+            _release_email(db, user.email, user_id)
+            raise
+        logger.info("Created user with ID: %s", user_id)
+        return new_user
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to create user: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+def get_user(user_id: int, db: ShardedSession) -> User | None:
+    """Retrieve a user by ID from its shard (see ``crud.get_user``)."""
+    return crud.get_user(user_id, db.for_id(user_id))
+
+def update_user(
+    user_id: int, user: UserUpdate, db: ShardedSession, expected_version: Optional[int] = None
+) -> User | None:
+    """
+    Update an existing user's details on its shard.
+
+    A new email is claimed before the row is updated and the old claim is
+    released afterwards, so two users can never end up with the same email.
+
+    Args:
+        user_id: ID of the user to update.
+        user: UserUpdate schema with updated fields.
+        db: Sharded session.
+        expected_version: If set, only update while the user is at this version.
+
+    Returns:
+        Updated User object if found, None otherwise.
+
+    Raises:
+        HTTPException: As ``crud.update_user``, and 400 if the new email is taken.
+    """
+    user_db = db.for_id(user_id)
+    new_email = user.dict(exclude_unset=True).get("email")
+    old_email = None
+    if new_email and user_id > 0:
+        old_email = user_db.scalar(select(User.email).where(User.id == user_id, LIVE_USER))
+        user_db.commit()
+        if old_email is not None and old_email != new_email:
+            _claim_email(db, new_email, user_id)
+        else:
+            old_email = None
+    try:
+        updated_user = crud.update_user(user_id, user, user_db, expected_version)
+    except HTTPException:
+        if old_email is not None:
+            _release_email(db, new_email, user_id)
+        raise
+    if old_email is not None:
+        _release_email(db, new_email if updated_user is None else old_email, user_id)
+    return updated_user
+
+def delete_user(user_id: int, db: ShardedSession, expected_version: Optional[int] = None) -> bool:
+    """
+    Soft-delete a user by ID on its shard and release its email.
+
+    Args:
+        user_id: ID of the user to delete.
+        db: Sharded session.
+        expected_version: If set, only delete while the user is at this version.
+
+    Returns:
+        True if user was deleted, False if user not found.
+
+    Raises:
+        HTTPException: If database operation fails, input is invalid or the
+            user is not at ``expected_version`` (412).
+    """
+    user_db = db.for_id(user_id)
+    try:
+        if user_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        stmt = update(User).where(User.id == user_id, LIVE_USER)
+        if expected_version is not None:
+            stmt = stmt.where(User.version == expected_version)
+        email = user_db.scalar(stmt.values(deleted_at=time.time()).returning(User.email))
+        if email is None:
+            user_db.rollback()
+            if expected_version is not None and crud._user_exists(user_id, user_db):
+                raise crud.precondition_failed()
+            return False
+        user_db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        user_db.rollback()
+        logger.error("Failed to delete user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+    _release_email(db, email, user_id)
+    logger.info("Deleted user with ID: %s", user_id)
+    return True
+
+def restore_user(user_id: int, db: ShardedSession) -> User | None:
+    """
+    Undo the delete of a user on its shard, claiming its email again first.
+
+    Returns:
+        The restored User object, or None if there is no deleted user with that ID.
+
+    Raises:
+        HTTPException: As ``crud.restore_user``, and 400 if the email is taken.
+    """
+    user_db = db.for_id(user_id)
+    email = user_db.scalar(
+        select(User.email).where(User.id == user_id, User.deleted_at.is_not(None))
+    ) if user_id > 0 else None
+    user_db.commit()
+    if email is None:
+        return None
+    _claim_email(db, email, user_id)
+    try:
+        restored = crud.restore_user(user_id, user_db)
+    except HTTPException:
+        _release_email(db, email, user_id)
+        raise
+    if restored is None:
+        _release_email(db, email, user_id)
+    return restored
+
+def get_all_users(db: ShardedSession) -> List[User]:
+    """Retrieve all users from every shard, ordered by ID."""
+    users = list(_merge(db.shard_set.scatter(crud.get_all_users, db.all()), UserFilter()))
+    logger.info("Retrieved %s users from %s shards", len(users), len(db.shard_set.shards))
+    return users
+
+def get_users_page(
+    db: ShardedSession,
+    limit: int,
+    after_id: int = 0,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> List[User]:
+    """
+    One keyset page across all shards.
+
+    Every shard returns its own first ``limit`` users after the cursor, in
+    parallel; the page is the first ``limit`` of their merge, so the cursor
+    of its last user continues correctly on every shard.
+    """
+    filters = filters or UserFilter()
+    pages = db.shard_set.scatter(crud.get_users_page, db.all(), limit, after_id, filters, after_value)
+    return list(itertools.islice(_merge(pages, filters), limit))
+
+def get_user_rows_page(
+    db: ShardedSession,
+    limit: int,
+    after_id: int = 0,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> List[Row]:
+    """Same page as get_users_page, as plain ``crud.USER_COLUMNS`` rows."""
+    filters = filters or UserFilter()
+    pages = db.shard_set.scatter(crud.get_user_rows_page, db.all(), limit, after_id, filters, after_value)
+    return list(itertools.islice(_merge(pages, filters), limit))
+
+def iter_users(
+    db: ShardedSession,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+    filters: Optional[UserFilter] = None,
+    after_value: Any = None,
+) -> Iterator[User]:
+    """
+    Stream users from every shard, merged in order.
+
+    Each shard is read through its own server-side cursor, so at most one
+    batch per shard is held in memory.
+    """
+    filters = filters or UserFilter()
+    streams = [
+        crud.iter_users(shard_db, after_id, limit, batch_size, filters, after_value)
+        for shard_db in db.all()
+    ]
+    yield from itertools.islice(_merge(streams, filters), limit)
+
+def bulk_create_users(
+    users: List[UserCreate], db: ShardedSession, chunk_size: int = 500
+) -> BulkOperationResult:
+    """
+    Create many users, one at a time.
+
+    Each create touches two shards (email claim and user row), so there is
+    no chunk transaction to share; ``chunk_size`` is accepted for
+    signature compatibility.
+    """
+    result = BulkOperationResult(succeeded=[], failed=[])
+    for index, user in enumerate(users):
+        try:
+            result.succeeded.append(create_user(user, db).id)
+        except HTTPException as e:
+            result.failed.append(BulkItemError(index=index, detail=e.detail))
+    logger.info("Bulk created %s users, %s failed", len(result.succeeded), len(result.failed))
+    return result
+
+def bulk_update_users(
+    users: List[UserBulkUpdate], db: ShardedSession, chunk_size: int = 500
+) -> BulkOperationResult:
+    """Update many users by ID, one at a time (see bulk_create_users)."""
+    result = BulkOperationResult(succeeded=[], failed=[])
+    seen_ids = set()
+    for index, user in enumerate(users):
+        if user.id in seen_ids:
+            result.failed.append(
+                BulkItemError(index=index, id=user.id, detail="Duplicate user ID in request")
+            )
+            continue
+        seen_ids.add(user.id)
+        try:
+            changes = UserUpdate(**user.dict(exclude_unset=True, exclude={"id"}))
+            if update_user(user.id, changes, db) is None:
+                result.failed.append(BulkItemError(index=index, id=user.id, detail="User not found"))
+            else:
+                result.succeeded.append(user.id)
+        except HTTPException as e:
+            result.failed.append(BulkItemError(index=index, id=user.id, detail=e.detail))
+    logger.info("Bulk updated %s users, %s failed", len(result.succeeded), len(result.failed))
+    return result
+
+def bulk_delete_users(
+    user_ids: List[int], db: ShardedSession, chunk_size: int = 500
+) -> BulkOperationResult:
+    """Delete many users by ID, one at a time (see bulk_create_users)."""
+    result = BulkOperationResult(succeeded=[], failed=[])
+    seen_ids = set()
+    for index, user_id in enumerate(user_ids):
+        if user_id in seen_ids:
+            result.failed.append(
+                BulkItemError(index=index, id=user_id, detail="Duplicate user ID in request")
+            )
+            continue
+        seen_ids.add(user_id)
+        try:
+            if delete_user(user_id, db):
+                result.succeeded.append(user_id)
+            else:
+                result.failed.append(BulkItemError(index=index, id=user_id, detail="User not found"))
+        except HTTPException as e:
+            result.failed.append(BulkItemError(index=index, id=user_id, detail=e.detail))
+    logger.info("Bulk deleted %s users, %s failed", len(result.succeeded), len(result.failed))
+    return result
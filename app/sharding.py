@@ -0,0 +1,238 @@
+import bisect
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
+
+from app import database
+from app.config import DATABASE_SHARD_URLS, SHARD_ID_BLOCK_SIZE, SHARD_VIRTUAL_NODES
+from app.models import IdBlock, User
+
+logger = logging.getLogger(__name__)
+
+def _hash(key: str) -> int:
+    # Stable across processes and restarts, unlike hash().
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+def max_user_id(engine) -> int:
+    with engine.connect() as connection:
+        return connection.scalar(select(func.max(User.id))) or 0
+
+class HashRing:
+    """
+    Consistent hash ring with ``virtual_nodes`` points per node.
+
+    Adding a node only moves the keys that now hash to its points (about
+    1/N of them); every other key stays where it was.
+    """
+
+    def __init__(self, nodes: List[str], virtual_nodes: int = 64):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+class IdAllocator:
+    """
+    Globally unique user IDs for sharded deployments (hi-lo).
+
+    One ``UPDATE ... RETURNING`` on the directory database reserves
+    ``block_size`` IDs, which this process then hands out from memory. IDs
+    from different workers interleave, so they are unique but not in
+    creation order. With ``engine`` None the directory is the primary
+    database, whose engine is created on first use.
+    """
+
+    def __init__(self, engine, block_size: int, name: str = "users"):
+        self._engine = engine
+        self.block_size = block_size
+        self.name = name
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                with self.engine.begin() as connection:
+                    end = connection.scalar(
+                        update(IdBlock)
+                        .where(IdBlock.name == self.name)
+                        .values(next_id=IdBlock.next_id + self.block_size)
+                        .returning(IdBlock.next_id)
+                    )
+                if end is None:
+                    raise RuntimeError(f"ID sequence {self.name} is not initialized")
+                self._next, self._end = end - self.block_size, end
+            user_id = self._next
+            self._next += 1
+            return user_id
+
+    @property
+    def engine(self):
+        return self._engine if self._engine is not None else database.get_engine()
+
+    def reset(self) -> None:
+        """Drop the reserved block (a forked child must not reuse its parent's)."""
+        with self._lock:
+            self._next = self._end = 0
+
+    def seed(self, connection, min_next_id: int) -> None:
+        """Create the sequence, or move it forward, so it starts at ``min_next_id`` or later."""
+        current = connection.scalar(select(IdBlock.next_id).where(IdBlock.name == self.name))
+        if current is None:
+            connection.execute(insert(IdBlock).values(name=self.name, next_id=min_next_id))
+        elif current < min_next_id:
+            connection.execute(
+                update(IdBlock).where(IdBlock.name == self.name).values(next_id=min_next_id)
+            )
+
+class Shard:
+    """
+    Engine and session factory for one shard database, created on first
+    access (like app.database's), so importing the app opens no pools.
+    """
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Only called while engine / SessionLocal are not set yet.
+        if attribute not in ("engine", "SessionLocal"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {attribute!r}")
+        with self._lock:
+            if "engine" not in self.__dict__:
+                engine = create_engine(self.url, **database.engine_options(self.url))
+                database.install_sqlite_pragmas(engine, database.sqlite_pragmas)
+                self.SessionLocal = sessionmaker(
+                    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine,
+                    info={"shard": self.name},
+                )
+                self.engine = engine
+        return self.__dict__[attribute]
+
+    def dispose(self, close: bool = True) -> None:
+        if "engine" in self.__dict__:
+            self.engine.dispose(close=close)
+
+class ShardedSession:
+    """
+    The ``db`` handed to ``app.shard_crud``: one Session per shard, opened
+    on first use and closed together at the end of the request.
+    """
+
+    def __init__(self, shard_set: "ShardSet"):
+        self.shard_set = shard_set
+        # Same attribute as Session.info; sharded reads always hit the shard itself.
+        self.info: Dict[str, Any] = {}
+        self._sessions: Dict[str, Session] = {}
+
+    def on(self, shard: Shard) -> Session:
+        if shard.name not in self._sessions:
+            self._sessions[shard.name] = shard.SessionLocal()
+        return self._sessions[shard.name]
+
+    def for_id(self, user_id: int) -> Session:
+        return self.on(self.shard_set.shard_for_id(user_id))
+
+    def for_email(self, email: str) -> Session:
+        return self.on(self.shard_set.shard_for_email(email))
+
+    def all(self) -> List[Session]:
+        return [self.on(shard) for shard in self.shard_set.shards]
+
+    def close(self) -> None:
+        for db in self._sessions.values():
+            db.close()
+        self._sessions.clear()
+
+class ShardSet:
+    """
+    The shards of the users table and how keys map onto them.
+
+    Users live on the shard their ID hashes to; the ``user_emails`` claim
+    for their email lives on the shard the email hashes to.
+    """
+
+    def __init__(self, shards: List[Shard], virtual_nodes: int, allocator: IdAllocator):
+        self.shards = shards
+        self.by_name = {shard.name: shard for shard in shards}
+        self.ring = HashRing([shard.name for shard in shards], virtual_nodes)
+        self.allocator = allocator
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def shard_for_id(self, user_id: int) -> Shard:
+        return self.by_name[self.ring.node_for(f"id:{user_id}")]
+
+    def shard_for_email(self, email: str) -> Shard:
+        return self.by_name[self.ring.node_for(f"email:{email}")]
+
+    def session(self) -> ShardedSession:
+        return ShardedSession(self)
+
+    def scatter(self, func: Callable, sessions: List[Session], *args) -> List[Any]:
+        """Run ``func(session, *args)`` on every session concurrently; results in session order."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        # Each call runs in a copy of the caller's context, so request metrics see its SQL.
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, func, db, *args) for db in sessions
+        ]
+        return [future.result() for future in futures]
+
+    def initialize(self) -> None:
+        """
+        Create the schema on every shard and seed the ID allocator past
+        existing IDs, including users still in the directory database from
+        before sharding (moved with ``python -m app.rebalance --drain``).
+        """
+        with database.file_lock(database.init_lock_path()):
+            for shard in self.shards:
+                database.init_db(shard.engine)
+            engines = [shard.engine for shard in self.shards] + [self.allocator.engine]
+            max_id = max(max_user_id(engine) for engine in engines)
+            with self.allocator.engine.begin() as connection:
+                self.allocator.seed(connection, max_id + 1)
+
+    def dispose(self, close: bool = True) -> None:
+        for shard in self.shards:
+            shard.dispose(close=close)
+
+def build_shard_set(urls: List[str] = DATABASE_SHARD_URLS) -> Optional[ShardSet]:
+    if not urls:
+        return None
+    shards = [Shard(f"shard{i}", url) for i, url in enumerate(urls)]
+    return ShardSet(shards, SHARD_VIRTUAL_NODES, IdAllocator(None, SHARD_ID_BLOCK_SIZE))
+
+shard_set = build_shard_set()
+
+def _reset_shards_after_fork() -> None:
+    # Fresh connections, no inherited executor threads, and a new ID block:
+    # handing out the parent's reserved IDs would create duplicates.
+    shard_set.dispose(close=False)
+    shard_set._executor = None
+    shard_set.allocator.reset()
+
+if shard_set is not None and hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_shards_after_fork)
+
+def get_sharded_db(request: Request):
+    # NDJSON streams open their own ShardedSession after the request returns.
+    request.state.read_sessionmaker = shard_set.session
+    db = shard_set.session()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads in this process.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight wait for the same result (or exception) instead of issuing their
+    own query. Nothing is kept once the call completes, so this only
+    flattens bursts, e.g. many misses on a popular user after its cache
+    entry expired.
+
+    If the leading request is cancelled (client went away), the waiting
+    callers retry, and the first of them runs ``fn`` again.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await fn()
+        self.requests += 1
+        while key in self._calls:
+            future = self._calls[key]
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this caller was cancelled, not the leader
+                self.coalesced -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved: with no waiters asyncio would log it as unhandled.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def forget(self, key: Hashable) -> None:
+        """Make later callers start a new call, e.g. after the row was written."""
+        self._calls.pop(key, None)
+
+    def forget_all(self) -> None:
+        """Make later callers for every key start new calls, e.g. after any write."""
+        self._calls.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,222 @@
+import codecs
+import csv
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from app.schemas import BulkOperationResult, ImportLineError, ImportResult, UserCreate
+from app.serialization import loads
+
+logger = logging.getLogger(__name__)
+
+# Upload content types understood by POST /users/import when no format is given
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# Columns a CSV upload must have (others, e.g. id from an export, are ignored)
+CSV_REQUIRED_COLUMNS = ("email", "name")
+
+class ImportStats:
+    """Progress of imports in this process, exported on /metrics."""
+
+    def __init__(self):
+        self.active = 0
+        self.lines = 0
+        self.created = 0
+        self.failed = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "lines_total": self.lines,
+            "created_total": self.created,
+            "failed_total": self.failed,
+        }
+
+import_stats = ImportStats()
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return IMPORT_CONTENT_TYPES.get(media_type)
+
+def _too_long(max_length: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Lines are limited to {max_length} characters"
+    )
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int) -> AsyncIterator[str]:
+    """
+    Split a UTF-8 byte stream into lines as it arrives.
+
+    Only the current partial line is buffered, so memory stays bounded by
+    ``max_length`` whatever the size of the stream.
+
+    Raises:
+        HTTPException: 400 for invalid UTF-8, 413 for a line over ``max_length``.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if len(line) > max_length:
+                    raise _too_long(max_length)
+                yield line.rstrip("\r")
+            if len(pending) > max_length:
+                raise _too_long(max_length)
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload is not valid UTF-8")
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+async def _csv_records(lines: AsyncIterator[str], max_length: int):
+    header = None
+    record: List[str] = []
+    number = start = 0
+    async for line in lines:
+        number += 1
+        if not record:
+            start = number
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            # Inside a quoted field that continues on the next line
+            if len(text) > max_length:
+                raise _too_long(max_length)
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            missing = [name for name in CSV_REQUIRED_COLUMNS if name not in header]
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"CSV header is missing columns: {', '.join(missing)}"
+                )
+            continue
+        # Empty fields are missing values (an export writes a missing age as "").
+        yield start, {name: value or None for name, value in zip(header, values)}, None
+    if record:
+        # The upload ended inside a quoted field.
+        if header is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="CSV header has an unterminated quoted field"
+            )
+        yield start, None, "Unterminated quoted field"
+
+async def _ndjson_records(lines: AsyncIterator[str]):
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            data = loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, data, None
+
+def iter_records(
+    lines: AsyncIterator[str], format: str, max_length: int
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Parse lines into (line number, fields, error) records; line numbers are 1-based."""
+    if format == "csv":
+        return _csv_records(lines, max_length)
+    return _ndjson_records(lines)
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+async def import_users(
+    chunks: AsyncIterator[bytes],
+    format: str,
+    create_users: Callable[[List[UserCreate]], Awaitable[BulkOperationResult]],
+    chunk_size: int = 500,
+    max_errors: int = 100,
+    max_length: int = 65536,
+) -> ImportResult:
+    """
+    Import users from a CSV or NDJSON byte stream as it is received.
+
+    Records are validated against ``UserCreate`` and handed to
+    ``create_users`` ``chunk_size`` at a time (one transaction each), so
+    only one chunk is held in memory. Lines that fail are counted; the
+    first ``max_errors`` are itemized in the result.
+
+    Args:
+        chunks: The request body.
+        format: "csv" (with a header line) or "ndjson".
+        create_users: Inserts one chunk, e.g. a backend's bulk_create_users.
+        chunk_size: Users per transaction.
+        max_errors: Failed lines itemized in the result.
+        max_length: Longest accepted line or CSV record, in characters.
+
+    Returns:
+        ImportResult with line counts and the itemized failures.
+
+    Raises:
+        HTTPException: If the stream cannot be parsed at all (bad encoding,
+            CSV header, overlong line). Chunks imported before that stay.
+    """
+    result = ImportResult(processed=0, created=0, failed=0, errors=[])
+    users: List[UserCreate] = []
+    line_numbers: List[int] = []
+
+    def fail(line: int, detail: str) -> None:
+        result.failed += 1
+        import_stats.failed += 1
+        if len(result.errors) < max_errors:
+            result.errors.append(ImportLineError(line=line, detail=detail))
+
+    async def flush() -> None:
+        outcome = await create_users(users)
+        result.created += len(outcome.succeeded)
+        import_stats.created += len(outcome.succeeded)
+        for error in outcome.failed:
+            fail(line_numbers[error.index], error.detail)
+        users.clear()
+        line_numbers.clear()
+        logger.info("Import: %s lines, %s created, %s failed", result.processed, result.created, result.failed)
+
+    import_stats.active += 1
+    try:
+        lines = iter_lines(chunks, max_length)
+        async for line, data, error in iter_records(lines, format, max_length):
+            result.processed += 1
+            import_stats.lines += 1
+            if error is None:
+                try:
+                    users.append(UserCreate(**data))
+                    line_numbers.append(line)
+                except ValidationError as e:
+                    error = _describe(e)
+            if error is not None:
+                fail(line, error)
+            elif len(users) >= chunk_size:
+                await flush()
+        if users:
+            await flush()
+    finally:
+        import_stats.active -= 1
+    # Database failures are reported per chunk, after the validation failures around them.
+    result.errors.sort(key=lambda error: error.line)
+    return result
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, database
+from app.cache import user_to_dict
+from app.config import USE_ASYNC_DB
+from app.schemas import BulkOperationResult, UserCreate
+
+logger = logging.getLogger(__name__)
+
+async def _write_batch(users: List[UserCreate]) -> BulkOperationResult:
+    """Insert a batch of users in one transaction on a dedicated session."""
+    if USE_ASYNC_DB:
+        from app import async_crud
+
+        async with database.AsyncSessionLocal() as db:
+            return await async_crud.bulk_create_users(users, db, len(users))
+
+    def write():
+        db = database.SessionLocal()
+        try:
+            return crud.bulk_create_users(users, db, len(users))
+        finally:
+            db.close()
+
+    return await run_in_threadpool(write)
+
+async def _write_one(user: UserCreate) -> Dict[str, Any]:
+    """Insert a single user, raising the same HTTPException as POST /users/."""
+    if USE_ASYNC_DB:
+        from app import async_crud
+
+        async with database.AsyncSessionLocal() as db:
+            new_user = await async_crud.create_user(user, db)
+    else:
+        def write():
+            db = database.SessionLocal()
+            try:
+                return crud.create_user(user, db)
+            finally:
+                db.close()
+
+        new_user = await run_in_threadpool(write)
+    return user_to_dict(new_user)
+
+class CreateUserBatcher:
+    """
+    Group-commit queue for user creation.
+
+    Requests enqueue their UserCreate and await a future. A background task
+    collects up to ``max_rows`` pending creates, or whatever arrived within
+    ``max_delay_ms`` of the first one, and inserts them in one transaction.
+    Each future resolves with the created user, or raises the HTTPException
+    the request would have raised on its own (e.g. 400 for a taken email).
+    When the batch transaction fails, its rows are retried one at a time.
+
+    When ``max_queue_size`` creates are already pending, a new request waits
+    at most ``enqueue_timeout_ms`` for room and is then rejected with 503.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 100,
+        max_delay_ms: int = 5,
+        max_queue_size: int = 1000,
+        enqueue_timeout_ms: int = 100,
+    ):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.batches = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the writer task, or replace one that has died."""
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            # Creates still queued for a dead writer are picked up by the new one.
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything already queued, then stop the writer task."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+        try:
+            await self._task
+        except Exception as e:
+            logger.error("Create writer failed: %s", e)
+        self._task = None
+        self._queue = None
+
+    async def submit(self, user: UserCreate) -> Dict[str, Any]:
+        """
+        Queue a user for creation and wait for its batch to commit.
+
+        Raises:
+            HTTPException: 503 if the queue stays full, otherwise whatever the
+                create itself raised.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((user, future)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many pending user creations",
+                headers={"Retry-After": "1"},
+            )
+        return await future
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rejected": self.rejected,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_rows:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                # Keep the writer alive for later batches; nobody in this one may hang.
+                logger.error("Failed to flush batch of %s users: %s", len(batch), e)
+                for _, future in batch:
+                    _fail(future, e)
+
+    async def _flush(self, batch: List[Tuple[UserCreate, asyncio.Future]]) -> None:
+        self.batches += 1
+        users = [user for user, _ in batch]
+        try:
+            result = await _write_batch(users)
+        except Exception as e:
+            # Retry every row on its own, so one bad row (or a transient error)
+            # does not fail requests that would have succeeded alone.
+            logger.error("Failed to write batch of %s users, retrying one by one: %s", len(batch), e)
+            for user, future in batch:
+                await self._retry_one(user, future)
+            return
+        failed = {error.index: error.detail for error in result.failed}
+        created_ids = iter(result.succeeded)
+        retry = []
+        for index, (user, future) in enumerate(batch):
+            detail = failed.get(index)
+            if detail is None:
+                data = {
+                    "id": next(created_ids), "email": user.email, "name": user.name,
+                    "age": user.age, "version": 1,
+                }
+                if not future.done():
+                    future.set_result(data)
+            elif detail == "Email already exists":
+                if not future.done():
+                    future.set_exception(HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST, detail=detail
+                    ))
+            else:
+                retry.append((user, future))
+        # A database error fails the whole transaction; retry those rows one
+        # at a time so each request gets its own outcome.
+        for user, future in retry:
+            await self._retry_one(user, future)
+
+    async def _retry_one(self, user: UserCreate, future: asyncio.Future) -> None:
+        if future.done():
+            return
+        try:
+            data = await _write_one(user)
+        except Exception as e:
+            _fail(future, e)
+            return
+        if not future.done():
+            future.set_result(data)
+
+def _fail(future: asyncio.Future, error: Exception) -> None:
+    """Resolve ``future`` with ``error``, as a 500 unless it is already an HTTPException."""
+    if future.done():
+        return
+    if not isinstance(error, HTTPException):
+        error = HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(error)}"
+        )
+    future.set_exception(error)
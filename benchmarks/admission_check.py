@@ -0,0 +1,91 @@
+"""
+Check rate limiting and write admission control.
+
+Runs the app in-process with a small per-client rate and a write limit of
+one with a short queue, then exits non-zero unless:
+
+- a client over its rate gets 429 with Retry-After, while other clients
+  (by IP or API key) and /metrics are unaffected, and the bucket refills;
+- a burst of slow writes is shed with 503 and Retry-After instead of
+  queueing, reads still pass, and no slot is leaked afterwards.
+
+Usage:
+    python -m benchmarks.admission_check
+    USE_ASYNC_DB=false python -m benchmarks.admission_check
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from collections import Counter
+
+_tmpdir = tempfile.mkdtemp(prefix="admission-check-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/admission.db"
+os.environ["USER_CACHE_BACKEND"] = "none"
+os.environ["RATE_LIMIT_PER_SECOND"] = "5"
+os.environ["RATE_LIMIT_BURST"] = "5"
+os.environ["WRITE_CONCURRENCY"] = "1"
+os.environ["WRITE_QUEUE_SIZE"] = "3"
+os.environ["WRITE_QUEUE_TIMEOUT_MS"] = "200"
+
+import httpx  # noqa: E402
+
+from app import main as service  # noqa: E402
+
+async def run(check) -> None:
+    app = service.app
+
+    def client(address: str) -> httpx.AsyncClient:
+        transport = httpx.ASGITransport(app=app, client=(address, 40000))
+        return httpx.AsyncClient(transport=transport, base_url="http://check", timeout=60)
+
+    async with app.router.lifespan_context(app):
+        async with client("10.0.0.1") as first, client("10.0.0.2") as second:
+            responses = [await first.get("/users/") for _ in range(8)]
+            statuses = Counter(r.status_code for r in responses)
+            check("requests over the burst get 429", statuses == {200: 5, 429: 3}, str(dict(statuses)))
+            check("429 carries Retry-After", responses[-1].headers.get("retry-after") == "1",
+                  str(responses[-1].headers.get("retry-after")))
+            response = await second.get("/users/")
+            check("other clients keep their own bucket", response.status_code == 200, f"[{response.status_code}]")
+            response = await first.get("/users/", headers={"X-API-Key": "check"})
+            check("an API key gets its own bucket", response.status_code == 200, f"[{response.status_code}]")
+            response = await first.get("/metrics")
+            check("/metrics is not rate limited", response.status_code == 200, f"[{response.status_code}]")
+            await asyncio.sleep(0.5)
+            response = await first.get("/users/")
+            check("the bucket refills", response.status_code == 200, f"[{response.status_code}]")
+
+        # Writes from many clients at once, so only the write limiter applies.
+        async def write(index: int) -> httpx.Response:
+            async with client(f"10.1.0.{index}") as writer:
+                users = [{"email": f"w{index}-{n}@example.com", "name": "W"} for n in range(3000)]
+                return await writer.post("/users/bulk", json=users)
+
+        responses = await asyncio.gather(*(write(index) for index in range(12)))
+        statuses = Counter(r.status_code for r in responses)
+        check("excess writes are shed with 503", statuses[503] > 0 and statuses[200] > 0, str(dict(statuses)))
+        check("503 carries Retry-After",
+              all(r.headers.get("retry-after") for r in responses if r.status_code == 503))
+        async with client("10.2.0.1") as reader:
+            response = await reader.get("/users/", params={"limit": 1})
+        check("reads are not write limited", response.status_code == 200, f"[{response.status_code}]")
+        stats = service.write_limiter.stats()
+        check("no write slot leaked", stats["active"] == 0 and stats["waiting"] == 0, str(stats))
+
+def main() -> int:
+    failures = []
+
+    def check(label, condition, detail=""):
+        print(f"{'ok' if condition else 'FAIL':4} {label} {detail}")
+        if not condition:
+            failures.append(label)
+
+    asyncio.run(run(check))
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
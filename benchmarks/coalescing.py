@@ -0,0 +1,76 @@
+"""
+Effect of read coalescing (single-flight) on a thundering herd.
+
+Runs the app in-process with the user cache disabled, so every read is a
+cache miss, and fires bursts of identical concurrent requests at one user
+and at one list page. Prints requests, SQL statements and latency with
+coalescing on and off.
+
+Usage:
+    python -m benchmarks.coalescing --concurrency 200 --bursts 10
+    USE_ASYNC_DB=false python -m benchmarks.coalescing
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='coalesce-bench-')}/bench.db")
+os.environ["USER_CACHE_BACKEND"] = "none"
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import database, main  # noqa: E402
+
+statements = 0
+
+def _count(*args):
+    global statements
+    statements += 1
+
+async def burst_run(client: httpx.AsyncClient, path: str, concurrency: int, bursts: int) -> dict:
+    global statements
+    statements = 0
+    started = time.perf_counter()
+    for _ in range(bursts):
+        responses = await asyncio.gather(*(client.get(path) for _ in range(concurrency)))
+        assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses][:5]
+    elapsed = time.perf_counter() - started
+    return {"requests": concurrency * bursts, "statements": statements, "seconds": elapsed}
+
+async def run(args) -> None:
+    event.listen(database.engine, "after_cursor_execute", _count)
+    if database.async_engine is not None:
+        event.listen(database.async_engine.sync_engine, "after_cursor_execute", _count)
+    app = main.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            users = [{"email": f"herd{i}@example.com", "name": f"Herd {i}"} for i in range(100)]
+            await client.post("/users/bulk", json=users)
+            user_id = (await client.get("/users/", params={"limit": 1})).json()[0]["id"]
+            for path in (f"/users/{user_id}", "/users/?limit=100"):
+                for enabled in (False, True):
+                    main.user_reads.enabled = main.page_reads.enabled = enabled
+                    result = await burst_run(client, path, args.concurrency, args.bursts)
+                    print(
+                        f"{path:18} coalescing={'on ' if enabled else 'off'} "
+                        f"requests={result['requests']:6} statements={result['statements']:6} "
+                        f"{result['requests'] / result['seconds']:8.0f} req/s"
+                    )
+    print(f"user reads: {main.user_reads.stats()}")
+    print(f"page reads: {main.page_reads.stats()}")
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=10)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
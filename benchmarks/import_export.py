@@ -0,0 +1,121 @@
+"""
+Throughput and server memory of POST /users/import and GET /users/export.
+
+Starts the service with uvicorn on a temporary SQLite database, uploads
+--users generated rows as a chunked stream, streams them back out, and
+reports rows/s plus the server's resident memory after each step (Linux).
+Run it with two sizes: memory should not grow with the file.
+
+Usage:
+    python -m benchmarks.import_export --users 100000
+    python -m benchmarks.import_export --users 1000000 --format ndjson
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Iterator, Optional
+
+import httpx
+
+ROWS_PER_CHUNK = 1000
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def memory_kib(pid: int, field: str) -> Optional[int]:
+    """VmRSS (current) or VmHWM (peak) of a process, from /proc."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def generate(count: int, format: str) -> Iterator[bytes]:
+    if format == "csv":
+        yield b"email,name,age\n"
+    for start in range(0, count, ROWS_PER_CHUNK):
+        rows = range(start, min(start + ROWS_PER_CHUNK, count))
+        if format == "csv":
+            yield "".join(f"user{i}@example.com,User {i},{i % 90}\n" for i in rows).encode()
+        else:
+            yield "".join(
+                json.dumps({"email": f"user{i}@example.com", "name": f"User {i}", "age": i % 90}) + "\n"
+                for i in rows
+            ).encode()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="import-bench-")
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmpdir}/bench.db",
+        "USER_CACHE_BACKEND": "none",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=None) as client:
+            for _ in range(100):
+                try:
+                    client.get("/metrics")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            else:
+                print("server did not start")
+                return 1
+            print(f"server started: rss={memory_kib(server.pid, 'VmRSS')} KiB")
+
+            started = time.perf_counter()
+            response = client.post(
+                "/users/import",
+                params={"format": args.format},
+                content=generate(args.users, args.format),
+            )
+            elapsed = time.perf_counter() - started
+            result = response.json()
+            print(
+                f"import: {result['created']} created, {result['failed']} failed in {elapsed:.1f}s "
+                f"({result['processed'] / elapsed:,.0f} rows/s), peak rss={memory_kib(server.pid, 'VmHWM')} KiB"
+            )
+
+            started = time.perf_counter()
+            rows = size = 0
+            with client.stream("GET", "/users/export", params={"format": args.format}) as response:
+                for line in response.iter_lines():
+                    rows += 1
+                    size += len(line) + 1
+            elapsed = time.perf_counter() - started
+            if args.format == "csv":
+                rows -= 1
+            print(
+                f"export: {rows} rows, {size / 2 ** 20:.1f} MiB in {elapsed:.1f}s "
+                f"({rows / elapsed:,.0f} rows/s), peak rss={memory_kib(server.pid, 'VmHWM')} KiB"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
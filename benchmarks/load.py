@@ -0,0 +1,253 @@
+"""
+Load benchmark for the /users endpoints.
+
+Seeds the database with a configurable number of users, drives a weighted
+mix of create/read/update/delete/list requests at one or more concurrency
+levels, and writes throughput plus p50/p95/p99 latencies per operation as
+JSON. A previous result can be passed with --baseline to flag regressions.
+
+By default the app runs in-process on a temporary SQLite database; pass
+--url to benchmark a running server (seed it with the same DATABASE_URL).
+
+Usage:
+    python -m benchmarks.load --users 100000 --concurrency 1 16 64 --output bench.json
+    python -m benchmarks.load --users 100000 --baseline bench.json
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.load --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_MIX = "read=60,list=10,create=15,update=10,delete=5"
+SEED_CHUNK = 10000
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("read", "list", "create", "update", "delete"):
+            raise ValueError(f"Unknown operation in mix: {name}")
+        weights[name.strip()] = int(weight)
+    return weights
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def seed_users(count: int) -> None:
+    """Insert ``count`` users through the configured engine, in large chunks."""
+    from sqlalchemy import func, insert, select
+
+    from app.database import engine, init_db
+    from app.models import User
+
+    init_db()
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(User)).scalar()
+        for start in range(existing, count, SEED_CHUNK):
+            conn.execute(insert(User), [
+                {"email": f"seed{i}@example.com", "name": f"Seed User {i}", "age": 18 + i % 60}
+                for i in range(start, min(count, start + SEED_CHUNK))
+            ])
+    print(f"seeded {max(count - existing, 0)} users ({count} total)", file=sys.stderr)
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, users: int, mix: Dict[str, int], rng: random.Random):
+        self.client = client
+        self.max_id = users
+        self.rng = rng
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.created: List[int] = []
+        self.latencies: Dict[str, List[float]] = {op: [] for op in self.ops}
+        self.errors: Dict[str, int] = {op: 0 for op in self.ops}
+
+    def _random_id(self) -> int:
+        return self.rng.randint(1, max(self.max_id, 1))
+
+    async def run_one(self) -> None:
+        op = self.rng.choices(self.ops, self.weights)[0]
+        started = time.perf_counter()
+        try:
+            if op == "read":
+                response = await self.client.get(f"/users/{self._random_id()}")
+            elif op == "list":
+                response = await self.client.get(
+                    "/users/", params={"limit": 100, "after_id": self.rng.randint(0, self.max_id)}
+                )
+            elif op == "create":
+                email = f"bench-{self.rng.getrandbits(64):x}@example.com"
+                response = await self.client.post("/users/", json={"email": email, "name": "Bench"})
+                if response.status_code == 200:
+                    self.created.append(response.json()["id"])
+            elif op == "update":
+                response = await self.client.put(
+                    f"/users/{self._random_id()}", json={"name": f"Bench {self.rng.random():.6f}"}
+                )
+            else:
+                user_id = self.created.pop() if self.created else self._random_id()
+                response = await self.client.delete(f"/users/{user_id}")
+            failed = response.status_code >= 500 or response.status_code == 429
+        except httpx.HTTPError:
+            failed = True
+        self.latencies[op].append(time.perf_counter() - started)
+        if failed:
+            self.errors[op] += 1
+
+async def run_level(client: httpx.AsyncClient, args, concurrency: int) -> dict:
+    workload = Workload(client, args.users, parse_mix(args.mix), random.Random(args.seed))
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await workload.run_one()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ops = {}
+    for op, samples in workload.latencies.items():
+        samples.sort()
+        ops[op] = {
+            "count": len(samples),
+            "errors": workload.errors[op],
+            "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+        }
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "elapsed_s": elapsed,
+        "throughput_rps": args.requests / elapsed if elapsed else 0.0,
+        "ops": ops,
+    }
+
+async def run(args) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        lifespan = None
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60
+        )
+        lifespan = app.router.lifespan_context(app)
+
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            levels = []
+            for concurrency in args.concurrency:
+                level = await run_level(client, args, concurrency)
+                print(
+                    f"c={concurrency:<4} {level['throughput_rps']:9.1f} req/s "
+                    + " ".join(f"{op}:p95={s['p95_ms']:.2f}ms" for op, s in level["ops"].items()),
+                    file=sys.stderr,
+                )
+                levels.append(level)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "users": args.users,
+            "mix": args.mix,
+            "target": args.url or "in-process",
+            "database_url": os.environ.get("DATABASE_URL"),
+            "use_async_db": os.environ.get("USE_ASYNC_DB", "true"),
+            "python": sys.version.split()[0],
+        },
+        "levels": levels,
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Return human-readable regressions of ``result`` against ``baseline``."""
+    regressions = []
+    base_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in result["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        label = f"c={level['concurrency']}"
+        if level["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{label} throughput {level['throughput_rps']:.1f} < {base['throughput_rps']:.1f} req/s"
+            )
+        for op, stats in level["ops"].items():
+            base_op = base["ops"].get(op)
+            if base_op and stats["p95_ms"] > base_op["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{label} {op} p95 {stats['p95_ms']:.2f}ms > {base_op['p95_ms']:.2f}ms"
+                )
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="users to seed (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--no-seed", action="store_true", help="skip seeding the database")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for the workload")
+    parser.add_argument("--output", help="write the JSON result to this file (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression vs the baseline (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    if not args.url and "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    # Measure the database path, not the read-through cache, unless asked otherwise.
+    os.environ.setdefault("USER_CACHE_BACKEND", "none")
+
+    if not args.no_seed:
+        seed_users(args.users)
+    result = asyncio.run(run(args))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
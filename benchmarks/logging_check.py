@@ -0,0 +1,141 @@
+"""
+Check structured logging, request IDs, sampling and the non-blocking queue.
+
+Runs the app in-process with LOG_FORMAT=json and a small log queue, then
+exits non-zero unless:
+
+- every response carries an X-Request-ID (the client's when it is a plain
+  token) and the CRUD layer's records, in threadpool workers too, are JSON
+  lines carrying that ID, with one line per create;
+- LOG_LEVELS silences a single module, and LOG_SAMPLE_PERCENT drops whole
+  requests' INFO records while warnings are still written;
+- with a writer too slow to keep up, requests do not wait for it: records
+  over the queue size are dropped and counted on /metrics.
+
+Usage:
+    python -m benchmarks.logging_check
+    USE_ASYNC_DB=false python -m benchmarks.logging_check
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="logging-check-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/logging.db"
+os.environ["USER_CACHE_BACKEND"] = "none"
+os.environ["LOG_FORMAT"] = "json"
+os.environ["LOG_LEVELS"] = "app.user_import=WARNING,httpx=WARNING"
+os.environ["LOG_QUEUE_SIZE"] = "50"
+
+import httpx  # noqa: E402
+
+from app import logs, main as service  # noqa: E402
+
+# Seconds the slow writer spends on each record
+SLOW_WRITE = 0.02
+
+class SlowStream(io.StringIO):
+    def write(self, text: str) -> int:
+        time.sleep(SLOW_WRITE)
+        return super().write(text)
+
+output = io.StringIO()
+writer = logs.listener.handlers[0]
+writer.setStream(output)
+
+def written() -> list:
+    """Records written so far (waits for the queue to drain), then clears the output."""
+    logs.log_handler.queue.join()
+    lines = output.getvalue().splitlines()
+    output.seek(0)
+    output.truncate()
+    return [json.loads(line) for line in lines]
+
+async def run(check) -> None:
+    app = service.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=60) as client:
+            written()
+            response = await client.post("/users/", json={"email": "a@example.com", "name": "A"})
+            generated = response.headers.get("x-request-id", "")
+            check("a request ID is generated", re.fullmatch(r"[0-9a-f]{32}", generated) is not None, generated)
+            records = written()
+            created = [r for r in records if r["message"].startswith("Created user")]
+            check("records are JSON with level and logger",
+                  all({"time", "level", "logger", "message"} <= r.keys() for r in records) and bool(records))
+            check("one record per create", len(created) == 1, str(created))
+            check("records carry the request ID", created and created[0].get("request_id") == generated,
+                  str(created))
+
+            user_id = response.json()["id"]
+            response = await client.get(f"/users/{user_id}", headers={"X-Request-ID": "client-42"})
+            check("a client request ID is echoed", response.headers.get("x-request-id") == "client-42")
+            records = written()
+            check("reads log under the client's ID",
+                  any(r.get("request_id") == "client-42" and "Retrieved user" in r["message"] for r in records),
+                  str(records))
+            response = await client.get(f"/users/{user_id}", headers={"X-Request-ID": "no spaces {allowed}"})
+            check("an unusable client ID is replaced",
+                  re.fullmatch(r"[0-9a-f]{32}", response.headers.get("x-request-id", "")) is not None)
+
+            body = "".join(json.dumps({"email": f"i{n}@example.com", "name": "I"}) + "\n" for n in range(3))
+            response = await client.post(
+                "/users/import", content=body, headers={"Content-Type": "application/x-ndjson"}
+            )
+            import_id = response.headers.get("x-request-id")
+            records = [r for r in written() if r.get("request_id") == import_id]
+            check("LOG_LEVELS silences one module",
+                  bool(records) and all(r["logger"] != "app.user_import" for r in records),
+                  str([r["logger"] for r in records]))
+
+            logs.log_handler.sample_percent = 0
+            sampled_out = logs.log_handler.sampled_out
+            for n in range(10):
+                await client.post("/users/", json={"email": f"s{n}@example.com", "name": "S"})
+            logging.getLogger("app.crud").warning("sampling check")
+            records = written()
+            logs.log_handler.sample_percent = 100
+            check("sampled-out requests write no INFO records",
+                  all(r["level"] != "INFO" for r in records)
+                  and logs.log_handler.sampled_out - sampled_out >= 10,
+                  f"[{len(records)} written, {logs.log_handler.sampled_out - sampled_out} sampled out]")
+            check("warnings are never sampled out", any(r["message"] == "sampling check" for r in records))
+
+            writer.setStream(SlowStream())
+            started = time.perf_counter()
+            requests = 200
+            for n in range(requests):
+                await client.get(f"/users/{user_id}")
+            elapsed = time.perf_counter() - started
+            check("requests do not wait for a slow writer", elapsed < requests * SLOW_WRITE / 2,
+                  f"[{elapsed:.2f}s for {requests} requests, {requests * SLOW_WRITE:.1f}s of writes]")
+            logs.log_handler.queue.join()
+            writer.setStream(output)
+            metrics = (await client.get("/metrics")).text
+            dropped = re.search(r"^logging_dropped_total (\S+)$", metrics, re.M)
+            check("records over the queue size are dropped and counted",
+                  dropped is not None and float(dropped.group(1)) > 0, dropped.group(0) if dropped else "")
+
+def main() -> int:
+    failures = []
+
+    def check(label, condition, detail=""):
+        print(f"{'ok' if condition else 'FAIL':4} {label} {detail}")
+        if not condition:
+            failures.append(label)
+
+    asyncio.run(run(check))
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Assert the number of SQL statements each /users endpoint issues.
+
+Runs the app in-process against a temporary SQLite database with the user
+cache disabled, counts statements through SQLAlchemy cursor events and
+exits non-zero if any endpoint deviates from its budget.
+
+Usage:
+    python -m benchmarks.query_counts
+    USE_ASYNC_DB=false python -m benchmarks.query_counts
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+_tmpdir = tempfile.mkdtemp(prefix="query-counts-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/query_counts.db")
+os.environ["USER_CACHE_BACKEND"] = "none"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import crud, database  # noqa: E402
+from app.main import app  # noqa: E402
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.statements = []
+        self._enabled = False
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._enabled:
+            self.statements.append(statement)
+
+    @contextmanager
+    def count(self):
+        self.statements = []
+        self._enabled = True
+        try:
+            yield self
+        finally:
+            self._enabled = False
+
+def main() -> int:
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    counter = StatementCounter(engine)
+    failures = []
+
+    def check(label, expected, method, url, **kwargs):
+        with counter.count():
+            response = client.request(method, url, **kwargs)
+        actual = len(counter.statements)
+        status = "ok" if actual == expected else "FAIL"
+        print(f"{status:4} {label:32} {actual} statement(s), budget {expected} [{response.status_code}]")
+        if actual != expected:
+            failures.append(label)
+            for statement in counter.statements:
+                print(f"       {' '.join(statement.split())}")
+        return response
+
+    # Successful writes also add their change feed row in the same transaction.
+    write = 2 if crud.RECORD_CHANGES else 1
+    with TestClient(app) as client:
+        user = check("POST /users/", write, "POST", "/users/", json={"email": "a@example.com", "name": "A"}).json()
+        check("POST /users/ (duplicate email)", 1, "POST", "/users/", json={"email": "a@example.com", "name": "A"})
+        check("GET /users/{user_id}", 1, "GET", f"/users/{user['id']}")
+        check("PUT /users/{user_id}", write, "PUT", f"/users/{user['id']}", json={"name": "B"})
+        check("PUT /users/{user_id} (not found)", 1, "PUT", "/users/999999", json={"name": "B"})
+        check("GET /users/", 1, "GET", "/users/")
+        check("DELETE /users/{user_id}", write, "DELETE", f"/users/{user['id']}")
+
+    if failures:
+        print(f"{len(failures)} endpoint(s) over budget: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Check read-replica routing against local SQLite files.
+
+Runs the app in-process with a primary and two replica databases. The
+replicas are only updated when this script copies the primary over them
+(SQLite backup API), so replication lag is fully under its control. Exits
+non-zero if reads are not routed as expected:
+
+- reads go round-robin to caught-up replicas, writes to the primary;
+- replica reads are counted in the per-request SQL metrics;
+- a client that just wrote reads from the primary (read-your-writes),
+  with the cookie or by echoing the X-Read-Primary-Until header;
+- replicas lagging more than REPLICA_MAX_LAG_MS are skipped.
+
+Usage:
+    python -m benchmarks.replica_check
+    USE_ASYNC_DB=false python -m benchmarks.replica_check
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="replica-check-")
+PRIMARY = os.path.join(_tmpdir, "primary.db")
+REPLICAS = [os.path.join(_tmpdir, f"replica{i}.db") for i in range(2)]
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY}"
+os.environ["DATABASE_REPLICA_URLS"] = ",".join(f"sqlite:///{path}" for path in REPLICAS)
+os.environ["REPLICA_MAX_LAG_MS"] = "200"
+# Lag checks are driven by this script, not the background task.
+os.environ["REPLICA_CHECK_INTERVAL_MS"] = "3600000"
+os.environ["USER_CACHE_BACKEND"] = "none"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.replicas import READ_PRIMARY_HEADER, replica_router  # noqa: E402
+
+def sync_replicas() -> None:
+    """Bring every replica up to date with the primary."""
+    source = sqlite3.connect(PRIMARY)
+    try:
+        for path in REPLICAS:
+            target = sqlite3.connect(path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+def main() -> int:
+    failures = []
+
+    def check(label, condition, detail=""):
+        print(f"{'ok' if condition else 'FAIL':4} {label} {detail}")
+        if not condition:
+            failures.append(label)
+
+    with TestClient(app) as writer:
+        # A second client without the writer's read-your-writes cookie.
+        reader = TestClient(app)
+        time.sleep(0.5)  # let the startup lag check finish
+        replica_router.check_lag()
+        sync_replicas()
+        replica_router.check_lag()
+        check("replicas caught up", all(r.lag == 0 for r in replica_router.replicas),
+              str([r.lag for r in replica_router.replicas]))
+
+        user = writer.post("/users/", json={"email": "a@example.com", "name": "A"}).json()
+        check("write sets read-primary cookie", "read_primary_until" in writer.cookies)
+        response = reader.get(f"/users/{user['id']}")
+        check("other client reads a replica (not yet replicated)", response.status_code == 404,
+              f"[{response.status_code}]")
+        response = writer.get(f"/users/{user['id']}")
+        check("writer reads its own write from the primary", response.status_code == 200,
+              f"[{response.status_code}]")
+        # A client without a cookie jar echoes the header instead.
+        headless = TestClient(app)
+        response = headless.post("/users/", json={"email": "h@example.com", "name": "H"})
+        until = response.headers.get(READ_PRIMARY_HEADER)
+        headless.cookies.clear()
+        response = headless.get(f"/users/{response.json()['id']}", headers={READ_PRIMARY_HEADER: until or ""})
+        check("echoing the read-primary header reads the primary", until is not None and response.status_code == 200,
+              f"[{until} {response.status_code}]")
+
+        before = [r.reads for r in replica_router.replicas]
+        for _ in range(4):
+            reader.get("/users/")
+        spread = [r.reads - b for r, b in zip(replica_router.replicas, before)]
+        check("list reads alternate between replicas", spread == [2, 2], str(spread))
+        metrics = reader.get("/metrics").text
+        statements = re.search(
+            r'^db_statements_per_request_sum\{method="GET",route="/users/"\} (\S+)$', metrics, re.M
+        )
+        check("replica reads count in the SQL metrics", statements is not None and float(statements.group(1)) > 0,
+              statements.group(0) if statements else "")
+
+        sync_replicas()
+        response = reader.get(f"/users/{user['id']}")
+        check("replica serves the row once replicated", response.status_code == 200,
+              f"[{response.status_code}]")
+
+        replica_router.check_lag()
+        time.sleep(0.3)
+        user = writer.post("/users/", json={"email": "b@example.com", "name": "B"}).json()
+        replica_router.check_lag()
+        check("lagging replicas are detected",
+              all(r.lag is not None and r.lag > replica_router.max_lag for r in replica_router.replicas),
+              str([r.lag for r in replica_router.replicas]))
+        primary_reads = replica_router.primary_reads
+        response = reader.get(f"/users/{user['id']}")
+        check("reads fall back to the primary", response.status_code == 200
+              and replica_router.primary_reads == primary_reads + 1, f"[{response.status_code}]")
+
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
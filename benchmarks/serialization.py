@@ -0,0 +1,81 @@
+"""
+Compare the GET /users/ serialization paths.
+
+"pydantic" is the ``response_model=List[UserResponse]`` path: the route
+returns User objects and FastAPI validates each one and encodes it with the
+stdlib JSON encoder. "rows" is the fast path GET /users/ uses: select the
+user columns as tuples and encode them directly (orjson when installed).
+Both are served by a minimal in-process app so query and framework overhead
+are included; each page size is timed over several repeats and the best run
+is reported.
+
+Usage:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --users 100000 --page-sizes 100 1000 10000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+def best_of(repeats: int, fn: Callable[[], bytes]) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000, help="users to seed")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+
+    from fastapi import Depends, FastAPI, Response
+    from fastapi.testclient import TestClient
+
+    from app import crud, serialization
+    from app.database import get_db
+    from app.schemas import UserResponse
+    from benchmarks.load import seed_users
+
+    seed_users(args.users)
+    logging.disable(logging.INFO)
+
+    bench_app = FastAPI()
+
+    @bench_app.get("/pydantic", response_model=List[UserResponse])
+    def pydantic_path(limit: int, db=Depends(get_db)):
+        return crud.get_users_page(db, limit)
+
+    @bench_app.get("/rows", response_model=List[UserResponse])
+    def rows_path(limit: int, db=Depends(get_db)):
+        rows = crud.get_user_rows_page(db, limit)
+        return Response(serialization.user_rows_to_json(rows), media_type="application/json")
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"{'page':>6} {'pydantic ms':>12} {'rows+' + encoder + ' ms':>14} {'speedup':>8}")
+    with TestClient(bench_app) as client:
+        for size in args.page_sizes:
+            def fetch(path):
+                return lambda: client.get(path, params={"limit": size}).content
+
+            if json.loads(fetch("/pydantic")()) != json.loads(fetch("/rows")()):
+                print(f"page {size}: responses differ", file=sys.stderr)
+                return 1
+            slow = best_of(args.repeats, fetch("/pydantic"))
+            fast = best_of(args.repeats, fetch("/rows"))
+            print(f"{size:>6} {slow * 1000:>12.2f} {fast * 1000:>14.2f} {slow / fast:>7.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
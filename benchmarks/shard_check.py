@@ -0,0 +1,161 @@
+"""
+Check sharded CRUD, scatter-gather pagination and rebalancing on local SQLite shards.
+
+Runs the app in-process against three shard files, compares every list
+order against one query over all shards attached to a single SQLite
+connection, then adds a fourth shard and removes it again with
+``python -m app.rebalance``. Exits non-zero if any check fails.
+
+Usage:
+    python -m benchmarks.shard_check
+    USE_ASYNC_DB=false python -m benchmarks.shard_check
+"""
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+_tmpdir = tempfile.mkdtemp(prefix="shard-check-")
+SHARD_FILES = [os.path.join(_tmpdir, f"shard{i}.db") for i in range(4)]
+SHARD_URLS = [f"sqlite:///{path}" for path in SHARD_FILES]
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/directory.db"
+os.environ["DATABASE_SHARD_URLS"] = ",".join(SHARD_URLS[:3])
+os.environ["SHARD_ID_BLOCK_SIZE"] = "50"
+os.environ["USER_CACHE_BACKEND"] = "none"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.sharding import HashRing  # noqa: E402
+
+# Reference orders, computed by SQLite over all shards at once.
+ORDERS = {
+    "id": "id",
+    "-id": "id DESC",
+    "age": "age ASC NULLS FIRST, id",
+    "-age": "age DESC NULLS LAST, id DESC",
+    "email": "email, id",
+    "-email": "email DESC, id DESC",
+}
+
+def all_users(shard_count: int, where: str = "1", order: str = "id"):
+    connection = sqlite3.connect(SHARD_FILES[0])
+    try:
+        for i in range(1, shard_count):
+            connection.execute(f"ATTACH DATABASE ? AS s{i}", (SHARD_FILES[i],))
+        union = " UNION ALL ".join(
+            ["SELECT id, email, age, deleted_at FROM main.users"]
+            + [f"SELECT id, email, age, deleted_at FROM s{i}.users" for i in range(1, shard_count)]
+        )
+        return connection.execute(
+            f"SELECT id, email, age FROM ({union}) WHERE deleted_at IS NULL AND ({where}) ORDER BY {order}"
+        ).fetchall()
+    finally:
+        connection.close()
+
+def placement(shard_count: int):
+    """(misplaced users, users per shard) for the first ``shard_count`` shard files."""
+    ring = HashRing([f"shard{i}" for i in range(shard_count)], int(os.getenv("SHARD_VIRTUAL_NODES", "64")))
+    misplaced, counts = 0, []
+    for i, path in enumerate(SHARD_FILES):
+        if not os.path.exists(path):
+            counts.append(0)
+            continue
+        connection = sqlite3.connect(path)
+        try:
+            ids = [row[0] for row in connection.execute("SELECT id FROM users")]
+        finally:
+            connection.close()
+        counts.append(len(ids))
+        misplaced += sum(1 for user_id in ids if i >= shard_count or ring.node_for(f"id:{user_id}") != f"shard{i}")
+    return misplaced, counts
+
+def rebalance(shard_urls, drain=()):
+    env = {**os.environ, "DATABASE_SHARD_URLS": ",".join(shard_urls)}
+    args = [sys.executable, "-m", "app.rebalance"]
+    for url in drain:
+        args += ["--drain", url]
+    return subprocess.run(args, env=env, capture_output=True, text=True)
+
+def walk(client, sort: str, page_size: int, **params):
+    ids, url = [], "/users/"
+    params = {"sort": sort, "limit": page_size, **params}
+    while url:
+        response = client.get(url, params=params)
+        ids.extend(user["id"] for user in response.json())
+        url, params = response.headers.get("link", "").partition(">")[0].lstrip("<") or None, None
+    return ids
+
+def main() -> int:
+    failures = []
+
+    def check(label, condition, detail=""):
+        print(f"{'ok' if condition else 'FAIL':4} {label} {detail}")
+        if not condition:
+            failures.append(label)
+
+    rng = random.Random(7)
+    with TestClient(app) as client:
+        created = []
+        for i in range(300):
+            age = rng.choice([None, *range(18, 60)])
+            response = client.post("/users/", json={"email": f"user{i:03}@example.com", "name": f"U{i}", "age": age})
+            created.append(response.json()["id"])
+        check("ids are unique", len(set(created)) == 300)
+        misplaced, counts = placement(3)
+        check("users spread over shards", misplaced == 0 and min(counts[:3]) > 50, str(counts[:3]))
+
+        response = client.post("/users/", json={"email": "user000@example.com", "name": "Dup"})
+        check("duplicate email rejected across shards", response.status_code == 400, f"[{response.status_code}]")
+        response = client.put(f"/users/{created[1]}", json={"email": "user002@example.com"})
+        check("update to a taken email rejected", response.status_code == 400, f"[{response.status_code}]")
+        response = client.put(f"/users/{created[1]}", json={"email": "renamed@example.com"})
+        check("email change", response.status_code == 200 and response.json()["version"] == 2)
+        response = client.post("/users/", json={"email": "user001@example.com", "name": "Reuse"})
+        check("old email released", response.status_code == 200, f"[{response.status_code}]")
+        created.append(response.json()["id"])
+        response = client.delete(f"/users/{created[2]}")
+        check("delete", response.status_code == 200 and client.get(f"/users/{created[2]}").status_code == 404)
+        response = client.post("/users/", json={"email": "user002@example.com", "name": "Reuse"})
+        check("deleted user's email released", response.status_code == 200, f"[{response.status_code}]")
+        created.append(response.json()["id"])
+        response = client.get(f"/users/{created[0]}")
+        check("get by id", response.status_code == 200 and response.json()["email"] == "user000@example.com")
+
+        for sort, order in ORDERS.items():
+            expected = [row[0] for row in all_users(3, order=order)]
+            check(f"pages sort={sort}", walk(client, sort, 17) == expected)
+        expected = [row[0] for row in all_users(3, "age >= 30", ORDERS["-age"])]
+        check("filtered pages", walk(client, "-age", 11, min_age=30) == expected)
+        body = client.get("/users/", params={"format": "ndjson", "sort": "email"}).text
+        streamed = [json.loads(line)["id"] for line in body.splitlines()]
+        check("ndjson stream", streamed == [row[0] for row in all_users(3, order=ORDERS["email"])])
+        result = client.request("DELETE", "/users/bulk", json={"ids": created[10:20] + [10 ** 9]}).json()
+        check("bulk delete", len(result["succeeded"]) == 10 and len(result["failed"]) == 1)
+        response = client.post(f"/users/{created[2]}/restore")
+        check("restore with a reclaimed email rejected", response.status_code == 400, f"[{response.status_code}]")
+        response = client.post(f"/users/{created[10]}/restore")
+        check("restore", response.status_code == 200 and client.get(f"/users/{created[10]}").status_code == 200,
+              f"[{response.status_code}]")
+
+    before = sorted(all_users(3))
+    run = rebalance(SHARD_URLS)
+    misplaced, counts = placement(4)
+    check("grow to 4 shards", run.returncode == 0 and misplaced == 0 and sorted(all_users(4)) == before,
+          f"{counts} {run.stderr.strip()[-200:]}")
+    check("only the new shard's share moved", 0.1 < counts[3] / len(before) < 0.4, str(counts[3]))
+    run = rebalance(SHARD_URLS[:3], drain=SHARD_URLS[3:])
+    misplaced, counts = placement(3)
+    check("drain back to 3 shards", run.returncode == 0 and misplaced == 0 and counts[3] == 0
+          and sorted(all_users(3)) == before, str(counts))
+
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
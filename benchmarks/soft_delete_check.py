@@ -0,0 +1,118 @@
+"""
+Check soft delete, restore and background compaction.
+
+Runs the app in-process on a fresh SQLite database, then exits non-zero
+unless:
+
+- a deleted user disappears from every read, its email can be reused at
+  once, and it can be restored while the email is free;
+- compaction purges tombstones past retention (but not live users),
+  archives them with SOFT_DELETE_ARCHIVE, and an incremental vacuum hands
+  the freed pages back, shrinking the file.
+
+Usage:
+    python -m benchmarks.soft_delete_check
+    USE_ASYNC_DB=false python -m benchmarks.soft_delete_check
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+_tmpdir = tempfile.mkdtemp(prefix="soft-delete-check-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/soft_delete.db"
+os.environ["USER_CACHE_BACKEND"] = "lru"
+os.environ["COMPACTION_INTERVAL_SECONDS"] = "0"
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app import database, main as service  # noqa: E402
+from app.compaction import compactor  # noqa: E402
+from app.models import ArchivedUser, User  # noqa: E402
+
+def db_file_pages() -> int:
+    with database.engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA page_count").scalar()
+
+def count(model) -> int:
+    with database.engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(model))
+
+async def run(check) -> None:
+    app = service.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=60) as client:
+            first = (await client.post("/users/", json={"email": "a@example.com", "name": "A"})).json()
+            path = f"/users/{first['id']}"
+            await client.get(path)  # cached
+            response = await client.delete(path)
+            check("delete succeeds", response.status_code == 200, f"[{response.status_code}]")
+            response = await client.get(path)
+            check("deleted user is gone", response.status_code == 404, f"[{response.status_code}]")
+            listed = (await client.get("/users/")).json()
+            check("deleted user is not listed", all(u["id"] != first["id"] for u in listed))
+            response = await client.delete(path)
+            check("second delete is 404", response.status_code == 404, f"[{response.status_code}]")
+
+            response = await client.post("/users/", json={"email": "a@example.com", "name": "B"})
+            check("email is free again", response.status_code == 200, f"[{response.status_code}]")
+            second = response.json()
+            response = await client.post(f"{path}/restore")
+            check("restore with a taken email is 400", response.status_code == 400, f"[{response.status_code}]")
+            await client.delete(f"/users/{second['id']}")
+            response = await client.post(f"{path}/restore")
+            check("restore succeeds", response.status_code == 200, f"[{response.status_code}]")
+            check("restore bumps the version", response.json().get("version") == first["version"] + 1,
+                  str(response.json()))
+            response = await client.get(path)
+            check("restored user is readable", response.status_code == 200, f"[{response.status_code}]")
+            response = await client.post(f"{path}/restore")
+            check("restoring a live user is 404", response.status_code == 404, f"[{response.status_code}]")
+
+            users = [{"email": f"bulk{n}@example.com", "name": "X" * 200} for n in range(3000)]
+            ids = (await client.post("/users/bulk", json=users)).json()["succeeded"]
+            response = await client.request("DELETE", "/users/bulk", json={"ids": ids})
+            check("bulk delete succeeds", len(response.json()["succeeded"]) == len(ids), f"[{response.status_code}]")
+            live = len((await client.get("/users/", params={"limit": 100})).json())
+
+            with database.engine.connect() as connection:
+                mode = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+            check("new databases use incremental auto-vacuum", mode == 2, f"[{mode}]")
+            result = compactor.run_once()
+            check("tombstones within retention are kept", result["purged"] == 0, str(result))
+
+            pages = db_file_pages()
+            compactor.retention = 0
+            result = compactor.run_once()
+            check("expired tombstones are purged", result["purged"] == len(ids) + 1, str(result))
+            check("live users are kept", count(User) == live == 1, f"[{count(User)} rows, {live} listed]")
+            check("freed pages are vacuumed", result["vacuumed_pages"] > 0 and db_file_pages() < pages,
+                  f"[{pages} -> {db_file_pages()} pages]")
+            response = await client.post(f"/users/{ids[0]}/restore")
+            check("purged users cannot be restored", response.status_code == 404, f"[{response.status_code}]")
+
+            compactor.archive = True
+            await client.delete(path)
+            result = compactor.run_once()
+            check("archive moves tombstones to users_archive",
+                  result["purged"] == 1 and count(ArchivedUser) == 1 and count(User) == 0,
+                  f"{result} [{count(ArchivedUser)} archived]")
+
+def main() -> int:
+    failures = []
+
+    def check(label, condition, detail=""):
+        print(f"{'ok' if condition else 'FAIL':4} {label} {detail}")
+        if not condition:
+            failures.append(label)
+
+    asyncio.run(run(check))
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
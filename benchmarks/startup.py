@@ -0,0 +1,90 @@
+"""
+Cold start time: importing the app, running its startup, first requests.
+
+Starts --runs fresh interpreters against one temporary SQLite database.
+Each imports app.main, runs the lifespan startup and sends requests
+in-process, and reports how long each step took. The first run creates
+the schema; later runs find it current and skip the schema checks. The
+table shows the median of the later runs, plus the first run on its own.
+
+Usage:
+    python -m benchmarks.startup --runs 10
+    USE_ASYNC_DB=false python -m benchmarks.startup
+    python -X importtime -c "import app.main" 2> import.log   # per-module import times
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Runs in the child interpreter and prints one JSON line of timings.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import asyncio
+import httpx
+
+async def probe(path):
+    app_ = app.main.app
+    timings = {"import": imported - started}
+    begun = time.perf_counter()
+    async with app_.router.lifespan_context(app_):
+        timings["startup"] = time.perf_counter() - begun
+        transport = httpx.ASGITransport(app=app_)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            for name in ("first_request", "second_request"):
+                begun = time.perf_counter()
+                response = await client.get(path)
+                timings[name] = time.perf_counter() - begun
+                assert response.status_code == 200, response.status_code
+    return timings
+
+print(json.dumps(asyncio.run(probe(sys.argv[1]))))
+"""
+
+PHASES = ("process", "import", "startup", "first_request", "second_request")
+
+def run_once(env: dict, path: str) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, path],
+        env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-2000:])
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    # Whole child process, interpreter start and exit included
+    timings["process"] = elapsed
+    return timings
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/users/?limit=10", help="path requested twice after startup")
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = {
+        "PYTHONPATH": os.getcwd(),
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmpdir}/startup.db",
+        "PYTHONWARNINGS": "ignore",
+    }
+    runs = [run_once(env, args.path) for _ in range(max(args.runs, 2))]
+    first, warm = runs[0], runs[1:]
+
+    print(f"{'ms':16} {'first run':>10} {'median':>10} {'min':>10}")
+    for phase in PHASES:
+        values = [run[phase] * 1000 for run in warm]
+        print(f"{phase:16} {first[phase] * 1000:10.1f} {statistics.median(values):10.1f} {min(values):10.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())